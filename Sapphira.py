@@ -1,24 +1,56 @@
 import os
 import time
 import argparse
-from llama_cpp import Llama
+import threading
 from bot_core.command_dispatcher import handle_command
+from concurrent.futures import Future
+from bot_core import model_registry
+from bot_core.model_manager import default_loader
+from bot_core.model_workers import WorkerCrashed, WorkerPool
+from bot_core.autotune import apply_host_profile
+from bot_core.speculative import CrossVocabDraftModel, PromptLookupDraft, timed_completion, benchmark
 from bot_core.memory import save_conversation, conversation_history, build_embeddings, query_embeddings
+from bot_core.response_cache import response_cache
+from bot_core.learned_router import router
+from bot_core.tracing import span, turn
+from bot_core.generation_control import GenerationControl, interruptible
+from config import MODEL_CONFIGS, TEMPERATURE, USE_MODEL_WORKERS, MODEL_RAM_BUDGET_GB, PRELOAD_NEXT_MODEL, SPECULATIVE_MODE, DRAFT_MODEL, SPECULATIVE_DRAFT_TOKENS
 
-# ---- Model configurations ----
-MODEL_CONFIGS = {
-    "codellama-13b-q4_k_m": {"path": "D:models/codellama-13b.Q4_K_M.gguf", "kwargs": {"n_gpu_layers": 0, "n_threads": 88, "n_ctx": 16384}},
-    "mistral-7b-q5_k_m": {"path": "D:models/mistral-7b-instruct-v0.2.Q5_K_M.gguf", "kwargs": {"n_gpu_layers": 32, "n_threads": 8, "n_ctx": 8192}},
-    "phi-2-q5_k_m":     {"path": "D:models/phi-2.Q5_K_M.gguf", "kwargs": {"n_gpu_layers": 0, "n_threads": 88, "n_ctx": 2048}},
-}
+SPECULATIVE_MODES = ["off", "draft", "lookup"]
 
 class Sapphira:
-    def __init__(self):
-        # Load all models
-        self.models = {}
-        for name, cfg in MODEL_CONFIGS.items():
-            print(f"Loading {name} (ctx={cfg['kwargs']['n_ctx']})...")
-            self.models[name] = Llama(model_path=cfg['path'], **cfg['kwargs'])
+    def __init__(self, ram_budget_gb: float = MODEL_RAM_BUDGET_GB, preload: bool = PRELOAD_NEXT_MODEL,
+                 speculative: str = SPECULATIVE_MODE, workers: bool = USE_MODEL_WORKERS):
+        # Models come from the shared registry: validated from their GGUF headers, loaded on
+        # first use and evicted least-recently-used first beyond the RAM budget
+        self.speculative = speculative
+        self.drafts = {}
+        self.models = model_registry.configure(budget_gb=ram_budget_gb, loader=self._load_model, preload=preload)
+        self.configs = self.models.configs
+        # Optionally host every model in its own process instead (speculative decoding stays in-process only)
+        self.pool = WorkerPool(self.configs, budget_bytes=self.models.budget_bytes) if workers else None
+        if self.pool:
+            self.pool.start()
+
+    def _load_model(self, name: str, cfg: dict):
+        # Speculative targets must be constructed with their draft (llama.cpp then keeps all logits)
+        draft = self._make_draft(name)
+        if draft is None:
+            return default_loader(name, cfg)
+        from llama_cpp import Llama
+        llm = Llama(model_path=cfg['path'], draft_model=draft, **apply_host_profile(cfg['path'], cfg['kwargs']))
+        if isinstance(draft, CrossVocabDraftModel):
+            draft.target = llm
+        self.drafts[name] = draft
+        return llm
+
+    def _make_draft(self, name: str):
+        if self.speculative == "lookup":
+            return PromptLookupDraft(num_pred_tokens=SPECULATIVE_DRAFT_TOKENS)
+        if self.speculative == "draft" and name != DRAFT_MODEL:
+            return CrossVocabDraftModel(lambda: model_registry.get_handle(DRAFT_MODEL, track=False),
+                                        num_pred_tokens=SPECULATIVE_DRAFT_TOKENS)
+        return None
 
     def index_text(self, text: str):
         # Append to conversation history and persist
@@ -31,48 +63,175 @@ class Sapphira:
         # Use memory hybrid vector search
         return query_embeddings(query, top_k=top_k)
 
-    def generate(self, prompt: str, model_name: str, max_tokens: int = 128) -> str:
-        if model_name not in self.models:
-            raise ValueError(f"Model '{model_name}' not loaded.")
-        resp = self.models[model_name](prompt=prompt, max_tokens=max_tokens)
-        return resp['choices'][0]['text']
+    def generate(self, prompt: str, model_name: str, max_tokens: int = 128, context: str = "",
+                 temperature: float = TEMPERATURE, control: GenerationControl | None = None) -> str:
+        """
+        Generate an answer. `control` (default: config deadlines) can cancel the generation or
+        cut it off at a deadline; the partial answer is returned and not cached.
+        """
+        control = control or GenerationControl.from_config()
+        draft = self.drafts.get(model_name)
+        if draft is not None:
+            draft.stats.reset()
+        max_tokens = control.cap_tokens(max_tokens)
+        # Repeated prompts over the same retrieved context are answered from the cache
+        cached = response_cache.get(model_name, prompt, context, temperature, max_tokens)
+        if cached is not None:
+            return cached
+        full_prompt = context + "\n" + prompt if context else prompt
+        start = time.perf_counter()
+        control.start()
+        if self.pool:
+            with span("llm.generate", model=model_name, worker=True):
+                text = self.pool.generate(model_name, full_prompt, max_tokens=max_tokens,
+                                          temperature=temperature, control=control)
+        else:
+            model = model_registry.get_handle(model_name)
+            resp = timed_completion(model, full_prompt, draft.stats if draft else None,
+                                    max_tokens=max_tokens, temperature=temperature,
+                                    stopping_criteria=control.stopping_criteria())
+            text = resp['choices'][0]['text']
+        if not control.cancelled:
+            router.record_latency(model_name, time.perf_counter() - start)
+            response_cache.put(model_name, prompt, text, context, temperature, max_tokens)
+        return text
+
+    def submit(self, prompt: str, model_name: str | None = None, max_tokens: int = 128,
+               context: str = "") -> Future:
+        """
+        Dispatch a generation without blocking; requests routed to different models run
+        concurrently. Uses the worker processes when enabled, else a thread per call.
+        """
+        model_name = model_name or select_model(prompt)
+        if self.pool:
+            # Same cache and latency bookkeeping as generate(), done when the worker replies
+            future = Future()
+            cached = response_cache.get(model_name, prompt, context, TEMPERATURE, max_tokens)
+            if cached is not None:
+                future.set_result(cached)
+                return future
+            full_prompt = context + "\n" + prompt if context else prompt
+            start = time.perf_counter()
+            future = self.pool.submit(model_name, full_prompt, max_tokens=max_tokens, temperature=TEMPERATURE)
+
+            def _record(done: Future):
+                if done.exception() is None and not getattr(done, "stopped", None):
+                    router.record_latency(model_name, time.perf_counter() - start)
+                    response_cache.put(model_name, prompt, done.result(), context, TEMPERATURE, max_tokens)
+            future.add_done_callback(_record)
+            return future
+        future = Future()
+        def _run():
+            try:
+                future.set_result(self.generate(prompt, model_name, max_tokens=max_tokens, context=context))
+            except Exception as e:
+                future.set_exception(e)
+        threading.Thread(target=_run, daemon=True).start()
+        return future
 
-# Routing: code-like inputs → code model, else → chat model
-CODE_TRIGGERS = ["import ", "def ", "class ", "```", "# "]
+    def close(self):
+        if self.pool:
+            self.pool.stop()
+
+    def speculative_report(self, model_name: str) -> str | None:
+        """Acceptance and throughput of the last speculative generation on `model_name`."""
+        draft = self.drafts.get(model_name)
+        return draft.stats.summary() if draft else None
+
+# Routing: embedding similarity to labelled exemplars, discounted by model latency
 def select_model(text: str) -> str:
-    return "codellama-13b-q4_k_m" if any(kw in text for kw in CODE_TRIGGERS) else "mistral-7b-q5_k_m"
+    return router.choose_model(text)
+
+
+BENCH_PROMPTS = [
+    "Explain how a hash map handles collisions.",
+    "def fibonacci(n):\n    \"\"\"Return the n-th Fibonacci number.\"\"\"\n",
+    "Summarize the plot of Romeo and Juliet in three sentences.",
+]
+
+def bench_speculative(model_name: str, mode: str) -> None:
+    """Print acceptance rate and end-to-end CPU tokens/s of speculative vs plain decoding."""
+    if mode == "off":
+        mode = "draft"
+    if mode == "lookup":
+        make_draft = lambda: PromptLookupDraft(num_pred_tokens=SPECULATIVE_DRAFT_TOKENS)
+        draft_llm = None
+    else:
+        from llama_cpp import Llama
+        draft_cfg = MODEL_CONFIGS[DRAFT_MODEL]
+        draft_kwargs = apply_host_profile(draft_cfg['path'], draft_cfg['kwargs'])
+        draft_llm = Llama(model_path=draft_cfg['path'], **dict(draft_kwargs, n_gpu_layers=0, verbose=False))
+        make_draft = lambda: CrossVocabDraftModel(lambda: draft_llm, num_pred_tokens=SPECULATIVE_DRAFT_TOKENS)
+
+    result = benchmark(MODEL_CONFIGS[model_name], BENCH_PROMPTS, make_draft)
+    print(f"{model_name} ({mode}): baseline {result['baseline_tok_s']:.2f} tok/s, "
+          f"speculative {result['speculative_tok_s']:.2f} tok/s, speedup x{result['speedup']:.2f}, "
+          f"acceptance {result['acceptance_rate']:.0%} ({result['accepted']}/{result['drafted']} est.)")
 
 
 def main():
     parser = argparse.ArgumentParser(description="Sapphira CLI")
     parser.add_argument('--model', choices=list(MODEL_CONFIGS.keys()) + ['auto'], default='auto')
+    parser.add_argument('--ram-budget-gb', type=float, default=MODEL_RAM_BUDGET_GB,
+                        help="RAM budget for resident models (0 = unlimited)")
+    parser.add_argument('--preload', action='store_true', default=PRELOAD_NEXT_MODEL,
+                        help="Preload the predicted next model in the background")
+    parser.add_argument('--speculative', choices=SPECULATIVE_MODES, default=SPECULATIVE_MODE,
+                        help=f"Speculative decoding: draft with {DRAFT_MODEL}, or prompt lookup")
+    parser.add_argument('--bench-speculative', metavar='MODEL', choices=list(MODEL_CONFIGS.keys()),
+                        help="Measure acceptance rate and CPU tokens/s speedup for MODEL, then exit")
+    parser.add_argument('--workers', action='store_true', default=USE_MODEL_WORKERS,
+                        help="Host each model in its own worker process")
     args = parser.parse_args()
 
-    sapphira = Sapphira()
+    if args.bench_speculative:
+        bench_speculative(args.bench_speculative, args.speculative)
+        return
+
+    sapphira = Sapphira(ram_budget_gb=args.ram_budget_gb, preload=args.preload, speculative=args.speculative,
+                        workers=args.workers)
     print(f"Sapphira ready (mode={args.model}). Type 'exit' to quit.\n")
 
     while True:
         user_input = input("You: ")
         if user_input.lower() in ['exit', 'quit']:
             print("Goodbye!")
+            sapphira.close()
             break
 
-        # 1) Handle slash/utility commands
-        cmd = handle_command(user_input)
+        # 1) Handle slash/utility commands (one traced turn per input, labelled by what it turned out to be)
+        with turn("command") as turn_info:
+            cmd = handle_command(user_input)
+            if not cmd:
+                turn_info["kind"] = "chat"
+                # 2) Standard flow: index & retrieve
+                with span("index"):
+                    sapphira.index_text(user_input)
+                hits = sapphira.retrieve(user_input)
+                with span("prompt.build", chunks=len(hits)):
+                    context = "\n".join(hits)
+
+                # 3) Model selection
+                with span("route") as route_info:
+                    model_key = select_model(user_input) if args.model == 'auto' else args.model
+                    route_info["model"] = model_key
+                # Ctrl-C stops this answer (keeping what was generated), not the program
+                with interruptible(GenerationControl.from_config()) as control:
+                    try:
+                        answer = sapphira.generate(user_input, model_key, context=context, control=control)
+                    except WorkerCrashed as e:
+                        # The health monitor restarts the worker; the session and other models live on
+                        print(f"\nSapphira ({model_key}): [worker error: {e}]\n")
+                        continue
         if cmd:
             print(f"Sapphira (cmd): {cmd}\n")
             continue
-
-        # 2) Standard flow: index & retrieve
-        sapphira.index_text(user_input)
-        hits = sapphira.retrieve(user_input)
-        context = "\n".join(hits)
-        full_prompt = context + "\n" + user_input
-
-        # 3) Model selection
-        model_key = select_model(user_input) if args.model == 'auto' else args.model
-        answer = sapphira.generate(full_prompt, model_key)
         print(f"\nSapphira ({model_key}): {answer}\n")
+        if control.reason:
+            print(f"{control.describe()}\n")
+        report = sapphira.speculative_report(model_key)
+        if report:
+            print(f"[speculative] {report}\n")
 
 if __name__ == "__main__":
     main()
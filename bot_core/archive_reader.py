@@ -0,0 +1,136 @@
+# bot_core/archive_reader.py
+
+"""
+Stream the members of zip and tar archives without extracting them to disk.
+Members are yielded one at a time as buffered binary streams, so a reader can consume each
+member before the next is opened (required for tar streams). Nested archives are opened
+from memory up to a depth limit. Limits on member count, per-member size and total
+uncompressed bytes are enforced against the bytes actually read, not only the sizes the
+archive declares, so zip bombs stop early.
+"""
+import io
+import logging
+import tarfile
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, Optional
+
+from config import (ARCHIVE_MAX_MEMBERS, ARCHIVE_MAX_MEMBER_BYTES, ARCHIVE_MAX_TOTAL_BYTES,
+                    ARCHIVE_MAX_DEPTH)
+
+logger = logging.getLogger(__name__)
+
+ZIP_SUFFIXES = (".zip", ".jar")
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+class ArchiveLimitError(Exception):
+    """Raised when reading a member would exceed an archive limit."""
+
+
+def is_archive(name: str) -> bool:
+    return name.lower().endswith(ZIP_SUFFIXES + TAR_SUFFIXES)
+
+
+@dataclass
+class ArchiveLimits:
+    max_members: int = ARCHIVE_MAX_MEMBERS
+    max_member_bytes: int = ARCHIVE_MAX_MEMBER_BYTES
+    max_total_bytes: int = ARCHIVE_MAX_TOTAL_BYTES
+    max_depth: int = ARCHIVE_MAX_DEPTH
+
+
+class _Budget:
+    """Members and uncompressed bytes used so far, shared across nested archives."""
+
+    def __init__(self, limits: ArchiveLimits):
+        self.limits = limits
+        self.members = 0
+        self.bytes = 0
+
+    @property
+    def exhausted(self) -> bool:
+        return self.members >= self.limits.max_members or self.bytes >= self.limits.max_total_bytes
+
+
+class _LimitedReader(io.RawIOBase):
+    def __init__(self, raw, name: str, budget: _Budget):
+        self._raw = raw
+        self._name = name
+        self._budget = budget
+        self._read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        n = self._raw.readinto(b)
+        self._read += n
+        self._budget.bytes += n
+        if self._read > self._budget.limits.max_member_bytes:
+            raise ArchiveLimitError(f"{self._name} is larger than {self._budget.limits.max_member_bytes} bytes")
+        if self._budget.bytes > self._budget.limits.max_total_bytes:
+            raise ArchiveLimitError(f"archive expands past {self._budget.limits.max_total_bytes} bytes")
+        return n
+
+
+def _members(archive: str, entries, accept, budget: _Budget) -> Iterator[tuple[str, int, Callable]]:
+    # Apply the member and declared-size limits common to zip and tar
+    for name, size, opener in entries:
+        if budget.exhausted:
+            logger.warning(f"{archive}: limit of {budget.limits.max_members} members or "
+                           f"{budget.limits.max_total_bytes} bytes reached; skipping the rest")
+            return
+        if not (accept(name) or is_archive(name)):
+            continue
+        if size > budget.limits.max_member_bytes:
+            logger.warning(f"{archive}!{name}: {size} bytes exceeds the member limit; skipped")
+            continue
+        budget.members += 1
+        yield name, size, opener
+
+
+def _iter_archive(src, name: str, depth: int, budget: _Budget, accept,
+                  prefix: str) -> Iterator[tuple[str, BinaryIO]]:
+    if name.lower().endswith(ZIP_SUFFIXES):
+        zf = zipfile.ZipFile(src)
+        entries = ((info.filename, info.file_size, lambda info=info: zf.open(info))
+                   for info in zf.infolist() if not info.is_dir())
+        closer = zf
+    else:
+        # Paths can be opened for random access; nested tars are read as a forward-only stream
+        tf = tarfile.open(src, mode="r:*") if isinstance(src, Path) else tarfile.open(fileobj=src, mode="r|*")
+        entries = ((member.name, member.size, lambda member=member: tf.extractfile(member))
+                   for member in tf if member.isfile())
+        closer = tf
+
+    label = prefix[:-1] if prefix else name
+    with closer:
+        for member, size, opener in _members(label, entries, accept, budget):
+            stream = io.BufferedReader(_LimitedReader(opener(), member, budget))
+            if not is_archive(member):
+                yield prefix + member, stream
+                stream.close()
+                continue
+            if depth + 1 > budget.limits.max_depth:
+                logger.warning(f"{label}!{member}: nested deeper than {budget.limits.max_depth}; skipped")
+                continue
+            try:
+                # Zip needs random access, so nested zips are buffered (bounded by the member limit)
+                inner = io.BytesIO(stream.read()) if member.lower().endswith(ZIP_SUFFIXES) else stream
+                yield from _iter_archive(inner, member, depth + 1, budget, accept, f"{prefix}{member}!")
+            except (ArchiveLimitError, zipfile.BadZipFile, tarfile.TarError) as e:
+                logger.warning(f"{label}!{member}: {e}; skipped")
+
+
+def iter_members(path: Path, accept: Callable[[str], bool] = lambda name: True,
+                 limits: Optional[ArchiveLimits] = None) -> Iterator[tuple[str, BinaryIO]]:
+    """
+    Yield (member_name, stream) for each regular file in the archive at `path` that
+    `accept` allows, descending into nested archives. Nested members are named
+    "inner.tar!dir/file.txt". Each stream must be consumed before advancing; reading past a
+    limit raises ArchiveLimitError from the stream.
+    """
+    yield from _iter_archive(path, path.name, 0, _Budget(limits or ArchiveLimits()), accept, "")
+
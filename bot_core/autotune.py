@@ -0,0 +1,212 @@
+# bot_core/autotune.py
+
+"""
+Benchmark-driven tuning of llama.cpp thread and batch settings.
+Sweeps n_threads, then n_batch for each model on the local CPU, measuring prompt-eval and
+generation tokens/s, and stores the winners in a per-host profile (profiles/<hostname>.json).
+Every model loader passes its kwargs through apply_host_profile(), so tuned values replace
+the hard-coded defaults on this machine. n_ctx is not tuned: the configured context (capped
+at the trained one) is kept, and only lowered when the model cannot be loaded with it here.
+Profiles are keyed by GGUF file name, so one model shared by several loaders is tuned once.
+"""
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from bot_core.gguf_reader import read_gguf_metadata
+from bot_core.logger_utils import log_error
+
+PROFILE_DIR = Path("profiles")
+PROFILE_PATH = PROFILE_DIR / f"{socket.gethostname()}.json"
+TUNED_KEYS = ("n_threads", "n_batch")
+
+BATCH_CANDIDATES = [64, 128, 256, 512, 1024]
+# Smallest context tried when the configured one fails to load
+MIN_CTX = 512
+PROMPT_TOKENS = 256
+GEN_TOKENS = 32
+
+BENCH_TEXT = (
+    "Sapphira is an offline assistant that answers questions about ingested documents, "
+    "writes and patches code, and summarizes long conversations. "
+)
+
+_profile_cache: Optional[dict] = None
+_profile_lock = threading.Lock()
+
+
+def load_host_profile(refresh: bool = False) -> dict:
+    """Return this host's tuning profile ({} if the machine was never tuned)."""
+    global _profile_cache
+    with _profile_lock:
+        if _profile_cache is None or refresh:
+            try:
+                with PROFILE_PATH.open("r", encoding="utf-8") as f:
+                    _profile_cache = json.load(f)
+            except FileNotFoundError:
+                _profile_cache = {}
+            except (json.JSONDecodeError, OSError) as e:
+                log_error(f"Ignoring unreadable host profile {PROFILE_PATH}: {e}")
+                _profile_cache = {}
+        return _profile_cache
+
+
+def save_host_profile(profile: dict) -> None:
+    global _profile_cache
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    with PROFILE_PATH.open("w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    with _profile_lock:
+        _profile_cache = profile
+
+
+def apply_host_profile(model_path: str, kwargs: dict) -> dict:
+    """Return a copy of `kwargs` with this host's tuned settings for `model_path` applied."""
+    tuned = load_host_profile().get("models", {}).get(Path(model_path).name, {})
+    merged = dict(kwargs)
+    for key in TUNED_KEYS:
+        if key in tuned:
+            merged[key] = tuned[key]
+    # Recorded only when the configured context failed to load on this host
+    if "max_loadable_ctx" in tuned and "n_ctx" in merged:
+        merged["n_ctx"] = min(merged["n_ctx"], tuned["max_loadable_ctx"])
+    return merged
+
+
+def _thread_candidates() -> list[int]:
+    logical = os.cpu_count() or 1
+    try:
+        import psutil
+        physical = psutil.cpu_count(logical=False) or logical
+    except ImportError:
+        physical = logical
+    candidates = {1, physical, logical, max(1, physical // 2)}
+    step = 2
+    while step < logical:
+        candidates.add(step)
+        step *= 2
+    return sorted(candidates)
+
+
+def measure(model_path: str, kwargs: dict) -> dict:
+    """Load the model with `kwargs` and return prompt-eval and generation tokens/s."""
+    from llama_cpp import Llama
+
+    llm = Llama(model_path=model_path, verbose=False, **kwargs)
+    try:
+        text = BENCH_TEXT * (PROMPT_TOKENS // 16 + 1)
+        tokens = llm.tokenize(text.encode("utf-8"))[:min(PROMPT_TOKENS, llm.n_ctx() // 2)]
+        # Warm up once so page faults of the mapped weights are not measured
+        llm.eval(tokens[:8])
+        llm.reset()
+
+        start = time.perf_counter()
+        llm.eval(tokens)
+        prompt_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(GEN_TOKENS):
+            llm.eval([llm.sample(temp=0.0)])
+        gen_s = time.perf_counter() - start
+    finally:
+        del llm
+    return {
+        "prompt_tok_s": round(len(tokens) / prompt_s, 2) if prompt_s else 0.0,
+        "gen_tok_s": round(GEN_TOKENS / gen_s, 2) if gen_s else 0.0,
+    }
+
+
+def _score(result: dict) -> float:
+    # Decode speed dominates chat latency; prompt speed matters for retrieval-heavy prompts
+    return result["gen_tok_s"] + 0.1 * result["prompt_tok_s"]
+
+
+def tune_model(name: str, cfg: dict, log=print) -> dict:
+    """
+    Coordinate sweep for one MODEL_CONFIGS entry: n_threads first, then n_batch, measured at
+    the configured n_ctx capped at the trained context. That context is halved only while
+    the model fails to load with it. GPU offload is disabled to measure the CPU path.
+
+    Returns:
+        dict with the chosen n_threads, n_batch, the n_ctx they were measured at and their
+        tokens/s, plus max_loadable_ctx when the configured context had to be lowered.
+    """
+    base = dict(cfg["kwargs"], n_gpu_layers=0)
+    max_ctx = int(base.get("n_ctx", 2048))
+    trained_ctx = read_gguf_metadata(cfg["path"], read_tensors=False).context_length
+    if trained_ctx:
+        max_ctx = min(max_ctx, trained_ctx)
+    best = {"n_threads": base.get("n_threads", 1), "n_batch": base.get("n_batch", 512), "n_ctx": max_ctx}
+
+    def run(**overrides) -> Optional[dict]:
+        trial = {**base, **best, **overrides}
+        try:
+            result = measure(cfg["path"], trial)
+        except Exception as e:
+            log_error(f"Autotune trial {overrides} for {name} failed: {e}")
+            return None
+        log(f"  {name} {overrides}: prompt {result['prompt_tok_s']} tok/s, gen {result['gen_tok_s']} tok/s")
+        return result
+
+    # The configured context is what the model runs with; lower it only if it cannot be loaded
+    measured = run()
+    while measured is None and best["n_ctx"] > MIN_CTX:
+        best["n_ctx"] = max(MIN_CTX, best["n_ctx"] // 2)
+        log(f"  {name}: retrying with n_ctx={best['n_ctx']}")
+        measured = run()
+    if measured is None:
+        log_error(f"Autotune of {name}: model could not be loaded; keeping configured settings.")
+        best["n_ctx"] = max_ctx
+        return best
+    if best["n_ctx"] < max_ctx:
+        best["max_loadable_ctx"] = best["n_ctx"]
+
+    for key, candidates in (("n_threads", _thread_candidates()), ("n_batch", BATCH_CANDIDATES)):
+        results = {value: run(**{key: value}) for value in candidates}
+        results = {v: r for v, r in results.items() if r}
+        if results:
+            best[key] = max(results, key=lambda v: _score(results[v]))
+            measured = results[best[key]]
+    best.update(measured)
+    return best
+
+
+def autotune(configs: dict, only: Optional[str] = None, log=print) -> str:
+    """Tune every model in `configs` (or just `only`) and write the host profile."""
+    profile = load_host_profile(refresh=True) or {}
+    profile.update({"host": socket.gethostname(), "cpu_count": os.cpu_count()})
+    models = profile.setdefault("models", {})
+    lines = []
+    for name, cfg in configs.items():
+        if only and name != only:
+            continue
+        if not Path(cfg["path"]).exists():
+            lines.append(f"{name}: skipped (model file not found)")
+            continue
+        log(f"Tuning {name}...")
+        best = tune_model(name, cfg, log=log)
+        best["tuned_at"] = datetime.now().isoformat(timespec="seconds")
+        models[Path(cfg["path"]).name] = best
+        save_host_profile(profile)
+        lines.append(
+            f"{name}: n_threads={best['n_threads']} n_batch={best['n_batch']} n_ctx={best['n_ctx']} "
+            f"(prompt {best.get('prompt_tok_s', 0)} tok/s, gen {best.get('gen_tok_s', 0)} tok/s)"
+        )
+    if not lines:
+        return f"No model named '{only}'." if only else "No models configured."
+    return f"Host profile written to {PROFILE_PATH}:\n" + "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    from config import MODEL_CONFIGS
+
+    parser = argparse.ArgumentParser(description="Tune llama.cpp settings for this machine.")
+    parser.add_argument("--model", choices=list(MODEL_CONFIGS), help="Tune a single model")
+    args = parser.parse_args()
+    print(autotune(MODEL_CONFIGS, only=args.model))
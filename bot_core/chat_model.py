@@ -1,18 +1,14 @@
-from llama_cpp import Llama
-from config import MISTRAL_PATH
+from bot_core.model_registry import get_handle
+from bot_core.generation_control import GenerationControl
 
-# Load the Mistral model
-chat_model = Llama(
-    model_path=MISTRAL_PATH,
-    n_ctx=4096,
-    n_threads=8,
-    n_batch=64,
-    n_gpu_layers=0
-)
+# Shared handle to the Mistral model; it is loaded on the first generate_chat() call
+chat_model = get_handle("chat")
 
-def generate_chat(prompt: str) -> str:
+def generate_chat(prompt: str, control: GenerationControl | None = None) -> str:
     """
     Uses the Mistral 7B model to generate a response for general conversation and reasoning tasks.
     """
-    result = chat_model(prompt, max_tokens=512, stop=["User:", "###"])
+    control = (control or GenerationControl.from_config()).start()
+    result = chat_model(prompt, max_tokens=control.cap_tokens(512), stopping_criteria=control.stopping_criteria(),
+                        stop=["User:", "###"])
     return result["choices"][0]["text"].strip()
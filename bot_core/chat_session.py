@@ -0,0 +1,297 @@
+# bot_core/chat_session.py
+
+"""
+Multi-turn chat sessions that reuse the llama.cpp KV cache between turns.
+A session keeps the transcript as the exact token list already evaluated by the model and
+sends each new turn as that list plus the new tokens. llama-cpp-python keeps the longest
+matching prefix of its previous input, so only the appended tokens are prefilled.
+When the transcript would no longer fit in the model's n_ctx, the oldest turns are dropped
+(optionally folded into a short summary) down to a low-water mark, so the one re-prefill a
+trim costs happens rarely rather than on every turn.
+
+Sessions can be saved to sessions/<model hash>/<name>.npz together with the llama.cpp
+state (KV cache), so resuming one costs a file read instead of a prefill.
+"""
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from bot_core.generation_control import GenerationControl
+from bot_core.logger_utils import log_error
+from bot_core.model_registry import hold
+from bot_core.tracing import span, traced_completion
+from bot_core.paths import SESSION_PATH
+from config import SESSION_TRIM_TARGET, SESSION_SUMMARIZE
+
+SESSION_FORMAT = 1
+
+USER_TAG = "USER:"
+ASSISTANT_TAG = "SAPPHIRA:"
+
+
+@dataclass
+class Turn:
+    role: str  # "user" or "assistant"
+    text: str
+    tokens: list[int] = field(default_factory=list)
+
+
+def _user_turn(llm, text: str) -> Turn:
+    return Turn("user", text, llm.tokenize(f"{USER_TAG} {text}\n{ASSISTANT_TAG}".encode("utf-8"), add_bos=False))
+
+
+def _answer_turn(llm, answer: str) -> Turn:
+    return Turn("assistant", answer, llm.tokenize(f" {answer}\n".encode("utf-8"), add_bos=False))
+
+
+class ChatSession:
+    """
+    Args:
+        model: A Llama object or a bot_core.model_registry.ModelHandle.
+        system_prompt (str): Text kept at the start of the context for the whole session.
+        summarize (bool): Fold trimmed turns into a one-paragraph summary instead of
+            dropping them.
+        trim_target (float): Fraction of n_ctx the transcript is cut down to when it overflows.
+    """
+
+    def __init__(self, model: Any, system_prompt: str = "", summarize: bool = SESSION_SUMMARIZE,
+                 trim_target: float = SESSION_TRIM_TARGET):
+        self.model = model
+        self.system_prompt = system_prompt
+        self.summarize = summarize
+        self.trim_target = trim_target
+        self.summary = ""
+        self.turns: list[Turn] = []
+        self._head_tokens: Optional[list[int]] = None  # system prompt (+ summary) tokens
+        self.prefilled = 0  # tokens evaluated by the last turn, for diagnostics
+
+    # --- transcript ---
+
+    def _head(self, llm) -> list[int]:
+        if self._head_tokens is None:
+            head = self.system_prompt
+            if self.summary:
+                head += f"Summary of the earlier conversation: {self.summary}\n"
+            self._head_tokens = llm.tokenize(head.encode("utf-8"), add_bos=True)
+        return self._head_tokens
+
+    def tokens(self, llm) -> list[int]:
+        """Token list of the whole transcript as it sits in the model's context."""
+        out = list(self._head(llm))
+        for turn in self.turns:
+            out.extend(turn.tokens)
+        return out
+
+    def transcript(self) -> list[str]:
+        return [f"{USER_TAG if t.role == 'user' else ASSISTANT_TAG} {t.text}" for t in self.turns]
+
+    def reset(self) -> None:
+        self.turns.clear()
+        self.summary = ""
+        self._head_tokens = None
+
+    # --- generation ---
+
+    def reply(self, text: str, max_tokens: int = 256, stop: Optional[list[str]] = None,
+              postprocess: Optional[Callable[[str], str]] = None,
+              control: Optional[GenerationControl] = None, **kwargs) -> str:
+        """
+        Append a user turn, generate the assistant's answer and append it to the transcript.
+
+        Args:
+            text (str): The user's message.
+            max_tokens (int): Tokens reserved for (and generated in) the answer.
+            stop (list[str]): Stop strings; defaults to the next turn tag.
+            postprocess (Callable): Cleans the raw answer before it enters the transcript.
+            control (GenerationControl): Cancellation and deadlines; a cut-off answer is
+                kept in the transcript as it is.
+            **kwargs: Passed on to create_completion (temperature, top_p, ...).
+
+        Returns:
+            The (post-processed) answer text.
+        """
+        if control is not None:
+            control.start()
+            max_tokens = control.cap_tokens(max_tokens)
+            kwargs["stopping_criteria"] = control.stopping_criteria()
+        with hold(self.model) as llm:
+            with span("prompt.build") as info:
+                self.turns.append(_user_turn(llm, text))
+                self._fit(llm, max_tokens)
+                prompt = self.tokens(llm)
+                self.prefilled = len(prompt) - self._reused_prefix(llm, prompt)
+                info.update(tokens=len(prompt), new_tokens=self.prefilled)
+            result = traced_completion(llm, prompt, max_tokens=max_tokens,
+                                       stop=stop or [USER_TAG, f"\n{ASSISTANT_TAG}"], **kwargs)
+            answer = result["choices"][0]["text"].strip()
+            if postprocess:
+                answer = postprocess(answer)
+            # The answer is re-tokenized with its separator; it matches the sampled tokens
+            # except at most at the boundary, which the next turn re-evaluates.
+            self.turns.append(_answer_turn(llm, answer))
+            return answer
+
+    def add_exchange(self, text: str, answer: str) -> None:
+        """Record a turn answered elsewhere (e.g. from the response cache) in the transcript."""
+        with hold(self.model) as llm:
+            self.turns.append(_user_turn(llm, text))
+            self.turns.append(_answer_turn(llm, answer))
+
+    @staticmethod
+    def _reused_prefix(llm, prompt: list[int]) -> int:
+        cached = llm.input_ids[: llm.n_tokens].tolist()
+        n = 0
+        for a, b in zip(cached, prompt):
+            if a != b:
+                break
+            n += 1
+        return n
+
+    def _fit(self, llm, max_tokens: int) -> None:
+        """Drop (or summarize) the oldest turns if the transcript plus answer overflows n_ctx."""
+        n_ctx = llm.n_ctx()
+        if len(self.tokens(llm)) + max_tokens <= n_ctx:
+            return
+        target = int(n_ctx * self.trim_target)
+        if len(self._head(llm)) + len(self.turns[-1].tokens) + max_tokens > target:
+            target = n_ctx  # the newest message alone is too large for the low-water mark
+        dropped: list[Turn] = []
+        # Always keep the newest user turn, and never start the window on an answer
+        while len(self.turns) > 1 and (len(self.tokens(llm)) + max_tokens > target
+                                       or self.turns[0].role == "assistant"):
+            dropped.append(self.turns.pop(0))
+        if dropped and self.summarize:
+            self.summary = self._summarize(llm, dropped)
+            self._head_tokens = None
+        overflow = len(self.tokens(llm)) + max_tokens - n_ctx
+        if overflow > 0 and self.summary:
+            # No room for the summary next to a very long message
+            self.summary = ""
+            self._head_tokens = None
+            overflow = len(self.tokens(llm)) + max_tokens - n_ctx
+        if overflow > 0:
+            # Keep the end of an oversized message (it carries the tag the answer follows)
+            self.turns[-1].tokens = self.turns[-1].tokens[overflow:]
+
+    def _summarize(self, llm, dropped: list[Turn]) -> str:
+        text = "\n".join(f"{USER_TAG if t.role == 'user' else ASSISTANT_TAG} {t.text}" for t in dropped)
+        if self.summary:
+            text = f"Earlier summary: {self.summary}\n{text}"
+        # Keep the summarization prompt inside the context window
+        text = text[-(llm.n_ctx() * 2):]
+        try:
+            result = llm.create_completion(
+                f"Summarize this conversation in at most three sentences.\n\n{text}\n\nSummary:",
+                max_tokens=96, temperature=0.2,
+            )
+            return result["choices"][0]["text"].strip()
+        except Exception as e:
+            log_error(f"Failed to summarize trimmed turns: {e}")
+            return self.summary
+
+
+# --- persistence ---
+
+def model_fingerprint(model_path) -> str:
+    """Short content hash of a model file (first MiB plus size); states are only valid per model."""
+    h = hashlib.sha256()
+    with open(model_path, "rb") as f:
+        h.update(f.read(1024 * 1024))
+    h.update(str(os.path.getsize(model_path)).encode())
+    return h.hexdigest()[:16]
+
+
+def session_file(model_path, name: str) -> Path:
+    return SESSION_PATH / model_fingerprint(model_path) / f"{name}.npz"
+
+
+def list_sessions(model_path) -> list[str]:
+    folder = SESSION_PATH / model_fingerprint(model_path)
+    return sorted(p.stem for p in folder.glob("*.npz"))
+
+
+def save_session(session: ChatSession, name: str = "autosave") -> Path:
+    """
+    Write the model's llama.cpp state, the transcript and the retrieval cache to one
+    compressed file. Only the score rows that hold logits are stored.
+    """
+    from bot_core.memory import retrieval_cache
+
+    with hold(session.model) as llm:
+        path = session_file(llm.model_path, name)
+        state = llm.save_state()
+        scores = np.asarray(state.scores)
+        rows = np.flatnonzero(scores.reshape(len(scores), -1).any(axis=1)) if scores.size else np.array([], dtype=np.int64)
+        meta = {
+            "format": SESSION_FORMAT,
+            "saved": time.time(),
+            "n_ctx": llm.n_ctx(),
+            "n_tokens": int(state.n_tokens),
+            "llama_state_size": int(state.llama_state_size),
+            "seed": getattr(state, "seed", None),
+            "scores_shape": list(scores.shape),
+            "system_prompt": session.system_prompt,
+            "summary": session.summary,
+            "head_tokens": session._head(llm),
+            "turns": [{"role": t.role, "text": t.text, "tokens": t.tokens} for t in session.turns],
+            "retrieval": [[q, k, hits] for (q, k), hits in retrieval_cache.items()],
+        }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        np.savez_compressed(
+            f,
+            meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+            input_ids=np.asarray(state.input_ids)[: state.n_tokens],
+            score_rows=rows,
+            scores=scores[rows],
+            llama_state=np.frombuffer(bytes(state.llama_state), dtype=np.uint8),
+        )
+    os.replace(tmp, path)
+    return path
+
+
+def load_session(session: ChatSession, name: str = "autosave") -> bool:
+    """
+    Restore a saved session into `session` and its model. Returns False when there is no
+    save for this model; raises ValueError when the save does not fit the loaded model.
+    """
+    from llama_cpp import LlamaState
+    from bot_core.memory import retrieval_cache
+
+    with hold(session.model) as llm:
+        path = session_file(llm.model_path, name)
+        if not path.exists():
+            return False
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            if meta.get("format") != SESSION_FORMAT:
+                raise ValueError(f"{path.name} was written by an incompatible version.")
+            if meta["n_ctx"] != llm.n_ctx():
+                raise ValueError(f"{path.name} was saved with n_ctx={meta['n_ctx']}, "
+                                 f"but the model runs with n_ctx={llm.n_ctx()}.")
+            scores = np.zeros(meta["scores_shape"], dtype=data["scores"].dtype)
+            scores[data["score_rows"]] = data["scores"]
+            input_ids = np.zeros(llm.n_ctx(), dtype=data["input_ids"].dtype)
+            input_ids[: meta["n_tokens"]] = data["input_ids"]
+            fields = dict(input_ids=input_ids, scores=scores, n_tokens=meta["n_tokens"],
+                          llama_state=data["llama_state"].tobytes(),
+                          llama_state_size=meta["llama_state_size"])
+            if meta.get("seed") is not None:
+                fields["seed"] = meta["seed"]
+        llm.load_state(LlamaState(**fields))
+
+        session.system_prompt = meta["system_prompt"]
+        session.summary = meta["summary"]
+        session._head_tokens = meta["head_tokens"]
+        session.turns = [Turn(t["role"], t["text"], t["tokens"]) for t in meta["turns"]]
+    retrieval_cache.clear()
+    for query, top_k, hits in meta["retrieval"]:
+        retrieval_cache[(query, top_k)] = hits
+    return True
@@ -0,0 +1,222 @@
+# bot_core/code_chunker.py
+
+"""
+Structure-aware chunking of source files.
+Python is split with `ast` at top-level function and class boundaries; classes too large for
+one chunk are split into their methods. JavaScript/TypeScript and CSS-like files go through a
+small tokenizer that tracks strings, comments and brace depth, closing a chunk at each
+top-level block. Loose statements between definitions (imports, constants) are grouped.
+Every chunk carries the symbol it defines so the symbol index can resolve it directly.
+"""
+import ast
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+from config import MAX_CHUNK_CHARS
+
+PYTHON_EXTS = (".py",)
+BRACE_EXTS = (".js", ".jsx", ".ts", ".tsx", ".css", ".scss", ".less")
+CODE_EXTS = PYTHON_EXTS + BRACE_EXTS
+
+_BRACE_SYMBOL = re.compile(
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:declare\s+)?(?:abstract\s+)?(?:async\s+)?"
+    r"(?:function\s*\*?\s*(?P<func>[\w$]+)|class\s+(?P<cls>[\w$]+)|interface\s+(?P<iface>[\w$]+)"
+    r"|enum\s+(?P<enum>[\w$]+)|type\s+(?P<type>[\w$]+)|(?:const|let|var)\s+(?P<var>[\w$]+))",
+    re.MULTILINE,
+)
+_METHOD = re.compile(r"^\s*(?:static\s+|async\s+|get\s+|set\s+|public\s+|private\s+|protected\s+)*"
+                     r"(?P<name>[\w$]+)\s*\(", re.MULTILINE)
+_NOT_METHODS = {"if", "for", "while", "switch", "catch", "return", "function"}
+
+
+@dataclass
+class CodeChunk:
+    symbol: Optional[str]  # "func", "Class" or "Class.method"; None for loose statements
+    text: str
+    start_line: int
+    end_line: int
+
+    def render(self, name: str) -> str:
+        label = f" {self.symbol}" if self.symbol else ""
+        return f"# {name}{label} (lines {self.start_line}-{self.end_line})\n{self.text}"
+
+
+def _split_long(chunk: CodeChunk, max_chars: int) -> list[CodeChunk]:
+    """Split a chunk that is still too long on line boundaries, keeping its symbol."""
+    if len(chunk.text) <= max_chars:
+        return [chunk]
+    parts, lines, start = [], [], chunk.start_line
+    size = 0
+    for offset, line in enumerate(chunk.text.splitlines(keepends=True)):
+        if lines and size + len(line) > max_chars:
+            parts.append(CodeChunk(chunk.symbol, "".join(lines), start, chunk.start_line + offset - 1))
+            lines, size, start = [], 0, chunk.start_line + offset
+        lines.append(line[:max_chars])
+        size += len(line[:max_chars])
+    if lines:
+        parts.append(CodeChunk(chunk.symbol, "".join(lines), start, chunk.end_line))
+    return parts
+
+
+def _group_loose(chunks: list[CodeChunk], max_chars: int) -> list[CodeChunk]:
+    """Merge adjacent chunks of the same symbol (or of loose statements) while they fit."""
+    merged: list[CodeChunk] = []
+    for chunk in chunks:
+        prev = merged[-1] if merged else None
+        if (prev is not None and prev.symbol == chunk.symbol
+                and len(prev.text) + len(chunk.text) + 1 <= max_chars):
+            merged[-1] = CodeChunk(chunk.symbol, prev.text.rstrip("\n") + "\n" + chunk.text, prev.start_line,
+                                   chunk.end_line)
+        else:
+            merged.append(chunk)
+    return merged
+
+
+def _finish(chunks: list[CodeChunk], max_chars: int) -> list[CodeChunk]:
+    chunks = [c for c in chunks if c.text.strip()]
+    return [part for chunk in _group_loose(chunks, max_chars) for part in _split_long(chunk, max_chars)]
+
+
+def chunk_python(source: str, max_chars: int = MAX_CHUNK_CHARS) -> Optional[list[CodeChunk]]:
+    """Chunks at def/class boundaries, or None if the source does not parse."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    lines = source.splitlines(keepends=True)
+
+    def text(start: int, end: int) -> str:
+        return "".join(lines[start - 1:end])
+
+    def first_line(node) -> int:
+        return min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+
+    chunks: list[CodeChunk] = []
+    loose_start = 1
+    for node in tree.body:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        start, end = first_line(node), node.end_lineno
+        if start > loose_start:
+            chunks.append(CodeChunk(None, text(loose_start, start - 1), loose_start, start - 1))
+        if isinstance(node, ast.ClassDef) and len(text(start, end)) > max_chars:
+            methods = [n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            body_start = start
+            for method in methods:
+                m_start = first_line(method)
+                if m_start > body_start:
+                    # Class line, docstring and attributes before this method
+                    chunks.append(CodeChunk(node.name, text(body_start, m_start - 1), body_start, m_start - 1))
+                chunks.append(CodeChunk(f"{node.name}.{method.name}", text(m_start, method.end_lineno),
+                                        m_start, method.end_lineno))
+                body_start = method.end_lineno + 1
+            if body_start <= end:
+                chunks.append(CodeChunk(node.name, text(body_start, end), body_start, end))
+        else:
+            chunks.append(CodeChunk(node.name, text(start, end), start, end))
+        loose_start = end + 1
+    if loose_start <= len(lines):
+        chunks.append(CodeChunk(None, text(loose_start, len(lines)), loose_start, len(lines)))
+    return _finish(chunks, max_chars)
+
+
+def _top_level_blocks(source: str) -> list[tuple[int, int]]:
+    """
+    Character spans of top-level statements: each ends at a '}' or ';' at depth 0.
+    Strings, template literals and comments are skipped so braces inside them do not count.
+    """
+    spans, depth, start, i, n = [], 0, 0, 0, len(source)
+    while i < n:
+        c = source[i]
+        if c in "\"'`":
+            i += 1
+            while i < n and source[i] != c:
+                i += 2 if source[i] == "\\" else 1
+        elif source.startswith("//", i):
+            i = source.find("\n", i)
+            i = n if i < 0 else i
+        elif source.startswith("/*", i):
+            i = source.find("*/", i + 2)
+            i = n if i < 0 else i + 1
+        elif c in "{([":
+            depth += 1
+        elif c in "})]":
+            depth = max(0, depth - 1)
+            if depth == 0 and c == "}":
+                # `} else {`, `}, ...` and `});` continue the same statement
+                rest = source[i + 1:i + 40].lstrip(" \t")
+                if not rest.startswith((")", ",", ".", "else", "catch", "finally", "while")):
+                    end = i + 1 + (1 if rest.startswith(";") else 0)
+                    spans.append((start, end))
+                    start = end
+        elif c == ";" and depth == 0:
+            spans.append((start, i + 1))
+            start = i + 1
+        i += 1
+    if start < n:
+        spans.append((start, n))
+    return spans
+
+
+def _brace_symbol(text: str, css: bool) -> Optional[str]:
+    if css:
+        selector = text.split("{", 1)[0].strip() if "{" in text else ""
+        return selector or None
+    match = _BRACE_SYMBOL.search(text)
+    if not match:
+        return None
+    return next(value for value in match.groupdict().values() if value)
+
+
+def chunk_braces(source: str, ext: str, max_chars: int = MAX_CHUNK_CHARS) -> list[CodeChunk]:
+    """Chunks at top-level blocks of brace-delimited languages (JS/TS, CSS/SCSS/LESS)."""
+    css = ext in (".css", ".scss", ".less")
+    chunks: list[CodeChunk] = []
+    line = 1
+    for start, end in _top_level_blocks(source):
+        block = source[start:end]
+        leading = len(block) - len(block.lstrip("\n"))
+        first = line + leading
+        line += block.count("\n")
+        block = block.strip("\n")
+        if not block.strip():
+            continue
+        symbol = _brace_symbol(block, css)
+        chunk = CodeChunk(symbol, block + "\n", first, first + block.count("\n"))
+        if not css and symbol and len(block) > max_chars and re.match(r"\s*(?:export\s+)?(?:default\s+)?class\b", block):
+            chunks.extend(_split_class(chunk, max_chars))
+        else:
+            chunks.append(chunk)
+    return _finish(chunks, max_chars)
+
+
+def _split_class(chunk: CodeChunk, max_chars: int) -> list[CodeChunk]:
+    """Split an oversized JS/TS class body into per-method chunks."""
+    open_at = chunk.text.index("{") + 1
+    body = chunk.text[open_at:chunk.text.rindex("}")]
+    head_line = chunk.start_line + chunk.text[:open_at].count("\n")
+    parts = [CodeChunk(chunk.symbol, chunk.text[:open_at] + "\n", chunk.start_line, head_line)]
+    line = head_line
+    for start, end in _top_level_blocks(body):
+        block = body[start:end]
+        first = line + len(block) - len(block.lstrip("\n"))
+        line += block.count("\n")
+        block = block.strip("\n")
+        if not block.strip():
+            continue
+        match = _METHOD.match(block)
+        name = match.group("name") if match and match.group("name") not in _NOT_METHODS else None
+        symbol = f"{chunk.symbol}.{name}" if name else chunk.symbol
+        parts.append(CodeChunk(symbol, block + "\n", first, first + block.count("\n")))
+    parts.append(CodeChunk(chunk.symbol, "}\n", chunk.end_line, chunk.end_line))
+    return parts
+
+
+def chunk_code(source: str, ext: str, max_chars: int = MAX_CHUNK_CHARS) -> Optional[list[CodeChunk]]:
+    """Split source by structure; None when the language is unknown or Python fails to parse."""
+    if ext in PYTHON_EXTS:
+        return chunk_python(source, max_chars)
+    if ext in BRACE_EXTS:
+        return chunk_braces(source, ext, max_chars)
+    return None
@@ -1,18 +1,14 @@
-from llama_cpp import Llama
-from config import CODELLAMA_PATH
+from bot_core.model_registry import get_handle
+from bot_core.generation_control import GenerationControl
 
-# Load the CodeLLaMA model
-code_model = Llama(
-    model_path=CODELLAMA_PATH,
-    n_ctx=4096,
-    n_threads=8,
-    n_batch=64,
-    n_gpu_layers=0
-)
+# Shared handle to the CodeLLaMA model; it is loaded on the first generate_code() call
+code_model = get_handle("code")
 
-def generate_code(prompt: str) -> str:
+def generate_code(prompt: str, control: GenerationControl | None = None) -> str:
     """
     Uses the CodeLLaMA 13B Instruct model to generate or edit code from prompts.
     """
-    result = code_model(prompt, max_tokens=768, stop=["###", "User:"])
+    control = (control or GenerationControl.from_config()).start()
+    result = code_model(prompt, max_tokens=control.cap_tokens(768), stopping_criteria=control.stopping_criteria(),
+                        stop=["###", "User:"])
     return result["choices"][0]["text"].strip()
@@ -14,12 +14,22 @@ from colorama import Fore, Style, init as colorama_init
 from loguru import logger as training_logger
 
 from bot_core.memory import clear_memory, export_conversation, memory_status
-from bot_core.logger_utils import log_error
+from bot_core.logger_utils import log_error, exclude_traces
 from bot_core.constants_config import HELP_TEXT
 from bot_core.ocr_tools import ocr_test, ocr_scan_file, ocr_extract_all
 from bot_core.learning import learn_all_supported_files
+from bot_core.import_watcher import watcher
+from bot_core.media_catalog import catalog
+from bot_core.dedup_index import dedup_index
 from bot_core.formatting import format_user_input, format_sapphira_response
 from bot_core.code_generation import generate_file, generate_patch  # helpers for file generation and patching
+from bot_core.response_cache import response_cache
+from bot_core.autotune import autotune
+from bot_core.learned_router import router
+from bot_core.tracing import perf_report
+from bot_core.model_llamacpp import get_session
+from bot_core.chat_session import save_session, load_session, list_sessions
+from config import MODEL_CONFIGS
 
 # Initialize colorama
 colorama_init(autoreset=True)
@@ -57,7 +67,7 @@ IMPORT_DIR = Path("IMPORT FILES")
 IMPORT_BACKUP_DIR = Path("import_backups")
 
 # Setup training logger
-training_logger.add(str(TRAIN_LOG), level="INFO")
+training_logger.add(str(TRAIN_LOG), level="INFO", filter=exclude_traces)
 with CONFIG_PATH.open("r", encoding="utf-8") as f:
     config = json.load(f)
 
@@ -129,6 +139,34 @@ for d in (GENERATED_DIR, PATCH_BACKUP_DIR, IMPORT_DIR, IMPORT_BACKUP_DIR):
 
 # === COMMAND DISPATCH ===
 
+def session_command(args: list[str]) -> str:
+    session = get_session()
+    if session is None:
+        return "No model session is running."
+    action = args[0].lower() if args else "list"
+    name = args[1] if len(args) > 1 else "autosave"
+    try:
+        match action:
+            case "save":
+                path = save_session(session, name)
+                return f"Session '{name}' saved ({path.stat().st_size / (1024 * 1024):.1f} MB, {len(session.turns)} turns)."
+            case "load":
+                if not load_session(session, name):
+                    return f"No saved session named '{name}' for this model."
+                return f"Session '{name}' restored with {len(session.turns)} turns."
+            case "list":
+                names = list_sessions(session.model.model_path)
+                return "Saved sessions: " + ", ".join(names) if names else "No saved sessions for this model."
+            case "reset":
+                session.reset()
+                return "Session cleared; the next turn starts a new conversation."
+            case _:
+                return "Usage: /session save|load [name] | /session list | /session reset"
+    except (OSError, ValueError) as e:
+        log_error(f"/session {action} failed: {e}")
+        return f"Session {action} failed: {e}"
+
+
 def handle_command(prompt: str) -> Optional[str]:
     global memory_enabled, pending_generation
     try:
@@ -209,12 +247,58 @@ def handle_command(prompt: str) -> Optional[str]:
                     return format_sapphira_response(f"Opened {latest[0].name}")
                 return format_sapphira_response("No memory export found to open.")
 
+            # Chat sessions
+            case _ if lower == "/session" or lower.startswith("/session "):
+                return format_sapphira_response(session_command(cmd.split()[1:]))
+
+            # Response cache
+            case "/cache status":
+                return format_sapphira_response(response_cache.status())
+            case "/cache clear":
+                response_cache.clear()
+                return format_sapphira_response("Response cache cleared.")
+            case "/cache off":
+                response_cache.enabled = False
+                return format_sapphira_response("Response cache is now OFF. Every prompt will be answered fresh.")
+            case "/cache on":
+                response_cache.enabled = True
+                return format_sapphira_response("Response cache is now ON.")
+
+            # Performance tuning
+            case _ if lower == "/autotune" or lower.startswith("/autotune "):
+                parts = cmd.split(maxsplit=1)
+                only = parts[1] if len(parts) > 1 else None
+                return format_sapphira_response(autotune(MODEL_CONFIGS, only=only))
+            case "/perf":
+                return format_sapphira_response(perf_report())
+            case "/router status":
+                return format_sapphira_response(router.status())
+            case "/router eval":
+                accuracy = router.evaluate()
+                return format_sapphira_response(f"Routing accuracy on exemplars (leave-one-out): {accuracy:.0%}")
+
             # Learning & OCR
             case "/learn all":
-                start = time.time()
-                learned = learn_all_supported_files()
-                duration = time.time() - start
-                return format_sapphira_response(f"Learned from {len(learned)} files in {duration:.2f}s: {', '.join(learned)}")
+                report = learn_all_supported_files()
+                return format_sapphira_response(report.summary())
+            case "/watch on":
+                mode = watcher.start()
+                return format_sapphira_response(f"Watching '{watcher.root}' for new files ({mode}).")
+            case "/watch off":
+                watcher.stop()
+                return format_sapphira_response("Import watcher stopped.")
+            case "/watch" | "/watch status":
+                return format_sapphira_response(watcher.status())
+            case "/media" | "/media status":
+                return format_sapphira_response(catalog.status())
+            case _ if lower.startswith("/media find"):
+                parts = cmd.split(maxsplit=2)
+                if len(parts) < 3:
+                    return format_sapphira_response(
+                        "Usage: /media find <words> [kind:video] [ext:.mp4] [mime:audio/] [>100MB] [<1GB]")
+                return format_sapphira_response(catalog.format(catalog.find(parts[2])))
+            case "/dedup":
+                return format_sapphira_response(dedup_index.report())
             case "/learn summary":
                 return format_sapphira_response(get_learned_summary())
             case "/vector status":
@@ -227,8 +311,8 @@ def handle_command(prompt: str) -> Optional[str]:
                     return format_sapphira_response("Usage: /ocr scan <filename>")
                 return format_sapphira_response(ocr_scan_file(parts[2]))
             case "/ocr extract all":
-                results = ocr_extract_all()
-                return format_sapphira_response(f"OCR complete: {', '.join(results)}")
+                results, report = ocr_extract_all()
+                return format_sapphira_response(f"OCR complete: {', '.join(results)}\n{report.summary()}")
 
             # File generation
             case _ if lower.startswith("/generate file"):
@@ -10,12 +10,14 @@ CONFIG_PATH = Path("config.json")
 LOG_PATH = Path("logs/conversation_log.txt")
 MEMORY_PATH = Path("logs/history_memory.txt")
 EXPORT_DIR = Path("logs/exports")
+# Where /ocr extract all writes its *_ocr.txt files (outside IMPORT_DIR, so they are not re-ingested)
+OCR_EXPORT_DIR = EXPORT_DIR / "ocr"
 
 # Where you drop files to be ingested/learned
 IMPORT_DIR = Path("IMPORT FILES")
 
 # Make sure all these directories exist at startup
-for d in (LOG_PATH.parent, EXPORT_DIR, IMPORT_DIR):
+for d in (LOG_PATH.parent, EXPORT_DIR, OCR_EXPORT_DIR, IMPORT_DIR):
     d.mkdir(parents=True, exist_ok=True)
 
 # --- Supported file extensions for ingestion ---
@@ -38,6 +40,7 @@ ALLOWED_EXTS = [
 
     # Audio
     ".mp3", ".wav", ".flac", ".aac", ".ogg", ".opus", ".wma", ".m4a", ".m4b", ".alac",
+    ".aif", ".aiff", ".aifc",
 
     # Video
     ".mp4", ".avi", ".mov", ".mkv", ".flv", ".webm", ".wmv", ".mpeg", ".mpg",
@@ -51,7 +54,7 @@ ALLOWED_EXTS = [
     ".sqlite", ".sqlite3", ".parquet", ".avro", ".orc", ".msgpack", ".arrow",
 
     # ML models
-    ".pt", ".pth", ".pb", ".onnx", ".ckpt",
+    ".pt", ".pth", ".pb", ".onnx", ".ckpt", ".gguf", ".safetensors",
 
     # Notebooks
     ".ipynb",
@@ -99,13 +102,36 @@ Memory Commands:
   /memory list             List all exported memory files available.
   /memory open             Open the most recent memory export.
 
+Session Commands:
+  /session save [name]     Save the conversation and the model's context (default: autosave).
+  /session load [name]     Resume a saved conversation without re-reading it into the model.
+  /session list            List saved sessions for the loaded model.
+  /session reset           Start a new conversation.
+
+Response Cache Commands:
+  /cache status            Show cached answers and hit/miss counts.
+  /cache clear             Drop all cached answers.
+  /cache on | /cache off   Enable or disable answering repeated prompts from the cache.
+
+Performance Commands:
+  /autotune [model]        Benchmark thread and batch settings on this machine
+                           and save the fastest ones to the host profile.
+  /perf                    Show p50/p95 latency per stage (retrieval, prompt, prefill, decode) over recent turns.
+  /router status           Show the router's cost weight, cached decisions and model latencies.
+  /router eval             Measure routing accuracy on the labelled exemplars.
+
 Learning & OCR Commands:
   /learn all               Learn from all supported files in the project workspace.
+  /watch on | /watch off   Learn new or changed import files automatically in the background.
+  /watch status            Show the import watcher's mode, pending changes and last batch.
+  /media find <query>      Find imported media and binaries by name, kind:, ext:, mime: or size (>100MB).
+  /media status            Show cataloged media counts and sizes by kind.
+  /dedup                   Show near-duplicate chunks filtered during the last ingest.
   /learn summary           Show a summary of learned knowledge (shard counts, vector status).
   /vector status           Report storage size and chunk counts of the vector database.
   /ocr test                Run the OCR test suite to verify functionality.
   /ocr scan <filename>     Perform OCR scan on the specified file.
-  /ocr extract all         Extract text from all imported files using OCR.
+  /ocr extract all         Extract text from all imported files using OCR into logs/exports/ocr (parallel pages, reports pages/s).
 
 File Generation & Patching:
   /generate file <filename> <description>
@@ -0,0 +1,196 @@
+# bot_core/dedup_index.py
+
+"""
+Near-duplicate detection for chunks about to be embedded (memory/dedup_index.npz).
+Each chunk gets a MinHash signature over its word shingles; signatures are split into LSH
+bands, so a new chunk is compared only against chunks sharing at least one band bucket
+instead of the whole store. A candidate whose estimated Jaccard similarity reaches
+DEDUP_THRESHOLD makes the new chunk a duplicate: in "link" mode it is stored pointing at the
+original and left out of the embeddings, in "drop" mode it is not stored at all.
+Re-imported copies, exported versions and OCR text files copied into the import folder
+then cost one signature each instead of an embedding and a top-k slot.
+"""
+import re
+import threading
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from bot_core.logger_utils import log_error
+from config import DEDUP_MODE, DEDUP_NUM_PERM, DEDUP_SHINGLE_WORDS, DEDUP_THRESHOLD
+
+DEDUP_INDEX_PATH = Path("memory/dedup_index.npz")
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD = re.compile(r"\w+")
+# Candidates are verified on the full signature, so the bands aim below the threshold:
+# a missed candidate is a missed duplicate, an extra one only costs a comparison
+BAND_MARGIN = 0.1
+
+
+def _bands(threshold: float, num_perm: int) -> tuple[int, int]:
+    """
+    (bands, rows) with bands * rows <= num_perm whose LSH S-curve midpoint (1/b)^(1/r) is
+    closest to threshold - BAND_MARGIN (ties go to using more permutations). At 0.85 and
+    128 permutations that is 10x8, a candidate for ~96% of pairs exactly at the threshold.
+    """
+    target = max(threshold - BAND_MARGIN, 0.05)
+    options = [(b, r) for b in range(1, num_perm + 1) for r in range(1, num_perm // b + 1)]
+    return min(options, key=lambda br: (abs((1 / br[0]) ** (1 / br[1]) - target), -br[0] * br[1]))
+
+
+def shingles(text: str, size: int = DEDUP_SHINGLE_WORDS) -> np.ndarray:
+    """32-bit hashes of the word n-grams of lowercased text (the whole text if shorter)."""
+    words = _WORD.findall(text.lower())
+    if len(words) <= size:
+        grams = [" ".join(words)] if words else [text.strip()]
+    else:
+        grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64)
+
+
+class DedupIndex:
+    def __init__(self, path: Path = DEDUP_INDEX_PATH, threshold: float = DEDUP_THRESHOLD,
+                 num_perm: int = DEDUP_NUM_PERM, mode: str = DEDUP_MODE):
+        self.path = path
+        self.threshold = threshold
+        self.mode = mode
+        self.num_perm = num_perm
+        self.bands, self.rows = _bands(threshold, num_perm)
+        rng = np.random.RandomState(1)
+        self._a = rng.randint(1, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+
+        self.signatures: dict[str, np.ndarray] = {}
+        self.sources: dict[str, str] = {}
+        self._buckets: list[dict[bytes, list[str]]] = [{} for _ in range(self.bands)]
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+        # Duplicates found since reset_report(): source -> count, and (source, original) pairs
+        self.run_checked = 0
+        self.run_duplicates: Counter = Counter()
+        self.run_links: dict[str, Counter] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("link", "drop")
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingles(text)
+        # Permuted hashes of every shingle at once: (a * h + b) mod p, truncated to 32 bits
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path.exists():
+            return
+        try:
+            with np.load(self.path) as data:
+                if data["signatures"].shape[1:] != (self.num_perm,):
+                    # DEDUP_NUM_PERM changed; old signatures are not comparable
+                    return
+                for chunk_id, source, signature in zip(data["ids"], data["sources"], data["signatures"]):
+                    self._insert(str(chunk_id), str(source), signature)
+        except (OSError, KeyError, ValueError) as e:
+            log_error(f"Ignoring unreadable dedup index {self.path}: {e}")
+
+    def _insert(self, chunk_id: str, source: str, signature: np.ndarray) -> None:
+        self.signatures[chunk_id] = signature
+        self.sources[chunk_id] = source
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            band.setdefault(key, []).append(chunk_id)
+
+    def _match(self, signature: np.ndarray) -> Optional[str]:
+        candidates = set()
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(band.get(key, ()))
+        best, best_sim = None, self.threshold
+        for chunk_id in candidates:
+            sim = float(np.mean(self.signatures[chunk_id] == signature))
+            if sim >= best_sim:
+                best, best_sim = chunk_id, sim
+        return best
+
+    def check(self, chunk_id: str, text: str, source: str) -> Optional[str]:
+        """
+        Return the id of a stored near-duplicate of `text`, or register the chunk under
+        `chunk_id` and return None.
+        """
+        signature = self.signature(text)
+        with self._lock:
+            self._load()
+            self.run_checked += 1
+            original = self._match(signature)
+            if original is None:
+                self._insert(chunk_id, source, signature)
+                self._dirty = True
+                return None
+            self.run_duplicates[source] += 1
+            self.run_links.setdefault(source, Counter())[self.sources[original]] += 1
+            return original
+
+    def drop_chunks(self, chunk_ids) -> None:
+        chunk_ids = set(chunk_ids)
+        with self._lock:
+            self._load()
+            chunk_ids.intersection_update(self.signatures)
+            if not chunk_ids:
+                return
+            for chunk_id in chunk_ids:
+                for band, key in zip(self._buckets, self._band_keys(self.signatures.pop(chunk_id))):
+                    bucket = band.get(key, [])
+                    if chunk_id in bucket:
+                        bucket.remove(chunk_id)
+                    if not bucket:
+                        band.pop(key, None)
+                del self.sources[chunk_id]
+            self._dirty = True
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            ids = list(self.signatures)
+            signatures = (np.stack([self.signatures[i] for i in ids]) if ids
+                          else np.zeros((0, self.num_perm), dtype=np.uint32))
+            tmp = self.path.with_name(self.path.name + ".tmp.npz")
+            np.savez(tmp, ids=np.array(ids, dtype=str), signatures=signatures,
+                     sources=np.array([self.sources[i] for i in ids], dtype=str))
+            tmp.replace(self.path)
+            self._dirty = False
+
+    def reset_report(self) -> None:
+        with self._lock:
+            self.run_checked = 0
+            self.run_duplicates = Counter()
+            self.run_links = {}
+
+    def report(self, limit: int = 10) -> str:
+        """Duplicates found since the last reset_report(), worst sources first."""
+        total = sum(self.run_duplicates.values())
+        if not self.enabled:
+            return "Near-duplicate filter is off (DEDUP_MODE)."
+        action = "linked" if self.mode == "link" else "dropped"
+        text = (f"Near-duplicates (Jaccard >= {self.threshold:.2f}, {self.bands}x{self.rows} LSH bands): "
+                f"{total} of {self.run_checked} chunks {action}, {len(self.signatures)} signatures indexed")
+        for source, count in self.run_duplicates.most_common(limit):
+            originals = ", ".join(f"{orig or '?'} ({n})" for orig, n in self.run_links[source].most_common(3))
+            text += f"\n  {source}: {count} duplicate chunks of {originals}"
+        if len(self.run_duplicates) > limit:
+            text += f"\n  ... and {len(self.run_duplicates) - limit} more files"
+        return text
+
+
+dedup_index = DedupIndex()
@@ -1,125 +1,368 @@
 # bot_core/file_ingestor.py
 
+import io
+import json
 import logging
+import threading
+import time
+from itertools import groupby
 from pathlib import Path
-import magic
+from typing import Any, BinaryIO, Callable, Iterator, Optional, Union
+from tqdm import tqdm
 
-from bot_core.constants_config import ALLOWED_EXTS, IMPORT_DIR
+from bot_core.archive_reader import is_archive, iter_members
+from bot_core.code_chunker import CODE_EXTS, chunk_code
+from bot_core.constants_config import IMPORT_DIR
+from bot_core.dedup_index import dedup_index
+from bot_core.file_types import SNIFF_BYTES, classify, classify_buffer, is_supported, scan_files, suffix
+from bot_core.ingest_manifest import IngestManifest, IngestPlan
+from bot_core.ingest_pool import IngestReport, default_workers, iter_normalized
+from bot_core.media_catalog import catalog, probe
+from bot_core.ocr_cache import ocr_cache
+from bot_core.symbol_index import symbol_index
+from bot_core.table_reader import TABLE_SUFFIXES, table_blocks
+from config import INGEST_WORKERS, INGEST_FILE_TIMEOUT, INGEST_QUEUE_SIZE, INGEST_TEXT_WINDOW, MAX_CHUNK_CHARS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize python-magic for MIME detection
-_mime = magic.Magic(mime=True)
+# One ingestion at a time: /learn all and the import watcher share the manifest and shards
+_ingest_lock = threading.Lock()
 
 
-def discover_files(root: Path) -> list[Path]:
+def discover_files(root: Path, stats: Optional[dict] = None) -> list[Path]:
     """
     Recursively discover all files under `root` matching known extensions.
+    Pass a dict as `stats` to receive each file's stat result for reuse.
     """
-    files = [
-        p for p in root.rglob("*")
-        if p.is_file() and p.suffix.lower() in ALLOWED_EXTS
-    ]
-    logger.info(f"Discovered {len(files)} files for ingestion under {root}")
-    return files
+    start = time.perf_counter()
+    found = scan_files(root)
+    seconds = time.perf_counter() - start
+    if stats is not None:
+        stats.update(found)
+    rate = len(found) / seconds if seconds else 0.0
+    logger.info(f"Discovered {len(found)} files for ingestion under {root} in {seconds:.2f}s ({rate:.0f} files/s)")
+    return list(found)
 
 
 def detect_mime(path: Path) -> str:
     """
-    Return the true MIME type of a file using libmagic.
+    Return the true MIME type of a file (extension and header sniff, libmagic when ambiguous).
     """
-    try:
-        return _mime.from_file(str(path))
-    except Exception as e:
-        logger.warning(f"MIME detection failed for {path}: {e}")
-        return "application/octet-stream"
+    return classify(path)
+
+
+# A reader source is a file path or, for archive members, a binary stream
+Source = Union[Path, BinaryIO]
+
+
+def _text_windows(src: Source, window: int = INGEST_TEXT_WINDOW) -> Iterator[str]:
+    """Yield text in pieces of about `window` characters, split on line ends."""
+    buf, size = [], 0
+    f = (src.open("r", encoding="utf-8", errors="ignore") if isinstance(src, Path)
+         else io.TextIOWrapper(src, encoding="utf-8", errors="ignore"))
+    with f:
+        # readline(window) also bounds a single enormous line (minified JSON, logs)
+        for line in iter(lambda: f.readline(window), ""):
+            buf.append(line)
+            size += len(line)
+            if size >= window:
+                yield "".join(buf)
+                buf, size = [], 0
+    if buf:
+        yield "".join(buf)
+
+
+def _pdf_pages(src: Source) -> Iterator[str]:
+    """Yield the text of a PDF one page at a time; pages of unchanged PDFs come from the OCR cache."""
+    from bot_core.ocr_engine import iter_pdf_pages
+    for text in iter_pdf_pages(src, ocr_cache.digest(src)):
+        yield text + "\n"
+
 
+def _ocr_image(src: Source) -> Iterator[str]:
+    from PIL import Image
+    from bot_core.ocr_engine import ocr_image
 
-def normalize(path: Path) -> tuple[str, any]:
+    def read() -> str:
+        with Image.open(src) as img:
+            return ocr_image(img)
+
+    yield ocr_cache.page(ocr_cache.digest(src), 0, read)
+
+
+def _code_chunks(src: Source, name: str, window: int = INGEST_TEXT_WINDOW) -> Iterator[list]:
     """
-    Normalize file content based on its MIME type.
-    Returns a tuple of (kind, payload):
-      - kind="text" and payload=str
-      - kind="table" and payload=str
-      - kind="media" and payload=dict metadata
+    Yield [symbol, chunk] pairs of a source file split at definitions (see code_chunker).
+    Files larger than one text window, or that fail to parse, fall back to plain text
+    windows with no symbol.
     """
-    mime_type = detect_mime(path)
+    f = (src.open("r", encoding="utf-8", errors="ignore") if isinstance(src, Path)
+         else io.TextIOWrapper(src, encoding="utf-8", errors="ignore"))
+    with f:
+        source = f.read(window + 1)
+        chunks = chunk_code(source, suffix(name), MAX_CHUNK_CHARS - 80) if len(source) <= window else None
+        if chunks is None:
+            yield [None, source]
+            for piece in iter(lambda: f.read(window), ""):
+                yield [None, piece]
+            return
+    label = Path(name).name
+    for chunk in chunks:
+        yield [chunk.symbol, chunk.render(label)]
+
+
+def _reader_for(name: str, mime_type: str) -> tuple[str, Optional[Callable[[Source], Iterator[str]]]]:
+    """Pick (kind, reader) for a file; reader is None for media without readable content."""
+    ext = suffix(name)
+
+    # Spreadsheets, CSV/TSV and Parquet (checked first: libmagic reports CSV as text/*)
+    if "spreadsheet" in mime_type or ext in TABLE_SUFFIXES:
+        return "table", lambda src: table_blocks(src, ext)
+
+    # Source code, split at definitions
+    if ext in CODE_EXTS and mime_type.startswith("text/"):
+        return "code", lambda src: _code_chunks(src, name)
 
     # Text files and JSON
     if mime_type.startswith("text/") or mime_type == "application/json":
-        try:
-            text = path.read_text(encoding="utf-8", errors="ignore")
-            return "text", text
-        except Exception as e:
-            logger.error(f"Failed to read text from {path}: {e}")
-            return "media", {"path": str(path), "mime": mime_type}
-
-    # Spreadsheets and CSV/TSV
-    if "spreadsheet" in mime_type or path.suffix.lower() in (".csv", ".tsv"):
-        try:
-            import pandas as pd
-            df = (
-                pd.read_excel(path, engine="openpyxl")
-                if path.suffix.lower() != ".csv"
-                else pd.read_csv(path)
-            )
-            table_text = "\n".join(
-                df.astype(str).agg(" | ".join, axis=1)
-            )
-            return "table", table_text
-        except Exception as e:
-            logger.error(f"Failed to parse table from {path}: {e}")
-            return "media", {"path": str(path), "mime": mime_type}
+        return "text", _text_windows
 
     # Images and PDFs for OCR
-    if mime_type.startswith("image/") or mime_type == "application/pdf":
+    if mime_type == "application/pdf":
+        return "text", _pdf_pages
+    if mime_type.startswith("image/"):
+        return "text", _ocr_image
+    return "media", None
+
+
+def _archive_pieces(path: Path) -> Iterator[list[str]]:
+    """Yield [kind, member, piece] for the readable members of an archive, read in memory."""
+    for member, stream in iter_members(path, accept=is_supported):
+        mime_type = classify_buffer(member, stream.peek(SNIFF_BYTES)[:SNIFF_BYTES])
+        kind, reader = _reader_for(member, mime_type)
+        if reader is None:
+            continue
         try:
-            from PIL import Image
-            import pytesseract
-            text = ""
-            if mime_type == "application/pdf":
-                import pdfplumber
-                with pdfplumber.open(path) as pdf:
-                    for page in pdf.pages:
-                        text += (page.extract_text() or "") + "\n"
-            else:
-                img = Image.open(path)
-                text = pytesseract.image_to_string(img)
-            return "text", text
+            src = stream
+            if reader is not _text_windows and kind != "code" and suffix(member) not in (".csv", ".tsv"):
+                # PDF, image and workbook readers need random access
+                src = io.BytesIO(stream.read())
+            for piece in reader(src):
+                yield [kind, member, piece]
         except Exception as e:
-            logger.error(f"OCR failed for {path}: {e}")
-            return "media", {"path": str(path), "mime": mime_type}
+            logger.warning(f"Skipping {path}!{member}: {e}")
+
+
+def normalize(path: Path) -> tuple[str, Any]:
+    """
+    Normalize file content based on its MIME type.
+    Returns a tuple of (kind, payload):
+      - kind="text" and payload=Iterator[str] (text windows, PDF pages, OCR output)
+      - kind="table" and payload=Iterator[str] (header-annotated blocks of '|'-joined rows)
+      - kind="code" and payload=Iterator[[symbol, chunk]] (definitions of a source file)
+      - kind="archive" and payload=Iterator[[member_kind, member, piece]] (zip/tar members)
+      - kind="media" and payload=dict metadata
+    Text, table and archive payloads are lazy, so no more than one piece is held in memory;
+    read errors surface while iterating (see spool_normalized).
+    """
+    if is_archive(path.name):
+        return "archive", _archive_pieces(path)
+
+    mime_type = detect_mime(path)
+    kind, reader = _reader_for(path.name, mime_type)
+    if reader is not None:
+        return kind, reader(path)
 
     # Fallback: treat as media/metadata
-    metadata = {"path": str(path), "mime": mime_type, "size": path.stat().st_size}
-    return "media", metadata
+    return "media", _media_metadata(path, mime_type)
+
+
+def _media_metadata(path: Path, mime_type: str) -> dict[str, Any]:
+    st = path.stat()
+    return {"path": str(path), "mime": mime_type, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+            **probe(path, mime_type)}
 
 
-def ingest_directory(root: Path) -> None:
+def spool_normalized(path: Path, spool: Path) -> tuple[str, Any]:
+    """
+    Normalize `path`, writing its pieces to the JSONL file `spool` (one JSON value per line)
+    so they can cross from a worker process without being held in memory.
+    Returns (kind, spool) for text, tables and archives, or ("media", metadata) when the
+    file has no readable content.
+    """
+    kind, payload = normalize(path)
+    if kind == "media":
+        return kind, payload
+    try:
+        with spool.open("w", encoding="utf-8") as f:
+            for piece in payload:
+                if piece:
+                    f.write(json.dumps(piece) + "\n")
+        return kind, spool
+    except Exception as e:
+        spool.unlink(missing_ok=True)
+        logger.error(f"Failed to read {kind} from {path}: {e}")
+        return "media", _media_metadata(path, detect_mime(path))
+
+
+def iter_spool(spool: Path) -> Iterator[Any]:
+    """Yield the pieces written by spool_normalized."""
+    with spool.open("r", encoding="utf-8") as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def _dispatch(kind: str, payload, source: str = "") -> list[str]:
+    """Hand a normalized file to the learner for its kind; returns the stored chunk ids."""
+    # Table pieces are header-annotated blocks already sized for embedding, so both kinds
+    # are packed on blank lines
+    if kind in ("text", "table"):
+        from bot_core.learning import learn_stream
+        return learn_stream(iter_spool(payload), source=source)
+    elif kind == "code":
+        from bot_core.learning import learn_code
+        return learn_code(iter_spool(payload), source=source)
+    elif kind == "archive":
+        from bot_core.learning import learn_code, learn_stream
+        ids = []
+        # Members are spooled in order, so each one is a consecutive run of pieces
+        for (member, member_kind), rows in groupby(iter_spool(payload), key=lambda row: (row[1], row[0])):
+            learn = learn_code if member_kind == "code" else learn_stream
+            ids += learn((piece for _, _, piece in rows), source=f"{source}!{member}")
+        return ids
+    else:
+        from bot_core.knowledge_tools import ingest_media_metadata
+        ingest_media_metadata(payload)
+        return []
+
+
+def _run(manifest: IngestManifest, plan: IngestPlan, workers: Optional[int],
+         progress: bool = True) -> IngestReport:
+    """Retire stale chunks, ingest the plan's changed files and save the manifest."""
+    from bot_core.memory_vector_store import refresh_vector_store, retire_chunks, source_chunk_ids
+
+    workers = workers or INGEST_WORKERS or default_workers()
+    report = IngestReport(files=plan.changed, workers=workers, skipped=len(plan.unchanged))
+    start = time.perf_counter()
+    dedup_index.reset_report()
+
+    stale = plan.removed + [path.as_posix() for path in plan.changed]
+    stale_ids = manifest.chunk_ids(stale)
+    report.retired = retire_chunks(stale_ids)
+    symbol_index.drop_chunks(stale_ids)
+    catalog.remove(stale)
+    for key in stale:
+        manifest.forget(key)
+
+    results = iter_normalized(plan.changed, workers=workers, timeout=INGEST_FILE_TIMEOUT or None,
+                              window=INGEST_QUEUE_SIZE)
+    try:
+        # Media rows of the whole run go to the catalog in one transaction
+        with catalog.batch():
+            for result in tqdm(results, total=len(plan.changed), desc="Ingesting", unit="file", ncols=80,
+                               disable=not progress):
+                try:
+                    report.bytes += result.path.stat().st_size
+                except OSError:
+                    pass
+                if result.ok:
+                    if result.kind == "media":
+                        result.payload["sha256"] = plan.hashes.get(result.path.as_posix())
+                    try:
+                        chunk_ids = _dispatch(result.kind, result.payload, source=str(result.path))
+                        manifest.record(result.path, plan, chunk_ids)
+                    except BaseException as e:
+                        # Chunks stored before the failure are in no manifest entry; remove them
+                        # so they are not orphaned (the file is learned again next run)
+                        partial = source_chunk_ids(str(result.path))
+                        retire_chunks(partial)
+                        symbol_index.drop_chunks(partial)
+                        if not isinstance(e, Exception):
+                            raise
+                        result.error = f"{type(e).__name__}: {e}"
+                    finally:
+                        if isinstance(result.payload, Path):
+                            result.payload.unlink(missing_ok=True)
+                if not result.ok:
+                    logger.error(f"Failed to ingest {result.path}: {result.error}")
+                report.add(result)
+    finally:
+        # Persist progress even if interrupted, so finished files are not learned twice
+        manifest.save()
+        symbol_index.save()
+        dedup_index.save()
+
+    refresh_vector_store()
+    report.seconds = time.perf_counter() - start
+    report.duplicates = sum(dedup_index.run_duplicates.values())
+    logger.info(report.summary())
+    if report.duplicates:
+        logger.info(dedup_index.report())
+    return report
+
+
+def ingest_directory(root: Path, files: Optional[list[Path]] = None,
+                     workers: Optional[int] = None, incremental: bool = True,
+                     stats: Optional[dict] = None) -> IngestReport:
     """
     Ingest all supported files under `root`, delegating to learning or media tools.
+    Files are normalized in parallel worker processes (INGEST_WORKERS) but handed on in
+    discovery order; a file that fails or exceeds INGEST_FILE_TIMEOUT is reported and skipped.
+
+    With `incremental`, the ingest manifest is consulted first: unchanged files are skipped,
+    chunks of modified or deleted files are retired, and only touched shards are re-encoded.
+
+    Args:
+        root (Path): Directory to ingest.
+        files (list[Path]): Files already discovered under `root` (avoids a second walk).
+        workers (int): Worker processes (defaults to INGEST_WORKERS, 0 - one per spare core).
+        incremental (bool): Skip files the manifest shows as already ingested.
+        stats (dict): Stat results of `files` from discover_files, reused by the manifest.
+
+    Returns:
+        IngestReport with counts, failures and throughput.
     """
-    files = discover_files(root)
-    for path in files:
-        kind, payload = normalize(path)
-        if kind == "text":
-            from bot_core.learning import learn_text
-            learn_text(payload)
-        elif kind == "table":
-            from bot_core.learning import learn_table
-            learn_table(payload)
-        else:
-            from bot_core.knowledge_tools import ingest_media_metadata
-            ingest_media_metadata(payload)
+    if files is None:
+        stats = {}
+        files = discover_files(root, stats)
+    with _ingest_lock:
+        manifest = IngestManifest()
+        plan = manifest.plan(root, files, stats)
+        if not incremental:
+            for path in plan.unchanged:
+                plan.hashes.setdefault(path.as_posix(), manifest.entries[path.as_posix()].sha256)
+            plan.changed, plan.unchanged = plan.changed + plan.unchanged, []
+        if plan.unchanged:
+            logger.info(f"Skipping {len(plan.unchanged)} unchanged files under {root}")
+        return _run(manifest, plan, workers)
 
 
-def ingest_root() -> None:
+def ingest_paths(paths, workers: Optional[int] = None, progress: bool = False) -> IngestReport:
+    """
+    Ingest just the given paths (e.g. from the import watcher) without walking the tree.
+    Supported files that changed are learned, directories (moved in whole) are expanded, and
+    paths that no longer exist, files or whole directories, have their chunks retired.
+    """
+    paths = {Path(p) for p in paths}
+    existing = {p for p in paths if p.is_file() and is_supported(p.name)}
+    for directory in (p for p in paths if p.is_dir()):
+        existing.update(discover_files(directory))
+    existing = sorted(existing)
+    missing = [p for p in paths if not p.exists()]
+    with _ingest_lock:
+        manifest = IngestManifest()
+        plan = manifest.plan(None, existing)
+        plan.removed = [key for p in missing for key in manifest.keys_under(p)]
+        return _run(manifest, plan, workers, progress=progress)
+
+
+def ingest_root() -> IngestReport:
     """
     Convenience entrypoint: ingest from the configured import directory.
     """
-    ingest_directory(Path(IMPORT_DIR))
+    return ingest_directory(Path(IMPORT_DIR))
 
 
 if __name__ == "__main__":
@@ -133,5 +376,13 @@ if __name__ == "__main__":
         "root", type=Path, nargs="?", default=Path(IMPORT_DIR),
         help="Root directory to scan for files"
     )
+    parser.add_argument(
+        "--workers", type=int, default=None,
+        help="Worker processes for normalization (1 - serial)"
+    )
+    parser.add_argument(
+        "--full", action="store_true",
+        help="Re-ingest every file, ignoring the ingest manifest"
+    )
     args = parser.parse_args()
-    ingest_directory(args.root)
+    print(ingest_directory(args.root, workers=args.workers, incremental=not args.full).summary())
@@ -0,0 +1,115 @@
+# bot_core/generation_control.py
+
+"""
+Cancellation and deadlines for a single generation.
+A GenerationControl is handed to whatever runs the completion (chat session, Sapphira,
+server job, model worker). Its stopping criterion ends decoding after the current token
+when it is cancelled (Ctrl-C, client disconnect, /requests DELETE) or when its
+wall-clock or token deadline passes, so the caller still gets the partial answer and the
+session stays usable.
+"""
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from config import GENERATION_TIMEOUT_SECONDS, GENERATION_TOKEN_LIMIT
+
+
+class GenerationControl:
+    """
+    Args:
+        max_seconds (float): Wall-clock budget counted from start() (None - unlimited).
+        max_tokens (int): Generated-token budget (None - unlimited).
+    """
+
+    def __init__(self, max_seconds: Optional[float] = None, max_tokens: Optional[int] = None):
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.reason: Optional[str] = None
+        self.tokens = 0
+        self._started: Optional[float] = None
+        self._event = threading.Event()
+
+    @classmethod
+    def from_config(cls) -> "GenerationControl":
+        """A control with the default deadlines from config.py."""
+        return cls(max_seconds=GENERATION_TIMEOUT_SECONDS or None, max_tokens=GENERATION_TOKEN_LIMIT or None)
+
+    def start(self) -> "GenerationControl":
+        """Start the wall clock (idempotent); called when decoding actually begins."""
+        if self._started is None:
+            self._started = time.monotonic()
+        return self
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        if self.reason is None:
+            self.reason = reason
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def is_set(self) -> bool:
+        """threading.Event-compatible alias of `cancelled`."""
+        return self._event.is_set()
+
+    def remaining_seconds(self) -> Optional[float]:
+        if self.max_seconds is None:
+            return None
+        elapsed = time.monotonic() - self._started if self._started is not None else 0.0
+        return max(0.0, self.max_seconds - elapsed)
+
+    def expired(self) -> bool:
+        """True once cancelled or past the wall-clock deadline."""
+        if not self._event.is_set() and self._started is not None and self.remaining_seconds() == 0.0:
+            self.cancel("timeout")
+        return self._event.is_set()
+
+    def cap_tokens(self, max_tokens: int) -> int:
+        """The smaller of a request's max_tokens and this control's token budget."""
+        return min(max_tokens, self.max_tokens) if self.max_tokens else max_tokens
+
+    def __call__(self, input_ids, logits) -> bool:
+        """llama-cpp-python stopping criterion: called once per generated token."""
+        self.start()
+        self.tokens += 1
+        if self.max_tokens is not None and self.tokens >= self.max_tokens:
+            self.cancel("token limit")
+        return self.expired()
+
+    def stopping_criteria(self):
+        from llama_cpp import StoppingCriteriaList
+        return StoppingCriteriaList([self])
+
+    def describe(self) -> str:
+        """Short note for the user about why the answer was cut off ('' if it was not)."""
+        return f"[stopped: {self.reason} after {self.tokens} tokens]" if self.reason else ""
+
+
+@contextmanager
+def interruptible(control: GenerationControl) -> Iterator[GenerationControl]:
+    """
+    While the block runs, Ctrl-C cancels `control` instead of raising KeyboardInterrupt.
+    A second Ctrl-C falls through to the previous handler.
+    Only has an effect on the main thread.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        yield control
+        return
+
+    previous = signal.getsignal(signal.SIGINT)
+
+    def on_sigint(signum, frame):
+        if control.cancelled:
+            signal.signal(signal.SIGINT, previous)
+            raise KeyboardInterrupt
+        control.cancel("interrupted")
+
+    signal.signal(signal.SIGINT, on_sigint)
+    try:
+        yield control
+    finally:
+        signal.signal(signal.SIGINT, previous)
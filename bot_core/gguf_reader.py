@@ -0,0 +1,212 @@
+# bot_core/gguf_reader.py
+
+"""
+GGUF header reader.
+Parses the key/value metadata and tensor table at the start of a GGUF file without
+loading any weights, so context length, architecture, quantization and tensor sizes
+are available in milliseconds instead of the seconds-to-minutes a Llama() load takes.
+Large arrays (tokenizer vocabularies) are skipped by seeking over them.
+"""
+import struct
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, BinaryIO, Optional
+
+GGUF_MAGIC = b"GGUF"
+
+# GGUF metadata value types
+_UINT8, _INT8, _UINT16, _INT16, _UINT32, _INT32, _FLOAT32, _BOOL, _STRING, _ARRAY, _UINT64, _INT64, _FLOAT64 = range(13)
+_SCALAR_FORMATS = {
+    _UINT8: "<B", _INT8: "<b", _UINT16: "<H", _INT16: "<h", _UINT32: "<I", _INT32: "<i",
+    _FLOAT32: "<f", _BOOL: "<?", _UINT64: "<Q", _INT64: "<q", _FLOAT64: "<d",
+}
+
+# ggml tensor types: (elements per block, bytes per block)
+GGML_BLOCKS = {
+    0: (1, 4), 1: (1, 2), 2: (32, 18), 3: (32, 20), 6: (32, 22), 7: (32, 24), 8: (32, 34),
+    9: (32, 36), 10: (256, 84), 11: (256, 110), 12: (256, 144), 13: (256, 176), 14: (256, 210),
+    15: (256, 292), 16: (256, 66), 17: (256, 74), 18: (256, 98), 19: (256, 50), 20: (32, 18),
+    21: (256, 110), 22: (256, 82), 23: (256, 136), 24: (1, 1), 25: (1, 2), 26: (1, 4),
+    27: (1, 8), 28: (1, 8), 29: (256, 56), 30: (1, 2),
+}
+
+# general.file_type values (llama_ftype)
+FILE_TYPES = {
+    0: "F32", 1: "F16", 2: "Q4_0", 3: "Q4_1", 7: "Q8_0", 8: "Q5_0", 9: "Q5_1", 10: "Q2_K",
+    11: "Q3_K_S", 12: "Q3_K_M", 13: "Q3_K_L", 14: "Q4_K_S", 15: "Q4_K_M", 16: "Q5_K_S",
+    17: "Q5_K_M", 18: "Q6_K", 19: "IQ2_XXS", 20: "IQ2_XS", 21: "Q2_K_S", 22: "IQ3_XS",
+    23: "IQ3_XXS", 24: "IQ1_S", 25: "IQ4_NL", 26: "IQ3_S", 27: "IQ3_M", 28: "IQ2_S",
+    29: "IQ2_M", 30: "IQ4_XS", 31: "IQ1_M", 32: "BF16",
+}
+
+
+@dataclass
+class GGUFInfo:
+    path: str
+    version: int
+    file_size: int
+    tensor_count: int
+    tensor_bytes: int = 0
+    metadata: dict = field(default_factory=dict)
+
+    def _arch_value(self, key: str) -> Optional[Any]:
+        return self.metadata.get(f"{self.architecture}.{key}")
+
+    @property
+    def architecture(self) -> str:
+        return self.metadata.get("general.architecture", "unknown")
+
+    @property
+    def name(self) -> str:
+        return self.metadata.get("general.name", Path(self.path).stem)
+
+    @property
+    def context_length(self) -> Optional[int]:
+        return self._arch_value("context_length")
+
+    @property
+    def quantization(self) -> str:
+        file_type = self.metadata.get("general.file_type")
+        return FILE_TYPES.get(file_type, f"type {file_type}" if file_type is not None else "unknown")
+
+    @property
+    def block_count(self) -> Optional[int]:
+        return self._arch_value("block_count")
+
+    @property
+    def embedding_length(self) -> Optional[int]:
+        return self._arch_value("embedding_length")
+
+    @property
+    def head_count(self) -> Optional[int]:
+        return self._arch_value("attention.head_count")
+
+    @property
+    def head_count_kv(self) -> Optional[int]:
+        return self._arch_value("attention.head_count_kv") or self.head_count
+
+    def kv_cache_bytes(self, n_ctx: int, bytes_per_value: int = 2) -> int:
+        """Estimated f16 KV cache size for a context of `n_ctx` tokens (0 if unknown)."""
+        if not (self.block_count and self.embedding_length and self.head_count):
+            return 0
+        kv_dim = self.embedding_length * self.head_count_kv // self.head_count
+        return 2 * self.block_count * n_ctx * kv_dim * bytes_per_value
+
+    def summary(self) -> str:
+        return (f"{self.name}: arch={self.architecture}, n_ctx_train={self.context_length}, "
+                f"quant={self.quantization}, tensors={self.tensor_count}, "
+                f"weights={self.tensor_bytes / 1024 ** 3:.2f} GB")
+
+
+def _read(f: BinaryIO, fmt: str):
+    size = struct.calcsize(fmt)
+    data = f.read(size)
+    if len(data) != size:
+        raise ValueError("Unexpected end of GGUF header.")
+    return struct.unpack(fmt, data)[0]
+
+
+def _read_string(f: BinaryIO) -> str:
+    length = _read(f, "<Q")
+    return f.read(length).decode("utf-8", errors="replace")
+
+
+def _read_value(f: BinaryIO, value_type: int) -> Any:
+    if value_type in _SCALAR_FORMATS:
+        return _read(f, _SCALAR_FORMATS[value_type])
+    if value_type == _STRING:
+        return _read_string(f)
+    if value_type == _ARRAY:
+        item_type = _read(f, "<I")
+        count = _read(f, "<Q")
+        # Arrays are tokenizer tables; skip them and keep only their length
+        if item_type in _SCALAR_FORMATS:
+            f.seek(count * struct.calcsize(_SCALAR_FORMATS[item_type]), 1)
+        elif item_type == _STRING:
+            for _ in range(count):
+                f.seek(_read(f, "<Q"), 1)
+        else:
+            for _ in range(count):
+                _read_value(f, item_type)
+        return {"array_length": count}
+    raise ValueError(f"Unknown GGUF value type {value_type}.")
+
+
+def read_gguf_metadata(path, read_tensors: bool = True) -> GGUFInfo:
+    """
+    Read the header of a GGUF model file.
+
+    Args:
+        path: Path to the .gguf file.
+        read_tensors (bool): Also walk the tensor table to total the weight size.
+
+    Returns:
+        GGUFInfo with the metadata key/values and tensor statistics.
+
+    Raises:
+        FileNotFoundError: The file does not exist.
+        ValueError: The file is not a (supported) GGUF file.
+    """
+    path = Path(path)
+    with path.open("rb") as f:
+        if f.read(4) != GGUF_MAGIC:
+            raise ValueError(f"{path} is not a GGUF file.")
+        version = _read(f, "<I")
+        if version < 2:
+            raise ValueError(f"{path} uses GGUF v{version}; only v2 and later are supported.")
+        tensor_count = _read(f, "<Q")
+        kv_count = _read(f, "<Q")
+
+        metadata = {}
+        for _ in range(kv_count):
+            key = _read_string(f)
+            metadata[key] = _read_value(f, _read(f, "<I"))
+
+        info = GGUFInfo(str(path), version, path.stat().st_size, tensor_count, metadata=metadata)
+        if read_tensors:
+            for _ in range(tensor_count):
+                _read_string(f)
+                n_dims = _read(f, "<I")
+                elements = 1
+                for _ in range(n_dims):
+                    elements *= _read(f, "<Q")
+                ggml_type = _read(f, "<I")
+                _read(f, "<Q")  # data offset
+                block, block_bytes = GGML_BLOCKS.get(ggml_type, (1, 4))
+                info.tensor_bytes += elements // block * block_bytes
+    return info
+
+
+def validate_model_config(name: str, cfg: dict) -> tuple[dict, list[str]]:
+    """
+    Check a MODEL_CONFIGS entry against its GGUF header.
+
+    Returns:
+        (cfg, warnings): a copy of the entry with n_ctx clamped to the trained context
+        length, and human-readable problems found (missing file, not GGUF, ...).
+    """
+    cfg = {"path": cfg["path"], "kwargs": dict(cfg["kwargs"])}
+    try:
+        info = read_gguf_metadata(cfg["path"], read_tensors=False)
+    except FileNotFoundError:
+        return cfg, [f"{name}: model file not found at {cfg['path']}"]
+    except (ValueError, OSError) as e:
+        return cfg, [f"{name}: {e}"]
+
+    warnings = []
+    n_ctx = cfg["kwargs"].get("n_ctx")
+    if info.context_length and n_ctx and n_ctx > info.context_length:
+        warnings.append(f"{name}: n_ctx={n_ctx} exceeds the trained context of "
+                        f"{info.context_length}; clamping.")
+        cfg["kwargs"]["n_ctx"] = info.context_length
+    return cfg, warnings
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print GGUF model metadata without loading weights.")
+    parser.add_argument("paths", nargs="+", type=Path)
+    args = parser.parse_args()
+    for p in args.paths:
+        print(read_gguf_metadata(p).summary())
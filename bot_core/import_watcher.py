@@ -0,0 +1,187 @@
+# bot_core/import_watcher.py
+
+"""
+Background watcher that keeps IMPORT_DIR learned without `/learn all` rescans.
+File events come from watchdog (inotify, FSEvents or ReadDirectoryChangesW) when it is
+installed, otherwise from a polling thread that compares (size, mtime) snapshots. Events
+are debounced: paths collect until the directory has been quiet for WATCH_DEBOUNCE_SECONDS
+(or for at most ten times that during a long copy), then the batch goes through
+ingest_paths, which learns only those files and retires chunks of deleted ones.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from bot_core.constants_config import IMPORT_DIR
+from bot_core.file_ingestor import ingest_paths
+from bot_core.file_types import is_supported
+from bot_core.logger_utils import log_error, log_info
+from config import WATCH_DEBOUNCE_SECONDS, WATCH_POLL_INTERVAL
+
+# Events that do not change file content
+_IGNORED_EVENTS = {"opened", "closed_no_write"}
+
+
+def _snapshot(root: Path) -> dict[str, tuple[int, int]]:
+    snap = {}
+    for dirpath, _, names in os.walk(root):
+        for name in names:
+            if not is_supported(name):
+                continue
+            path = os.path.join(dirpath, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            snap[path] = (st.st_size, st.st_mtime_ns)
+    return snap
+
+
+class ImportWatcher:
+    def __init__(self, root: Path = IMPORT_DIR, debounce: float = WATCH_DEBOUNCE_SECONDS,
+                 poll_interval: float = WATCH_POLL_INTERVAL):
+        self.root = Path(root)
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.mode: Optional[str] = None  # "watchdog" or "polling" while running
+        self.batches = 0
+        self.last_report = None
+        self._pending: set[Path] = set()
+        self._first_event = self._last_event = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self._observer = None
+
+    @property
+    def running(self) -> bool:
+        return self.mode is not None
+
+    def start(self) -> str:
+        if self.running:
+            return self.mode
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._stop.clear()
+        try:
+            self._observer = self._start_observer()
+            self.mode = "watchdog"
+        except ImportError:
+            self.mode = "polling"
+            self._threads.append(threading.Thread(target=self._poll_loop, name="import-poll", daemon=True))
+        except OSError as e:
+            # e.g. inotify watch limit reached
+            log_error(f"File events unavailable for {self.root} ({e}); falling back to polling")
+            self.mode = "polling"
+            self._threads.append(threading.Thread(target=self._poll_loop, name="import-poll", daemon=True))
+        self._threads.append(threading.Thread(target=self._flush_loop, name="import-flush", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        log_info(f"Watching {self.root} for imports ({self.mode})")
+        return self.mode
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads.clear()
+        self.mode = None
+        with self._lock:
+            self._pending.clear()
+
+    def notify(self, path) -> None:
+        """Record a changed, created or deleted path for the next batch."""
+        path = self._relative(path)
+        if path is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if not self._pending:
+                self._first_event = now
+            self._pending.add(path)
+            self._last_event = now
+
+    def status(self) -> str:
+        if not self.running:
+            return f"Import watcher is off ({self.root})."
+        with self._lock:
+            pending = len(self._pending)
+        text = (f"Watching {self.root} via {self.mode}: {pending} pending path(s), "
+                f"{self.batches} batch(es) ingested, debounce {self.debounce:.1f}s")
+        if self.last_report is not None:
+            text += f"\nLast batch: {self.last_report.summary()}"
+        return text
+
+    def _relative(self, path) -> Optional[Path]:
+        # Keep paths in the form discover_files produces, so manifest keys match
+        try:
+            rel = Path(os.path.abspath(path)).relative_to(os.path.abspath(self.root))
+        except ValueError:
+            return None
+        return self.root / rel if rel.parts else None
+
+    def _start_observer(self):
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        watcher = self
+
+        class _Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                if event.event_type in _IGNORED_EVENTS:
+                    return
+                watcher.notify(event.src_path)
+                if getattr(event, "dest_path", ""):
+                    watcher.notify(event.dest_path)
+
+        observer = Observer()
+        observer.schedule(_Handler(), str(self.root), recursive=True)
+        observer.daemon = True
+        observer.start()
+        return observer
+
+    def _poll_loop(self) -> None:
+        previous = _snapshot(self.root)
+        while not self._stop.wait(self.poll_interval):
+            current = _snapshot(self.root)
+            for path, stat in current.items():
+                if previous.get(path) != stat:
+                    self.notify(path)
+            for path in previous.keys() - current.keys():
+                self.notify(path)
+            previous = current
+
+    def _flush_loop(self) -> None:
+        tick = min(0.25, self.debounce / 2) if self.debounce else 0.25
+        while not self._stop.wait(tick):
+            now = time.monotonic()
+            with self._lock:
+                if not self._pending:
+                    continue
+                quiet = now - self._last_event >= self.debounce
+                overdue = now - self._first_event >= self.debounce * 10
+                if not (quiet or overdue):
+                    continue
+                batch, self._pending = self._pending, set()
+            self._ingest(batch)
+
+    def _ingest(self, batch: set[Path]) -> None:
+        try:
+            report = ingest_paths(batch)
+        except Exception as e:
+            log_error(f"Import watcher failed to ingest {len(batch)} path(s): {e}")
+            return
+        if report.files or report.retired:
+            self.batches += 1
+            self.last_report = report
+            log_info(f"Import watcher: {report.summary()}")
+
+
+watcher = ImportWatcher()
@@ -0,0 +1,138 @@
+# bot_core/ingest_manifest.py
+
+"""
+Persistent manifest of ingested files (memory/ingest_manifest.json).
+Each entry records a file's size, mtime, content hash, the pipeline version that processed
+it and the ids of the chunks learned from it. On the next run, files whose size and mtime
+are unchanged are skipped without being read; files whose stat changed are hashed, and
+only a different hash (or a newer PIPELINE_VERSION) sends them through ingestion again.
+Chunks of modified and deleted files are retired from the vector store.
+"""
+import hashlib
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from bot_core.logger_utils import log_error
+
+MANIFEST_PATH = Path("memory/ingest_manifest.json")
+# Bump when normalization or chunking changes so every file is learned again
+PIPELINE_VERSION = 2
+
+
+@dataclass
+class FileRecord:
+    size: int
+    mtime_ns: int
+    sha256: str
+    pipeline_version: int = PIPELINE_VERSION
+    chunk_ids: list[str] = field(default_factory=list)
+
+
+@dataclass
+class IngestPlan:
+    changed: list[Path] = field(default_factory=list)  # new or modified: ingest
+    unchanged: list[Path] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)  # in the manifest, gone from disk
+    hashes: dict[str, str] = field(default_factory=dict)
+    stats: dict[str, os.stat_result] = field(default_factory=dict)
+
+
+def file_sha256(path: Path, block_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _key(path: Path) -> str:
+    return path.as_posix()
+
+
+class IngestManifest:
+    def __init__(self, path: Path = MANIFEST_PATH):
+        self.path = path
+        self.entries: dict[str, FileRecord] = {}
+        self.load()
+
+    def load(self) -> None:
+        if not self.path.exists():
+            return
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                raw = json.load(f)
+            self.entries = {key: FileRecord(**value) for key, value in raw.get("files", {}).items()}
+        except (OSError, json.JSONDecodeError, TypeError) as e:
+            log_error(f"Ignoring unreadable ingest manifest {self.path}: {e}")
+            self.entries = {}
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump({"pipeline_version": PIPELINE_VERSION,
+                       "files": {key: asdict(record) for key, record in self.entries.items()}}, f)
+        os.replace(tmp, self.path)
+
+    def plan(self, root: Optional[Path], files: list[Path],
+             stats: Optional[dict[Path, os.stat_result]] = None) -> IngestPlan:
+        """
+        Sort discovered `files` under `root` into changed, unchanged and removed.
+        With root=None, `files` is a partial list and nothing is considered removed.
+        `stats` holds stat results already taken during discovery.
+        """
+        plan = IngestPlan()
+        seen = set()
+        stats = stats or {}
+        for path in files:
+            key = _key(path)
+            seen.add(key)
+            try:
+                st = stats.get(path) or path.stat()
+            except OSError:
+                continue
+            plan.stats[key] = st
+            record = self.entries.get(key)
+            current = record is not None and record.pipeline_version == PIPELINE_VERSION
+            if current and record.size == st.st_size and record.mtime_ns == st.st_mtime_ns:
+                plan.unchanged.append(path)
+                continue
+            try:
+                digest = file_sha256(path)
+            except OSError as e:
+                log_error(f"Cannot hash {path}: {e}")
+                continue
+            if current and record.sha256 == digest:
+                # Touched but identical: refresh the stat so the next run skips the hash
+                record.size, record.mtime_ns = st.st_size, st.st_mtime_ns
+                plan.unchanged.append(path)
+                continue
+            plan.hashes[key] = digest
+            plan.changed.append(path)
+
+        if root is not None:
+            plan.removed = [key for key in self.keys_under(root) if key not in seen]
+        return plan
+
+    def keys_under(self, path: Path) -> list[str]:
+        """Manifest entries for `path` itself or for anything inside it."""
+        key = _key(path)
+        if key == ".":
+            return list(self.entries)
+        prefix = key.rstrip("/") + "/"
+        return [k for k in self.entries if k == key or k.startswith(prefix)]
+
+    def chunk_ids(self, keys) -> list[str]:
+        return [cid for key in keys if key in self.entries for cid in self.entries[key].chunk_ids]
+
+    def record(self, path: Path, plan: IngestPlan, chunk_ids: list[str]) -> None:
+        key = _key(path)
+        st = plan.stats[key]
+        self.entries[key] = FileRecord(st.st_size, st.st_mtime_ns, plan.hashes[key], PIPELINE_VERSION,
+                                       list(chunk_ids))
+
+    def forget(self, key: str) -> Optional[FileRecord]:
+        return self.entries.pop(key, None)
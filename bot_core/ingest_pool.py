@@ -0,0 +1,228 @@
+# bot_core/ingest_pool.py
+
+"""
+Parallel file normalization for the ingestion pipeline.
+Files are normalized (MIME detection, table parsing, OCR) in worker processes, each fed one
+file at a time over its own pipe. That keeps every failure isolated: a file that raises is
+reported and skipped, and a file that runs past the per-file timeout or crashes its worker
+gets that worker killed and replaced while the rest continue. Workers start from
+worker_entry, so they import only the parsing modules, not the app's chat stack.
+
+At most `window` files are in flight or waiting to be consumed. Results are yielded in input
+order regardless of which worker finishes first, so ingestion output is deterministic.
+Text and table content is streamed by the worker into a spool file under SPOOL_DIR rather
+than sent over the pipe, so neither process holds a whole document; the consumer deletes
+the spool once it has been learned.
+"""
+import logging
+import time
+import uuid
+from dataclasses import dataclass, field
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+from bot_core.worker_entry import default_workers, ignore_sigint, lightweight_main, spawn_context
+
+logger = logging.getLogger(__name__)
+
+SPOOL_DIR = Path("memory/ingest_spool")
+
+
+@dataclass
+class IngestResult:
+    path: Path
+    kind: Optional[str] = None  # "text", "table" or "media"; None when the file failed
+    payload: Any = None  # spool file (Path) for text and tables, metadata dict for media
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass
+class IngestReport:
+    files: list[Path] = field(default_factory=list)
+    ok: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    workers: int = 1
+    skipped: int = 0  # unchanged since the last run (ingest manifest)
+    retired: int = 0  # chunks removed for modified or deleted files
+    duplicates: int = 0  # near-duplicate chunks linked or dropped before embedding
+    errors: list[tuple[str, str]] = field(default_factory=list)
+
+    def add(self, result: IngestResult) -> None:
+        if result.ok:
+            self.ok += 1
+        else:
+            self.failed += 1
+            self.timed_out += result.error.startswith("timed out")
+            self.errors.append((str(result.path), result.error))
+
+    def summary(self) -> str:
+        rate = len(self.files) / self.seconds if self.seconds else 0.0
+        mb = self.bytes / (1024 * 1024)
+        text = (f"Ingested {self.ok}/{len(self.files)} files ({mb:.1f} MB) in {self.seconds:.1f}s "
+                f"with {self.workers} worker(s): {rate:.2f} files/s, "
+                f"{mb / self.seconds if self.seconds else 0.0:.2f} MB/s")
+        if self.skipped or self.retired:
+            text += f"; {self.skipped} unchanged skipped, {self.retired} stale chunks retired"
+        if self.duplicates:
+            text += f"; {self.duplicates} near-duplicate chunks not embedded (/dedup)"
+        if self.failed:
+            text += f"; {self.failed} failed ({self.timed_out} timed out)"
+            text += "".join(f"\n  {path}: {error}" for path, error in self.errors[:10])
+            if len(self.errors) > 10:
+                text += f"\n  ... and {len(self.errors) - 10} more"
+        return text
+
+    def __str__(self) -> str:
+        return self.summary()
+
+
+def _spool_path() -> Path:
+    SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    return SPOOL_DIR / f"{uuid.uuid4().hex}.jsonl"
+
+
+def _normalize_one(path: Path, spool: Path) -> IngestResult:
+    from bot_core.file_ingestor import spool_normalized
+
+    start = time.perf_counter()
+    try:
+        kind, payload = spool_normalized(path, spool)
+        return IngestResult(path, kind, payload, seconds=time.perf_counter() - start)
+    except Exception as e:
+        spool.unlink(missing_ok=True)
+        return IngestResult(path, error=f"{type(e).__name__}: {e}", seconds=time.perf_counter() - start)
+
+
+def _worker_main(conn) -> None:
+    """Worker process: normalize each (path, spool) received until the pipe closes."""
+    ignore_sigint()
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        conn.send(_normalize_one(*job))
+    conn.close()
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self._ctx = ctx
+        self.process = None
+        self.conn = None
+        self.index: Optional[int] = None  # position of the file being processed
+        self.spool: Optional[Path] = None
+        self.started = 0.0
+        self.start()
+
+    def start(self) -> None:
+        parent_conn, child_conn = self._ctx.Pipe()
+        self.process = self._ctx.Process(target=_worker_main, args=(child_conn,), daemon=True,
+                                         name="ingest-worker")
+        with lightweight_main():
+            self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+    def submit(self, index: int, path: Path) -> None:
+        self.index, self.spool, self.started = index, _spool_path(), time.monotonic()
+        self.conn.send((path, self.spool))
+
+    def restart(self) -> None:
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+        if self.spool is not None:
+            # Partial output of the killed file
+            self.spool.unlink(missing_ok=True)
+        self.index = self.spool = None
+        self.start()
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+def iter_normalized(files: list[Path], workers: int = 1, timeout: Optional[float] = None,
+                    window: int = 64) -> Iterator[IngestResult]:
+    """
+    Normalize `files` and yield one IngestResult per file, in input order.
+
+    Args:
+        files (list[Path]): Files to normalize.
+        workers (int): Worker processes; 1 normalizes in this process (no timeout enforced).
+        timeout (float): Seconds one file may take before its worker is killed (None - no limit).
+        window (int): Maximum files dispatched but not yet consumed.
+    """
+    if workers <= 1 or len(files) <= 1:
+        for path in files:
+            yield _normalize_one(path, _spool_path())
+        return
+
+    ctx = spawn_context()
+    pool = [_Worker(ctx) for _ in range(min(workers, len(files)))]
+    done: dict[int, IngestResult] = {}
+    next_submit = next_yield = 0
+    try:
+        while next_yield < len(files):
+            # Keep idle workers busy without letting the reorder buffer grow past the window
+            for worker in pool:
+                if worker.index is None and next_submit < len(files) and next_submit < next_yield + window:
+                    try:
+                        worker.submit(next_submit, files[next_submit])
+                    except (OSError, BrokenPipeError):
+                        done[next_submit] = IngestResult(files[next_submit], error="worker unavailable")
+                        worker.restart()
+                    next_submit += 1
+
+            busy = [w for w in pool if w.index is not None]
+            if busy:
+                wait_for = 1.0
+                if timeout:
+                    wait_for = max(0.0, min(w.started + timeout for w in busy) - time.monotonic())
+                ready = wait([w.conn for w in busy], timeout=wait_for)
+                for worker in busy:
+                    if worker.conn in ready:
+                        try:
+                            done[worker.index] = worker.conn.recv()
+                            worker.index = worker.spool = None
+                        except (EOFError, OSError):
+                            done[worker.index] = IngestResult(files[worker.index], error="worker crashed")
+                            worker.restart()
+                    elif timeout and time.monotonic() - worker.started >= timeout:
+                        done[worker.index] = IngestResult(files[worker.index],
+                                                          error=f"timed out after {timeout:.0f}s",
+                                                          seconds=timeout)
+                        logger.warning(f"Ingestion of {files[worker.index]} timed out; restarting worker")
+                        worker.restart()
+
+            while next_yield in done:
+                yield done.pop(next_yield)
+                next_yield += 1
+    finally:
+        for worker in pool:
+            if worker.index is not None:
+                worker.process.kill()
+                worker.spool.unlink(missing_ok=True)
+            worker.stop()
+        # Spools already yielded belong to the caller; drop the ones still buffered
+        for result in done.values():
+            if isinstance(result.payload, Path):
+                result.payload.unlink(missing_ok=True)
@@ -5,6 +5,8 @@ from bot_core.io import list_project_files, read_file
 from bot_core.learning import learn_all_supported_files, learn_from_text_file, learn_from_archive, reset_memory
 from bot_core.memory import build_embeddings, query_embeddings
 from bot_core.logger_utils import log_error, log_info, log_interaction
+from bot_core.tracing import span, turn
+from bot_core.generation_control import GenerationControl, interruptible
 from config import MAX_PROMPT_TOKENS, MAX_RETRIEVED_CHUNKS, MAX_CHUNK_CHARS
 import os
 
@@ -59,16 +61,21 @@ def command_loop(gen):
             else:
                 
                 try:
-                    raw_chunks = query_embeddings(user_input)
-                    filtered_chunks = [chunk[:MAX_CHUNK_CHARS] for chunk in raw_chunks[:MAX_RETRIEVED_CHUNKS]]
-                    if not user_input.strip().endswith(("?", ".", ":")):
-                        user_input += "?"
-                    prompt = "\n\n".join(filtered_chunks) + f"\n\nUSER: {user_input}\nASSISTANT:"
+                    with turn("chat"):
+                        raw_chunks = query_embeddings(user_input)
+                        with span("prompt.build", chunks=len(raw_chunks)):
+                            filtered_chunks = [chunk[:MAX_CHUNK_CHARS] for chunk in raw_chunks[:MAX_RETRIEVED_CHUNKS]]
+                            if not user_input.strip().endswith(("?", ".", ":")):
+                                user_input += "?"
+                            prompt = "\n\n".join(filtered_chunks) + f"\n\nUSER: {user_input}\nASSISTANT:"
 
-                    if len(prompt) > MAX_PROMPT_TOKENS * 4:
-                        raise ValueError("Prompt exceeds model context window. Reduce input or memory size.")
+                        if len(prompt) > MAX_PROMPT_TOKENS * 4:
+                            raise ValueError("Prompt exceeds model context window. Reduce input or memory size.")
 
-                    result = gen(prompt, verbose=verbose_mode)
+                        with interruptible(GenerationControl.from_config()) as control:
+                            result = gen(prompt, verbose=verbose_mode, control=control)
+                    if control.reason:
+                        console.print(f"[dim yellow]{control.describe()}")
 
                     if isinstance(result, list) and isinstance(result[0], dict):
                         
@@ -13,18 +13,20 @@ def ingest_media_metadata(meta: Dict[str, Any]) -> None:
     """
     Process non-textual media or binary content metadata.
     This can include model files, archives, audio/video files, or other binaries.
+    The file is recorded in the media catalog (see /media find).
 
     Args:
         meta (Dict[str, Any]): Metadata dict with keys like
             - 'path': str path to the file
             - 'mime': detected MIME type
             - 'size': file size in bytes
+            - 'mtime_ns', 'sha256' and probed properties (width, height, duration, ...)
     """
-    path = meta.get('path')
-    mime = meta.get('mime')
-    size = meta.get('size')
-    # TODO: implement actual metadata ingestion or cataloging
-    logger.info(f"ingest_media_metadata: path={path}, mime={mime}, size={size} bytes")
+    from bot_core.media_catalog import catalog
+
+    catalog.add(meta)
+    logger.info(f"ingest_media_metadata: path={meta.get('path')}, mime={meta.get('mime')}, "
+                f"size={meta.get('size')} bytes")
 
 
 def extract_and_learn(payload: Any) -> None:
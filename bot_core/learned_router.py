@@ -0,0 +1,242 @@
+# bot_core/learned_router.py
+
+"""
+Cost-aware prompt router.
+Prompts are embedded with the sentence-transformers model already loaded for memory search
+and compared with labelled exemplars (one centroid per role: code, chat, memory). Each
+role's similarity is discounted by a latency cost, so a prompt that the small model can
+handle about as well as a big one goes to the cheaper model. Costs start from the models'
+weight sizes (GGUF header) and follow observed per-model latency once answers come in.
+Decisions are cached per normalized prompt, and decisions, latencies and exemplar accuracy
+are appended to logs/routing_log.jsonl so ROUTER_COST_WEIGHT can be tuned from real data.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from bot_core.gguf_reader import read_gguf_metadata
+from bot_core.logger_utils import log_error
+from bot_core.response_cache import normalize_prompt
+from config import MODEL_CONFIGS, MODEL_ROLES, ROUTER_COST_WEIGHT, ROUTER_CACHE_SIZE
+
+ROUTING_LOG = Path("logs/routing_log.jsonl")
+# Weight of the newest observation in the latency moving average
+LATENCY_EMA = 0.2
+
+EXEMPLARS = {
+    "code": [
+        "write a python function that parses a csv file",
+        "fix this traceback: TypeError: 'NoneType' object is not subscriptable",
+        "refactor this class to use dataclasses",
+        "generate a bash script that backs up my home directory",
+        "how do I reverse a linked list in C++",
+        "explain what this regex does: ^(?:\\d{3}-)?\\d{4}$",
+        "write unit tests for the login handler",
+        "convert this javascript callback code to async/await",
+        "why does my SQL join return duplicate rows",
+        "implement binary search in rust",
+        "def foo(x):\n    return x *",
+        "add type hints to this module",
+    ],
+    "chat": [
+        "what do you think about free will",
+        "help me plan a week-long trip to japan",
+        "explain the causes of the first world war",
+        "I feel unmotivated lately, any advice?",
+        "compare stoicism and existentialism",
+        "write a short poem about autumn rain",
+        "what are the pros and cons of renting versus buying a house",
+        "explain quantum entanglement to a curious teenager",
+        "give me feedback on my cover letter",
+        "tell me a story about a lighthouse keeper",
+    ],
+    "memory": [
+        "summarize our conversation so far",
+        "what did I say about my project yesterday",
+        "give me a one-line summary of this paragraph",
+        "hi",
+        "thanks!",
+        "what's 2 + 2",
+        "define entropy in one sentence",
+        "remind me what we decided earlier",
+        "tl;dr of the document I imported",
+        "what time zone is tokyo in",
+    ],
+}
+
+# Explicit prefixes always win over the learned scores
+PREFIX_ROLES = {"/code": "code", "/memory": "memory", "/chat": "chat"}
+
+
+def _embed(texts):
+    from bot_core.memory_vector_store import get_embedder
+    vecs = np.asarray(get_embedder().encode(texts, convert_to_numpy=True), dtype=np.float32)
+    norms = np.linalg.norm(vecs, axis=-1, keepdims=True)
+    return vecs / np.where(norms == 0, 1, norms)
+
+
+def _keyword_role(prompt: str) -> str:
+    """Fallback when the embedder is unavailable: the old substring rules."""
+    lower = prompt.lower()
+    if any(kw in prompt for kw in ("import ", "def ", "class ", "```")) or "write code" in lower:
+        return "code"
+    if "summarize" in lower or "what did i say" in lower:
+        return "memory"
+    return "chat"
+
+
+class LearnedRouter:
+    """
+    Args:
+        cost_weight (float): How much one unit of relative latency cost (0..1) lowers a
+            role's similarity score. 0 routes purely on similarity.
+        cache_size (int): Number of routing decisions remembered.
+    """
+
+    def __init__(self, cost_weight: float = ROUTER_COST_WEIGHT, cache_size: int = ROUTER_CACHE_SIZE):
+        self.cost_weight = cost_weight
+        self.cache_size = cache_size
+        self.roles = [r for r in EXEMPLARS if r in MODEL_ROLES]
+        self._centroids: Optional[np.ndarray] = None
+        self._decisions: "OrderedDict[str, str]" = OrderedDict()
+        self._latency: dict[str, float] = {}
+        self._prior_cost = self._weight_costs()
+        self._lock = threading.Lock()
+
+    # --- scoring ---
+
+    def _weight_costs(self) -> dict[str, float]:
+        """Relative cost per role from model weight size, before any latency is observed."""
+        sizes = {}
+        for role in self.roles:
+            cfg = MODEL_CONFIGS.get(MODEL_ROLES[role], {})
+            try:
+                sizes[role] = read_gguf_metadata(cfg["path"]).tensor_bytes
+            except (KeyError, OSError, ValueError):
+                sizes[role] = 0
+        biggest = max(sizes.values(), default=0)
+        return {role: (size / biggest if biggest else 0.0) for role, size in sizes.items()}
+
+    def costs(self) -> dict[str, float]:
+        """Relative latency cost per role in [0, 1]; observed latency wins over the prior."""
+        with self._lock:
+            observed = {r: self._latency[MODEL_ROLES[r]] for r in self.roles if MODEL_ROLES[r] in self._latency}
+        if len(observed) == len(self.roles) and max(observed.values()) > 0:
+            slowest = max(observed.values())
+            return {r: observed[r] / slowest for r in self.roles}
+        return dict(self._prior_cost)
+
+    def _ensure_centroids(self) -> np.ndarray:
+        if self._centroids is None:
+            centroids = []
+            for role in self.roles:
+                centroid = _embed(EXEMPLARS[role]).mean(axis=0)
+                centroids.append(centroid / (np.linalg.norm(centroid) or 1))
+            self._centroids = np.stack(centroids)
+        return self._centroids
+
+    def scores(self, prompt: str) -> dict[str, float]:
+        """Cosine similarity of the prompt to each role's exemplar centroid."""
+        sims = self._ensure_centroids() @ _embed([prompt])[0]
+        return {role: float(s) for role, s in zip(self.roles, sims)}
+
+    # --- routing ---
+
+    def choose_role(self, prompt: str) -> str:
+        stripped = prompt.strip()
+        for prefix, role in PREFIX_ROLES.items():
+            if stripped.lower().startswith(prefix):
+                return role
+
+        key = normalize_prompt(prompt)
+        with self._lock:
+            if key in self._decisions:
+                self._decisions.move_to_end(key)
+                role = self._decisions[key]
+                self._log({"event": "route", "prompt": _digest(key), "role": role, "cached": True})
+                return role
+
+        try:
+            sims = self.scores(prompt)
+        except Exception as e:
+            log_error(f"Learned routing unavailable, using keyword rules: {e}")
+            return _keyword_role(prompt)
+        costs = self.costs()
+        utility = {r: sims[r] - self.cost_weight * costs.get(r, 0.0) for r in self.roles}
+        role = max(utility, key=utility.get)
+
+        with self._lock:
+            self._decisions[key] = role
+            while len(self._decisions) > self.cache_size:
+                self._decisions.popitem(last=False)
+        self._log({"event": "route", "prompt": _digest(key), "role": role, "cached": False,
+                   "similarity": _rounded(sims), "cost": _rounded(costs)})
+        return role
+
+    def choose_model(self, prompt: str) -> str:
+        return MODEL_ROLES[self.choose_role(prompt)]
+
+    def record_latency(self, model: str, seconds: float, tokens: Optional[int] = None) -> None:
+        """Fold one generation's wall time into the model's latency estimate."""
+        with self._lock:
+            prev = self._latency.get(model)
+            self._latency[model] = seconds if prev is None else (1 - LATENCY_EMA) * prev + LATENCY_EMA * seconds
+        self._log({"event": "latency", "model": model, "seconds": round(seconds, 3), "tokens": tokens})
+
+    def evaluate(self, labelled: Optional[list[tuple[str, str]]] = None) -> float:
+        """
+        Routing accuracy on labelled (prompt, role) pairs, ignoring the cost term.
+        Without data, runs leave-one-out over the built-in exemplars.
+        """
+        if labelled is None:
+            correct = total = 0
+            for role in self.roles:
+                for i, prompt in enumerate(EXEMPLARS[role]):
+                    centroids = []
+                    for r in self.roles:
+                        examples = [p for j, p in enumerate(EXEMPLARS[r]) if not (r == role and j == i)]
+                        c = _embed(examples).mean(axis=0)
+                        centroids.append(c / (np.linalg.norm(c) or 1))
+                    sims = np.stack(centroids) @ _embed([prompt])[0]
+                    correct += self.roles[int(np.argmax(sims))] == role
+                    total += 1
+        else:
+            correct = sum(max(self.scores(p).items(), key=lambda kv: kv[1])[0] == r for p, r in labelled)
+            total = len(labelled)
+        accuracy = correct / total if total else 0.0
+        self._log({"event": "accuracy", "accuracy": round(accuracy, 3), "samples": total,
+                   "cost_weight": self.cost_weight})
+        return accuracy
+
+    def status(self) -> str:
+        with self._lock:
+            latency = ", ".join(f"{m}: {s:.1f}s" for m, s in self._latency.items()) or "no samples"
+            cached = len(self._decisions)
+        return f"Router cost weight {self.cost_weight} | cached decisions {cached} | avg latency: {latency}"
+
+    def _log(self, record: dict) -> None:
+        try:
+            ROUTING_LOG.parent.mkdir(parents=True, exist_ok=True)
+            record["ts"] = round(time.time(), 3)
+            with ROUTING_LOG.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            log_error(f"Failed to write routing log: {e}")
+
+
+def _digest(text: str) -> str:
+    # Prompts are logged as short hashes, not verbatim
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+
+
+def _rounded(values: dict) -> dict:
+    return {k: round(v, 3) for k, v in values.items()}
+
+
+router = LearnedRouter()
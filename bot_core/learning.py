@@ -2,41 +2,145 @@
 
 import logging
 from pathlib import Path
-from typing import List
+
+from typing import Iterable, Iterator, Optional
 
 from bot_core.constants_config import IMPORT_DIR
-from bot_core.file_ingestor import ingest_directory, discover_files
+from bot_core.archive_reader import is_archive
+from bot_core.file_ingestor import ingest_directory, ingest_paths, discover_files
+from bot_core.ingest_pool import IngestReport
+from config import MAX_CHUNK_CHARS
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def learn_text(text: str) -> None:
+def chunk_stream(pieces: Iterable[str], max_chars: int = MAX_CHUNK_CHARS,
+                 separator: str = "\n\n") -> Iterator[str]:
+    """
+    Split streamed text into chunks of at most `max_chars`, packing whole paragraphs (or rows,
+    with separator="\n") together and hard-splitting only pieces longer than a chunk.
+    Only the chunk being packed is held, so arbitrarily long streams run in bounded memory.
+    """
+    current = ""
+    for block in pieces:
+        for piece in block.split(separator):
+            piece = piece.strip()
+            if not piece:
+                continue
+            while len(piece) > max_chars:
+                if current:
+                    yield current
+                    current = ""
+                yield piece[:max_chars]
+                piece = piece[max_chars:]
+            if current and len(current) + len(separator) + len(piece) > max_chars:
+                yield current
+                current = ""
+            current = f"{current}{separator}{piece}" if current else piece
+    if current:
+        yield current
+
+
+def chunk_text(text: str, max_chars: int = MAX_CHUNK_CHARS, separator: str = "\n\n") -> list[str]:
+    """Split text into chunks of at most `max_chars` (see chunk_stream)."""
+    return list(chunk_stream([text], max_chars, separator))
+
+
+def learn_stream(pieces: Iterable[str], source: Optional[str] = None, separator: str = "\n\n",
+                 batch_size: int = 256) -> list[str]:
+    """
+    Chunk and store streamed text, writing `batch_size` chunks at a time.
+
+    Args:
+        pieces (Iterable[str]): Text windows, PDF pages or row blocks, in order.
+        source (str): File the text came from, used to retire its chunks later.
+        separator (str): "\n\n" to pack paragraphs, "\n" to pack table rows.
+
+    Returns:
+        list[str]: Ids of the stored chunks.
+    """
+    from bot_core.memory_vector_store import append_chunks
+
+    ids, batch, chars = [], [], 0
+    for chunk in chunk_stream(pieces, separator=separator):
+        batch.append(chunk)
+        chars += len(chunk)
+        if len(batch) >= batch_size:
+            ids += [i for i in append_chunks(batch, source or "") if i]
+            batch = []
+    ids += [i for i in append_chunks(batch, source or "") if i]
+    logger.info(f"learn_stream: stored {len(ids)} chunks ({chars} chars) from {source or 'text'}")
+    return ids
+
+
+def learn_code(items: Iterable[list], source: Optional[str] = None, batch_size: int = 256) -> list[str]:
+    """
+    Store the chunks of a source file and register their symbols in the symbol index.
+
+    Args:
+        items (Iterable[list]): [symbol, chunk] pairs from the code reader; symbol is None
+            for loose statements and for files that fell back to plain text windows.
+        source (str): File the code came from, used to retire its chunks later.
+
+    Returns:
+        list[str]: Ids of the stored chunks.
+    """
+    from bot_core.memory_vector_store import append_chunks
+    from bot_core.symbol_index import symbol_index
+
+    ids, batch = [], []
+
+    def flush():
+        stored = append_chunks([text for _, text in batch], source or "")
+        for (symbol, text), chunk_id in zip(batch, stored):
+            if symbol and chunk_id:
+                symbol_index.add(symbol, chunk_id, text)
+        batch.clear()
+        return [i for i in stored if i]
+
+    for symbol, text in items:
+        # Text-window fallbacks are larger than a chunk and are packed like prose
+        pieces = [text] if len(text) <= MAX_CHUNK_CHARS else chunk_stream([text], separator="\n")
+        for piece in pieces:
+            batch.append((symbol, piece))
+            if len(batch) >= batch_size:
+                ids += flush()
+    ids += flush()
+    logger.info(f"learn_code: stored {len(ids)} chunks from {source or 'code'}")
+    return ids
+
+
+def learn_text(text: str, source: Optional[str] = None) -> list[str]:
     """
     Process raw text content for learning purposes.
 
     Args:
         text (str): The text content to learn from.
+        source (str): File the text came from, used to retire its chunks later.
+
+    Returns:
+        list[str]: Ids of the stored chunks.
     """
-    # TODO: implement embedding generation and storage
-    length = len(text)
-    logger.info(f"learn_text: received text of length {length}")
+    return learn_stream([text], source)
 
 
-def learn_table(table_text: str) -> None:
+def learn_table(table_text: str, source: Optional[str] = None) -> list[str]:
     """
     Process tabular content for learning purposes.
 
     Args:
         table_text (str): Line-delimited rows with columns separated by '|'.
+        source (str): File the table came from, used to retire its chunks later.
+
+    Returns:
+        list[str]: Ids of the stored chunks (groups of whole rows).
     """
-    # TODO: implement row-wise embedding or structured storage
-    row_count = table_text.count("\n") + 1 if table_text else 0
-    logger.info(f"learn_table: received table with approximately {row_count} rows")
+    return learn_stream([table_text], source, separator="\n")
 
 
-def learn_all_supported_files(root: Path = Path(IMPORT_DIR)) -> List[Path]:
+def learn_all_supported_files(root: Path = Path(IMPORT_DIR)) -> IngestReport:
     """
     Discover and ingest all supported files under the given directory.
 
@@ -44,16 +148,31 @@ def learn_all_supported_files(root: Path = Path(IMPORT_DIR)) -> List[Path]:
         root (Path): Directory to scan for files (defaults to IMPORT_DIR).
 
     Returns:
-        List[Path]: Paths of files discovered and ingested.
+        IngestReport: Files discovered and ingested, failures and throughput.
     """
     logger.info(f"Starting learning pipeline on directory: {root}")
-    files = discover_files(root)
+    stats = {}
+    files = discover_files(root, stats)
     if not files:
         logger.warning(f"No files found in {root} matching allowed extensions.")
     else:
         logger.info(f"Discovered {len(files)} files to learn from.")
-    ingest_directory(root)
-    return files
+    return ingest_directory(root, files=files, stats=stats)
+
+
+def learn_from_archive(path: Optional[Path] = None) -> IngestReport:
+    """
+    Learn the supported members of a zip/jar/tar archive without extracting it to disk.
+
+    Args:
+        path (Path): Archive to learn from (defaults to every archive under IMPORT_DIR).
+
+    Returns:
+        IngestReport: Archives ingested, failures and throughput.
+    """
+    archives = [path] if path else [p for p in discover_files(Path(IMPORT_DIR)) if is_archive(p.name)]
+    logger.info(f"Learning from {len(archives)} archive(s)")
+    return ingest_paths(archives, progress=True)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,6 @@
 # bot_core/logger_utils.py — unified loguru logger
 
+import sys
 from loguru import logger
 from pathlib import Path
 from datetime import datetime
@@ -8,6 +9,21 @@ LOG_DIR = Path("logs")
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 LOG_FILE = LOG_DIR / f"bot-{datetime.now().strftime('%Y-%m-%d')}.log"
 
+TRACE_FILE = LOG_DIR / "trace.jsonl"
+
+
+def exclude_traces(record) -> bool:
+    """Sink filter keeping tracing spans (bot_core.tracing) out of human-readable logs."""
+    return "trace" not in record["extra"]
+
+
+# Replace loguru's default console sink with one that skips tracing spans
+try:
+    logger.remove(0)
+    logger.add(sys.stderr, filter=exclude_traces)
+except ValueError:
+    pass
+
 logger.add(
     str(LOG_FILE),
     level="ERROR",
@@ -15,6 +31,17 @@ logger.add(
     diagnose=True
 )
 
+# Tracing spans as JSONL; enqueue=True hands writes to a background thread
+logger.add(
+    str(TRACE_FILE),
+    level="INFO",
+    format="{message}",
+    filter=lambda record: "trace" in record["extra"],
+    enqueue=True,
+    rotation="50 MB",
+    retention=3
+)
+
 def get_logger():
     return logger
 
@@ -0,0 +1,265 @@
+# bot_core/media_catalog.py
+
+"""
+SQLite catalog of imported files that have no text to learn: audio, video, images without
+text, models, archives we cannot read and other binaries.
+Each row holds path, MIME, size, mtime and content hash plus cheap properties probed with
+the stdlib or PIL (image dimensions, WAV/AIFF duration, GGUF architecture). Rows queued
+during an ingest run are written in one transaction when the run's batch() closes.
+Queries go through indexed columns (kind, MIME, extension, size) with a name match.
+"""
+import json
+import re
+import sqlite3
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Optional
+
+from bot_core.logger_utils import log_error
+
+CATALOG_PATH = Path("memory/media_catalog.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    mime TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    sha256 TEXT,
+    duration REAL,
+    width INTEGER,
+    height INTEGER,
+    props TEXT,
+    indexed_at REAL
+);
+CREATE INDEX IF NOT EXISTS media_kind ON media(kind);
+CREATE INDEX IF NOT EXISTS media_mime ON media(mime);
+CREATE INDEX IF NOT EXISTS media_ext ON media(ext);
+CREATE INDEX IF NOT EXISTS media_size ON media(size);
+CREATE INDEX IF NOT EXISTS media_name ON media(name);
+CREATE INDEX IF NOT EXISTS media_sha ON media(sha256);
+"""
+
+_COLUMNS = ("path", "name", "ext", "kind", "mime", "size", "mtime_ns", "sha256", "duration",
+            "width", "height", "props", "indexed_at")
+
+_MODEL_EXTS = {".gguf", ".pt", ".pth", ".pb", ".onnx", ".ckpt", ".safetensors", ".h5", ".hdf5", ".pkl", ".pickle"}
+_ARCHIVE_EXTS = {".zip", ".tar", ".gz", ".tgz", ".bz2", ".tbz2", ".xz", ".rar", ".7z", ".jar", ".iso", ".img", ".dmg"}
+_SIZE_UNITS = {"": 1, "b": 1, "k": 1024, "kb": 1024, "m": 1024 ** 2, "mb": 1024 ** 2,
+               "g": 1024 ** 3, "gb": 1024 ** 3}
+
+
+def media_kind(mime: str, ext: str) -> str:
+    major = mime.split("/", 1)[0]
+    if major in ("audio", "video", "image"):
+        return major
+    if ext in _MODEL_EXTS:
+        return "model"
+    if ext in _ARCHIVE_EXTS:
+        return "archive"
+    return "binary"
+
+
+def _aiff_info(path: Path) -> dict[str, Any]:
+    """Duration, channels and sample rate from the COMM chunk of an AIFF/AIFF-C file."""
+    with path.open("rb") as f:
+        form, _, kind = struct.unpack(">4sI4s", f.read(12))
+        if form != b"FORM" or kind not in (b"AIFF", b"AIFC"):
+            return {}
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return {}
+            chunk_id, size = struct.unpack(">4sI", header)
+            if chunk_id == b"COMM":
+                channels, frames, _, exponent, mantissa = struct.unpack(">hIhHQ", f.read(18))
+                # Sample rate is an 80-bit IEEE extended float
+                rate = mantissa * 2.0 ** ((exponent & 0x7FFF) - 16383 - 63)
+                if not rate:
+                    return {}
+                return {"duration": frames / rate, "channels": channels, "sample_rate": int(rate)}
+            f.seek(size + (size & 1), 1)
+
+
+def probe(path: Path, mime: str) -> dict[str, Any]:
+    """Cheap properties from headers only: image size, WAV/AIFF duration, GGUF model info."""
+    props: dict[str, Any] = {}
+    ext = path.suffix.lower()
+    try:
+        if mime.startswith("image/"):
+            from PIL import Image
+            with Image.open(path) as img:
+                props["width"], props["height"] = img.size
+                props["format"] = img.format
+        elif ext == ".wav":
+            import wave
+            with wave.open(str(path), "rb") as w:
+                props["duration"] = w.getnframes() / w.getframerate()
+                props["channels"] = w.getnchannels()
+                props["sample_rate"] = w.getframerate()
+        elif ext in (".aif", ".aiff", ".aifc"):
+            props.update(_aiff_info(path))
+        elif ext == ".gguf":
+            from bot_core.gguf_reader import read_gguf_metadata
+            info = read_gguf_metadata(path, read_tensors=False)
+            props.update(architecture=info.architecture, context_length=info.context_length,
+                         quantization=info.quantization)
+    except Exception:
+        # Probing is best effort; the row is still cataloged without properties
+        pass
+    return props
+
+
+def _parse_size(text: str) -> Optional[int]:
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([kmg]?b?)", text.lower())
+    if not match:
+        return None
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+
+def _human(size: Optional[int]) -> str:
+    size = float(size or 0)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class MediaCatalog:
+    def __init__(self, path: Path = CATALOG_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._pending: Optional[list[tuple]] = None
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+        return self._conn
+
+    def _row(self, meta: dict[str, Any]) -> tuple:
+        path = Path(meta["path"])
+        ext = path.suffix.lower()
+        mime = meta.get("mime") or "application/octet-stream"
+        props = {k: v for k, v in meta.items()
+                 if k not in ("path", "mime", "size", "mtime_ns", "sha256", "duration", "width", "height")}
+        return (path.as_posix(), path.name.lower(), ext, media_kind(mime, ext), mime, meta.get("size"),
+                meta.get("mtime_ns"), meta.get("sha256"), meta.get("duration"), meta.get("width"),
+                meta.get("height"), json.dumps(props) if props else None, time.time())
+
+    def add(self, meta: dict[str, Any]) -> None:
+        """Catalog one file; queued until the open batch() closes, else written at once."""
+        row = self._row(meta)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(row)
+                return
+            self._write([row])
+
+    def _write(self, rows: list[tuple]) -> None:
+        placeholders = ", ".join("?" for _ in _COLUMNS)
+        with self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO media ({', '.join(_COLUMNS)}) VALUES ({placeholders})",
+                                  rows)
+
+    @contextmanager
+    def batch(self):
+        """Queue add() calls and write them in a single transaction on exit."""
+        with self._lock:
+            outer = self._pending is not None
+            if not outer:
+                self._pending = []
+        try:
+            yield self
+        finally:
+            if not outer:
+                with self._lock:
+                    rows, self._pending = self._pending, None
+                    if rows:
+                        try:
+                            self._write(rows)
+                        except sqlite3.Error as e:
+                            log_error(f"Failed to write {len(rows)} media catalog rows: {e}")
+
+    def remove(self, paths) -> int:
+        """Drop catalog rows for the given paths (files that changed or were deleted)."""
+        keys = [(Path(p).as_posix(),) for p in paths]
+        if not keys:
+            return 0
+        with self._lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany("DELETE FROM media WHERE path = ?", keys)
+            return self.conn.total_changes - before
+
+    def find(self, query: str, limit: int = 20) -> list[sqlite3.Row]:
+        """
+        Search the catalog. Terms: kind:audio|video|image|model|archive|binary, mime:<prefix>,
+        ext:<.ext>, >SIZE / <SIZE (e.g. >100MB); any other words must appear in the file name.
+        """
+        where, args = [], []
+        for term in query.split():
+            lower = term.lower()
+            if lower.startswith("kind:"):
+                where.append("kind = ?")
+                args.append(lower[5:])
+            elif lower.startswith("mime:"):
+                where.append("mime LIKE ?")
+                args.append(lower[5:] + "%")
+            elif lower.startswith("ext:"):
+                ext = lower[4:]
+                where.append("ext = ?")
+                args.append(ext if ext.startswith(".") else "." + ext)
+            elif lower[:1] in "<>" and _parse_size(lower[1:]) is not None:
+                where.append(f"size {lower[0]} ?")
+                args.append(_parse_size(lower[1:]))
+            else:
+                where.append("name LIKE ?")
+                args.append(f"%{lower}%")
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM media"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY size DESC LIMIT ?"
+        with self._lock:
+            cursor = self.conn.execute(sql, (*args, limit))
+            cursor.row_factory = sqlite3.Row
+            return cursor.fetchall()
+
+    def stats(self) -> dict[str, tuple[int, int]]:
+        with self._lock:
+            rows = self.conn.execute("SELECT kind, COUNT(*), COALESCE(SUM(size), 0) FROM media GROUP BY kind")
+            return {kind: (count, size) for kind, count, size in rows}
+
+    def status(self) -> str:
+        stats = self.stats()
+        if not stats:
+            return "Media catalog is empty."
+        lines = [f"{kind:<8} {count:>6} files  {_human(size):>10}" for kind, (count, size) in sorted(stats.items())]
+        return f"Media catalog ({self.path}):\n" + "\n".join(lines)
+
+    @staticmethod
+    def format(rows: list[sqlite3.Row]) -> str:
+        if not rows:
+            return "No matching media."
+        lines = []
+        for row in rows:
+            details = []
+            if row["width"]:
+                details.append(f"{row['width']}x{row['height']}")
+            if row["duration"]:
+                details.append(f"{row['duration']:.1f}s")
+            extra = f"  [{', '.join(details)}]" if details else ""
+            lines.append(f"{row['path']}  {row['mime']}  {_human(row['size'])}{extra}")
+        return "\n".join(lines)
+
+
+catalog = MediaCatalog()
@@ -4,9 +4,13 @@
 Memory module: handles conversation history, exports, and hybrid vector embeddings with progress feedback.
 """
 from pathlib import Path
+from collections import OrderedDict
 import json
 from datetime import datetime
+from bot_core import memory_vector_store
 from bot_core.memory_vector_store import build_vector_store, search_memory
+from bot_core.symbol_index import symbol_index
+from bot_core.tracing import span
 
 # Paths
 CONVO_PATH = Path("memory/conversation.json")
@@ -16,6 +20,13 @@ EXPORT_DIR = Path("memory/exports")
 EXPORT_DIR.mkdir(parents=True, exist_ok=True)
 CONVO_PATH.parent.mkdir(parents=True, exist_ok=True)
 
+# Recent search results, keyed by (query, top_k); saved and restored with chat sessions.
+# Dropped only when the store's content changes (memory_vector_store.store_version), not on
+# every rebuild.
+RETRIEVAL_CACHE_SIZE = 64
+retrieval_cache: "OrderedDict[tuple[str, int], list[str]]" = OrderedDict()
+_cache_version = memory_vector_store.store_version
+
 # Load or initialize conversation history
 conversation_history: list = []
 if CONVO_PATH.exists():
@@ -59,7 +70,25 @@ def build_embeddings() -> str:
 
 
 def query_embeddings(query: str, top_k: int = 5) -> list[str]:
-    return search_memory(query, top_k=top_k)
+    global _cache_version
+    if _cache_version != memory_vector_store.store_version:
+        retrieval_cache.clear()
+        _cache_version = memory_vector_store.store_version
+    key = (query, top_k)
+    with span("retrieve") as info:
+        info["cached"] = key in retrieval_cache
+        if info["cached"]:
+            retrieval_cache.move_to_end(key)
+            return list(retrieval_cache[key])
+        # A query naming a function or class gets its definition, not its nearest neighbours
+        hits = symbol_index.lookup(query, limit=top_k)
+        info["symbols"] = len(hits)
+        if not hits:
+            hits = search_memory(query, top_k=top_k)
+    retrieval_cache[key] = hits
+    while len(retrieval_cache) > RETRIEVAL_CACHE_SIZE:
+        retrieval_cache.popitem(last=False)
+    return list(hits)
 
 
 def cold_start_build() -> bool:
@@ -5,23 +5,88 @@ Sharded vector store with shard-level metadata index.
 Splits embeddings into multiple JSONL shards when exceeding size thresholds.
 Maintains a shard index of average embeddings for quick branch pruning during search.
 Supports efficient hybrid format with JSONL for text and NPZ for float vectors.
+Chunks learned from files carry their source path so they can be retired when the file
+changes or disappears; only shards touched since the last build are re-encoded.
 """
 import json
+import os
+import threading
+import uuid
 from pathlib import Path
-from sentence_transformers import SentenceTransformer, util
+from typing import Optional
 from tqdm import tqdm
 import numpy as np
+from bot_core.dedup_index import dedup_index
 from bot_core.logger_utils import log_error
+from bot_core.tracing import span
 
 VECTORS_DIR = Path("memory/vectors")
 SHARD_INDEX_PATH = Path("memory/shard_index.json")
 PROCESSED_COUNT_PATH = Path("memory/processed_count.txt")
+DIRTY_SHARDS_PATH = Path("memory/dirty_shards.json")
 
 VECTORS_DIR.mkdir(parents=True, exist_ok=True)
-EMBEDDER = SentenceTransformer("all-MiniLM-L6-v2")
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+_embedder = None
+_embedder_lock = threading.Lock()
 MAX_SHARD_SIZE = 75 * 1024 * 1024
 
 
+
+def _load_dirty() -> set[str]:
+    try:
+        with DIRTY_SHARDS_PATH.open("r", encoding="utf-8") as f:
+            return set(json.load(f))
+    except FileNotFoundError:
+        return set()
+    except (OSError, json.JSONDecodeError) as e:
+        # Unknown state: treat every shard as stale so nothing is paired with old vectors
+        log_error(f"Unreadable {DIRTY_SHARDS_PATH}, re-encoding all shards: {e}")
+        return {shard.name for shard in VECTORS_DIR.glob("shard_*.jsonl")}
+
+
+# Shards whose text changed since their embeddings were last built. Persisted (and written
+# before the shard itself) so a run that is interrupted before refresh_vector_store() still
+# gets its shards re-encoded by the next one.
+_dirty_shards: set[str] = _load_dirty()
+
+
+# Bumped whenever search results can change (chunks added or retired, changed shards
+# re-encoded), so cached search results know when they are stale
+store_version = 0
+
+
+def _bump_version() -> None:
+    global store_version
+    store_version += 1
+
+
+def _save_dirty() -> None:
+    try:
+        tmp = DIRTY_SHARDS_PATH.with_name(DIRTY_SHARDS_PATH.name + ".tmp")
+        tmp.write_text(json.dumps(sorted(_dirty_shards)), encoding="utf-8")
+        os.replace(tmp, DIRTY_SHARDS_PATH)
+    except OSError as e:
+        log_error(f"Failed writing {DIRTY_SHARDS_PATH}: {e}")
+
+
+def _mark_dirty(name: str) -> None:
+    if name not in _dirty_shards:
+        _dirty_shards.add(name)
+        _save_dirty()
+
+
+def get_embedder():
+    """The sentence embedder, loaded on first use (importing this module stays cheap)."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                from sentence_transformers import SentenceTransformer
+                _embedder = SentenceTransformer(EMBEDDING_MODEL)
+    return _embedder
+
+
 def _get_shard_files():
     return sorted(VECTORS_DIR.glob("shard_*.jsonl"))
 
@@ -32,26 +97,134 @@ def _get_text_and_ids(shard_path):
     with shard_path.open("r", encoding="utf-8") as f:
         for line in f:
             obj = json.loads(line)
+            if obj.get("duplicate_of"):
+                # Linked near-duplicates are kept as text only; the original carries the embedding
+                continue
             texts.append(obj["text"])
             ids.append(obj["id"])
     return ids, texts
 
 
-def build_vector_store():
-    index = {}
-    total_chunks = 0
-    for shard in tqdm(_get_shard_files(), desc="Encoding shards", unit="shard", ncols=80):
+def append_chunks(texts: list[str], source: str) -> list[Optional[str]]:
+    """
+    Append text chunks learned from `source` to the newest shard (starting a new shard
+    past MAX_SHARD_SIZE) and return their chunk ids, aligned with `texts`.
+    Near-duplicates of stored chunks (see dedup_index) are linked to the original and not
+    embedded, or with DEDUP_MODE="drop" not stored at all; their id is then None.
+    """
+    if not texts:
+        return []
+    shards = _get_shard_files()
+    shard = shards[-1] if shards and shards[-1].stat().st_size < MAX_SHARD_SIZE \
+        else VECTORS_DIR / f"shard_{len(shards):03d}.jsonl"
+    ids = [uuid.uuid4().hex[:16] for _ in texts]
+    _mark_dirty(shard.name)
+    with shard.open("a", encoding="utf-8") as f:
+        for i, (chunk_id, text) in enumerate(zip(ids, texts)):
+            record = {"id": chunk_id, "text": text, "source": source}
+            original = dedup_index.check(chunk_id, text, source) if dedup_index.enabled else None
+            if original is not None:
+                if dedup_index.mode == "drop":
+                    ids[i] = None
+                    continue
+                record["duplicate_of"] = original
+            f.write(json.dumps(record) + "\n")
+    _bump_version()
+    return ids
+
+
+def retire_chunks(chunk_ids) -> int:
+    """Remove the given chunks from every shard; returns how many were removed."""
+    chunk_ids = set(chunk_ids)
+    if not chunk_ids:
+        return 0
+    dedup_index.drop_chunks(chunk_ids)
+    removed = 0
+    for shard in _get_shard_files():
+        with shard.open("r", encoding="utf-8") as f:
+            lines = f.readlines()
+        kept, changed = [], False
+        for line in lines:
+            obj = json.loads(line)
+            if obj["id"] in chunk_ids:
+                changed = True
+                continue
+            if obj.get("duplicate_of") in chunk_ids:
+                # The original is gone: the duplicate becomes a regular chunk (or links to
+                # another duplicate promoted before it) and is embedded with its shard
+                changed = True
+                del obj["duplicate_of"]
+                original = dedup_index.check(obj["id"], obj["text"], obj.get("source", ""))
+                if original is not None:
+                    obj["duplicate_of"] = original
+                line = json.dumps(obj) + "\n"
+            kept.append(line)
+        if not changed:
+            continue
+        removed += len(lines) - len(kept)
+        tmp = shard.with_name(shard.name + ".tmp")
+        tmp.write_text("".join(kept), encoding="utf-8")
+        _mark_dirty(shard.name)
+        os.replace(tmp, shard)
+        _bump_version()
+    return removed
+
+
+def source_chunk_ids(source: str) -> list[str]:
+    """Ids of the stored chunks learned from `source`, including its archive members."""
+    ids = []
+    for shard in _get_shard_files():
+        with shard.open("r", encoding="utf-8") as f:
+            for line in f:
+                obj = json.loads(line)
+                chunk_source = obj.get("source", "")
+                if chunk_source == source or chunk_source.startswith(source + "!"):
+                    ids.append(obj["id"])
+    return ids
+
+
+def refresh_vector_store() -> int:
+    """Re-encode only the shards changed by append_chunks/retire_chunks; returns their count."""
+    dirty = sorted(_dirty_shards)
+    if dirty:
+        build_vector_store(shards=[VECTORS_DIR / name for name in dirty])
+    return len(dirty)
+
+
+def build_vector_store(shards: list[Path] | None = None):
+    """Encode shards (all of them by default) and update the shard index."""
+    if shards is None:
+        index, shards = {}, _get_shard_files()
+    else:
+        try:
+            with SHARD_INDEX_PATH.open("r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            index = {}
+    for shard in tqdm(shards, desc="Encoding shards", unit="shard", ncols=80):
         try:
-            ids, texts = _get_text_and_ids(shard)
-            embeddings = EMBEDDER.encode(texts, convert_to_numpy=True)
             shard_npz = VECTORS_DIR / shard.name.replace(".jsonl", ".npz")
-            np.savez_compressed(shard_npz, embeddings=embeddings)
-            index[shard.name] = np.mean(embeddings, axis=0).tolist()
-            total_chunks += len(ids)
+            ids, texts = _get_text_and_ids(shard)
+            if not texts:
+                index.pop(shard.name, None)
+                shard_npz.unlink(missing_ok=True)
+            else:
+                embeddings = get_embedder().encode(texts, convert_to_numpy=True)
+                np.savez_compressed(shard_npz, embeddings=embeddings)
+                index[shard.name] = np.mean(embeddings, axis=0).tolist()
+            # Only a shard whose embeddings were written stops being dirty
+            if shard.name in _dirty_shards:
+                _dirty_shards.discard(shard.name)
+                _bump_version()
         except Exception as e:
             log_error(f"Failed processing {shard.name}: {e}")
+    _save_dirty()
 
     try:
+        total_chunks = 0
+        for shard in _get_shard_files():
+            with shard.open("rb") as f:
+                total_chunks += sum(1 for _ in f)
         with SHARD_INDEX_PATH.open("w", encoding="utf-8") as f:
             json.dump(index, f)
         PROCESSED_COUNT_PATH.write_text(str(total_chunks))
@@ -60,6 +233,8 @@ def build_vector_store():
 
 
 def search_memory(query: str, top_k: int = 3) -> list[str]:
+    from sentence_transformers import util
+
     try:
         if SHARD_INDEX_PATH.exists():
             with SHARD_INDEX_PATH.open("r", encoding="utf-8") as f:
@@ -67,7 +242,8 @@ def search_memory(query: str, top_k: int = 3) -> list[str]:
         else:
             index = {}
 
-        query_vec = EMBEDDER.encode(query)
+        with span("retrieve.embed"):
+            query_vec = get_embedder().encode(query)
         shard_sims = []
         for shard_name, avg_vec in index.items():
             try:
@@ -84,10 +260,17 @@ def search_memory(query: str, top_k: int = 3) -> list[str]:
             jsonl_path = VECTORS_DIR / shard_name
             npz_path = jsonl_path.with_suffix(".npz")
             try:
-                ids, texts = _get_text_and_ids(jsonl_path)
-                embeddings = np.load(npz_path)["embeddings"]
-                sims = util.cos_sim(query_vec, embeddings)[0].tolist()
-                reranked = sorted(zip(sims, texts), key=lambda x: x[0], reverse=True)
+                with span("retrieve.shard_load", shard=shard_name):
+                    ids, texts = _get_text_and_ids(jsonl_path)
+                    embeddings = np.load(npz_path)["embeddings"]
+                if len(embeddings) != len(texts):
+                    # Text changed after the last encode; ranking would pair texts with wrong vectors
+                    log_error(f"Skipping {shard_name}: {len(texts)} chunks but {len(embeddings)} embeddings")
+                    _mark_dirty(shard_name)
+                    continue
+                with span("retrieve.rank", chunks=len(texts)):
+                    sims = util.cos_sim(query_vec, embeddings)[0].tolist()
+                    reranked = sorted(zip(sims, texts), key=lambda x: x[0], reverse=True)
                 results.extend(reranked)
             except Exception as e:
                 log_error(f"Search failed in {shard_name}: {e}")
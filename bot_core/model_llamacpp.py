@@ -5,6 +5,11 @@ import json
 from pathlib import Path
 from llama_cpp import Llama
 from bot_core.memory import conversation_history, save_conversation
+from bot_core.response_cache import response_cache
+from bot_core.autotune import apply_host_profile
+from bot_core.gguf_reader import read_gguf_metadata
+from bot_core.chat_session import ChatSession
+from bot_core.generation_control import GenerationControl
 from config import MODEL_PATH, GPU_LAYERS, N_THREADS, CTX_SIZE, N_BATCH, TEMPERATURE, TOP_P, REPEAT_PENALTY, N_PREDICT
 
 # Load Sapphira's personality profile
@@ -19,29 +24,67 @@ sapphira = load_profile()
 # Model settings
 
 _llm: Llama | None = None
+_session: ChatSession | None = None
 
 def init_llm(config: dict | None = None) -> callable:
     """
     Initialize the LLM, perform a warm-up, and return the response-generating function.
     """
-    global _llm
+    global _llm, _session
     if _llm is None:
+        # Tuned thread/batch/context settings for this host take precedence over config.py
+        tuned = apply_host_profile(MODEL_PATH, {"n_ctx": CTX_SIZE, "n_batch": N_BATCH, "n_threads": N_THREADS})
+        check_model_file(tuned)
         _llm = Llama(
             model_path=str(MODEL_PATH),
-            n_ctx=CTX_SIZE,
-            n_batch=N_BATCH,
+            n_ctx=tuned["n_ctx"],
+            n_batch=tuned["n_batch"],
             temperature=TEMPERATURE,
             top_p=TOP_P,
             repeat_penalty=REPEAT_PENALTY,
             n_gpu_layers=GPU_LAYERS,
-            n_threads=N_THREADS,
+            n_threads=tuned["n_threads"],
             verbose=False
     )
         # Warm up model to avoid first-call lag
         _llm("Hello", max_tokens=1, temperature=0.0)
+        _session = ChatSession(_llm, system_prompt())
     return generate_response
 
 
+def get_session() -> ChatSession | None:
+    """The running conversation (None until init_llm() has been called)."""
+    return _session
+
+
+def system_prompt() -> str:
+    return (
+        f"SYSTEM: You are Sapphira, a {sapphira.get('age')}-year-old AI.\n"
+        f"Personality: {sapphira.get('personality')}\n"
+        f"Quirks: {', '.join(sapphira.get('quirks', []))}\n"
+        f"Style: {sapphira.get('style')}\n"
+        "Respond naturally in first person; stay in character.\n"
+    )
+
+
+def check_model_file(settings: dict) -> None:
+    """
+    Sanity-check MODEL_PATH from its GGUF header before paying for a full load.
+    Raises on a missing or non-GGUF file and clamps n_ctx to the trained context length.
+    """
+    try:
+        info = read_gguf_metadata(MODEL_PATH, read_tensors=False)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Model file not found: {MODEL_PATH} (check MODEL_PATH in config.py)")
+    except ValueError as e:
+        raise ValueError(f"Cannot load {MODEL_PATH}: {e}")
+    if info.context_length and settings["n_ctx"] > info.context_length:
+        print(f"[WARN] n_ctx={settings['n_ctx']} exceeds the model's trained context "
+              f"({info.context_length}); using {info.context_length}.")
+        settings["n_ctx"] = info.context_length
+    print(f"[INFO] Model: {info.architecture}, {info.quantization}, {info.tensor_count} tensors")
+
+
 def clean_repetition(response: str) -> str:
     """Remove duplicate patterns like '1990s, 1990s'."""
     match = re.search(r"(\b\d{4}s\b)(?:, \1)+", response)
@@ -55,36 +98,40 @@ def strip_prompt_formatting(text: str) -> str:
     return re.sub(r"^(USER:|ASSISTANT:|SAPPHIRA:)\s*", "", text.strip(), flags=re.IGNORECASE)
 
 
-def generate_response(prompt: str, verbose: bool = False) -> str:
+def generate_response(prompt: str, verbose: bool = False, control: GenerationControl | None = None) -> str:
     """
     Generate a reply using the LLM, post-process, save to memory, and return clean text.
+    If `control` is cancelled or hits a deadline, the partial reply is returned (and not cached).
     """
     if _llm is None:
         raise RuntimeError("LLM not initialized; call init_llm() first.")
 
+    model_key = Path(MODEL_PATH).stem
+    # Keyed on this user turn alone (this path retrieves no context); the whole transcript
+    # would make every key unique
+    cached = response_cache.get(model_key, prompt, temperature=TEMPERATURE, max_tokens=N_PREDICT)
+    if cached is not None:
+        _session.add_exchange(prompt, cached)
+        conversation_history.append({"role": "assistant", "content": cached})
+        save_conversation(conversation_history)
+        return cached
+    user_prompt = prompt
+
     if any(tok in prompt.lower() for tok in ("def ", "import ", "class ")):
         prompt += "\n(Please reply in natural language unless I request code.)"
 
-    system_prompt = (
-        f"SYSTEM: You are Sapphira, a {sapphira.get('age')}-year-old AI.\n"
-        f"Personality: {sapphira.get('personality')}\n"
-        f"Quirks: {', '.join(sapphira.get('quirks', []))}\n"
-        f"Style: {sapphira.get('style')}\n"
-        "Respond naturally in first person; stay in character.\n"
-    )
-    user_block = f"USER: {prompt}\n"
-    full_prompt = system_prompt + user_block
-
-    result = _llm(
-        full_prompt,
+    control = control or GenerationControl.from_config()
+    # The session re-uses the KV cache of previous turns; only this turn is prefilled
+    final = _session.reply(
+        prompt,
         max_tokens=N_PREDICT,
         temperature=TEMPERATURE,
-        stop=["USER:", "\nSAPPHIRA:"]
+        stop=["USER:", "\nSAPPHIRA:"],
+        postprocess=lambda raw: strip_prompt_formatting(clean_repetition(raw)),
+        control=control,
     )
-    raw = result["choices"][0]["text"].strip()
-
-    cleaned = clean_repetition(raw)
-    final = strip_prompt_formatting(cleaned)
+    if not control.reason:
+        response_cache.put(model_key, user_prompt, final, temperature=TEMPERATURE, max_tokens=N_PREDICT)
 
     conversation_history.append({"role": "assistant", "content": final})
     save_conversation(conversation_history)
@@ -0,0 +1,233 @@
+# bot_core/model_manager.py
+
+"""
+On-demand model loading under a RAM budget.
+Models are constructed on first use and kept in least-recently-used order; loading a
+model that would exceed the budget evicts the coldest resident models first. Models held
+through use() (every ModelHandle call) are never evicted while in use; they keep counting
+against the budget until released.
+Optionally, a background thread preloads the model most likely to be requested next,
+predicted from the observed sequence of model switches.
+"""
+import gc
+import os
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from bot_core.autotune import apply_host_profile
+from bot_core.gguf_reader import read_gguf_metadata
+from bot_core.logger_utils import log_error, logger
+
+GB = 1024 ** 3
+
+
+def default_loader(name: str, cfg: dict) -> Any:
+    """Construct a llama.cpp model from a MODEL_CONFIGS entry."""
+    from llama_cpp import Llama
+    return Llama(model_path=cfg["path"], **apply_host_profile(cfg["path"], cfg["kwargs"]))
+
+
+def estimate_model_bytes(cfg: dict) -> int:
+    """
+    Approximate resident size of a model: its weights plus the KV cache for the configured
+    context, both read from the GGUF header. Falls back to the file size.
+    """
+    try:
+        info = read_gguf_metadata(cfg["path"])
+        n_ctx = apply_host_profile(cfg["path"], cfg["kwargs"]).get("n_ctx", 512)
+        return (info.tensor_bytes or info.file_size) + info.kv_cache_bytes(n_ctx)
+    except (OSError, ValueError):
+        try:
+            return os.path.getsize(cfg["path"])
+        except OSError:
+            return 0
+
+
+class ModelManager:
+    """
+    Lazily loads MODEL_CONFIGS entries and evicts least-recently-used models
+    when the configured memory budget would be exceeded.
+
+    Args:
+        configs (dict): Mapping of model name -> {"path": ..., "kwargs": {...}}.
+        budget_bytes (int | None): Maximum estimated bytes resident at once (None = unlimited).
+        loader (Callable | None): Factory ``loader(name, cfg)`` returning a model object.
+        preload (bool): Preload the predicted next model in a background thread.
+    """
+
+    def __init__(self, configs: dict, budget_bytes: Optional[int] = None,
+                 loader: Optional[Callable[[str, dict], Any]] = None, preload: bool = False):
+        self.configs = configs
+        self.budget_bytes = budget_bytes
+        self.loader = loader or default_loader
+        self.preload_enabled = preload
+
+        self._models: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: dict[str, int] = {}
+        self._reserved: dict[str, int] = {}
+        # Models currently being generated with (see use()), by holder count
+        self._in_use: Counter = Counter()
+        self._lock = threading.RLock()
+        self._load_locks = {name: threading.Lock() for name in configs}
+
+        self._transitions: dict[str, Counter] = defaultdict(Counter)
+        self._last_used: Optional[str] = None
+        self._preload_thread: Optional[threading.Thread] = None
+
+    # --- public API ---
+
+    def get(self, name: str, track: bool = True) -> Any:
+        """
+        Return the model for `name`, loading it (and evicting others) if needed.
+        With track=False the access is left out of next-model prediction, e.g. for a
+        draft model used internally by another model.
+        """
+        if name not in self.configs:
+            raise ValueError(f"Model '{name}' not configured.")
+        model = self._acquire(name)
+        if track:
+            self._record_use(name)
+        return model
+
+    @contextmanager
+    def use(self, name: str, track: bool = True) -> Iterator[Any]:
+        """Like get(), but the model cannot be evicted until the block exits."""
+        if name not in self.configs:
+            raise ValueError(f"Model '{name}' not configured.")
+        with self._lock:
+            self._in_use[name] += 1
+        try:
+            model = self._acquire(name)
+            if track:
+                self._record_use(name)
+            yield model
+        finally:
+            with self._lock:
+                self._in_use[name] -= 1
+                if self._in_use[name] <= 0:
+                    del self._in_use[name]
+
+    def is_loaded(self, name: str) -> bool:
+        with self._lock:
+            return name in self._models
+
+    def loaded(self) -> list[str]:
+        """Resident model names, least recently used first."""
+        with self._lock:
+            return list(self._models)
+
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values()) + sum(self._reserved.values())
+
+    def unload(self, name: str) -> bool:
+        with self._lock:
+            if name not in self._models or self._in_use.get(name):
+                return False
+            self._evict(name)
+        gc.collect()
+        return True
+
+    def status(self) -> str:
+        with self._lock:
+            budget = f"{self.budget_bytes / GB:.1f} GB" if self.budget_bytes else "unlimited"
+            models = ", ".join(f"{n} ({self._sizes[n] / GB:.1f} GB)" for n in self._models) or "none"
+            return f"Resident: {models} | Used: {self.resident_bytes() / GB:.1f} GB of {budget}"
+
+    # --- loading and eviction ---
+
+    def _acquire(self, name: str, preloading: bool = False) -> Any:
+        with self._lock:
+            if name in self._models:
+                if not preloading:
+                    self._models.move_to_end(name)
+                return self._models[name]
+
+        with self._load_locks[name]:
+            with self._lock:
+                # Another thread may have finished loading while we waited
+                if name in self._models:
+                    if not preloading:
+                        self._models.move_to_end(name)
+                    return self._models[name]
+                size = estimate_model_bytes(self.configs[name])
+                if preloading and not self._fits(size):
+                    # Never evict a model just to speculate about the next request
+                    return None
+                evicted = self._make_room(size)
+                self._reserved[name] = size
+            if evicted:
+                gc.collect()
+
+            print(f"Loading {name} (ctx={self.configs[name]['kwargs'].get('n_ctx')})...")
+            try:
+                model = self.loader(name, self.configs[name])
+            finally:
+                with self._lock:
+                    self._reserved.pop(name, None)
+
+            with self._lock:
+                self._models[name] = model
+                self._sizes[name] = size
+            return model
+
+    def _fits(self, size: int) -> bool:
+        return self.budget_bytes is None or self.resident_bytes() + size <= self.budget_bytes
+
+    def _make_room(self, size: int) -> list[str]:
+        """
+        Evict least-recently-used models until `size` more bytes fit in the budget. Models in
+        use by another thread stay resident (and counted), since dropping our reference
+        would not free them.
+        """
+        evicted = []
+        for victim in [n for n in self._models if not self._in_use.get(n)]:
+            if self._fits(size):
+                break
+            self._evict(victim)
+            evicted.append(victim)
+        if not self._fits(size):
+            busy = [n for n in self._models if self._in_use.get(n)]
+            log_error(f"Model of {size / GB:.1f} GB exceeds RAM budget of {self.budget_bytes / GB:.1f} GB"
+                      f"{' (in use: ' + ', '.join(busy) + ')' if busy else ''}; loading anyway.")
+        return evicted
+
+    def _evict(self, name: str) -> None:
+        logger.info(f"Evicting {name} to stay within RAM budget...")
+        self._models.pop(name, None)
+        self._sizes.pop(name, None)
+
+    # --- next-model prediction ---
+
+    def _record_use(self, name: str) -> None:
+        with self._lock:
+            if self._last_used is not None:
+                self._transitions[self._last_used][name] += 1
+            self._last_used = name
+        if self.preload_enabled:
+            predicted = self.predict_next(name)
+            if predicted and predicted != name and not self.is_loaded(predicted):
+                self._start_preload(predicted)
+
+    def predict_next(self, current: str) -> Optional[str]:
+        """Most frequently observed successor of `current`, if any."""
+        with self._lock:
+            followers = self._transitions.get(current)
+            if not followers:
+                return None
+            return followers.most_common(1)[0][0]
+
+    def _start_preload(self, name: str) -> None:
+        if self._preload_thread is not None and self._preload_thread.is_alive():
+            return
+
+        def _run():
+            try:
+                self._acquire(name, preloading=True)
+            except Exception as e:
+                log_error(f"Background preload of {name} failed: {e}")
+
+        self._preload_thread = threading.Thread(target=_run, name=f"preload-{name}", daemon=True)
+        self._preload_thread.start()
@@ -1,18 +1,14 @@
-from llama_cpp import Llama
-from config import PHI2_PATH
+from bot_core.model_registry import get_handle
+from bot_core.generation_control import GenerationControl
 
-# Load the Phi-2 model
-memory_model = Llama(
-    model_path=PHI2_PATH,
-    n_ctx=2048,
-    n_threads=8,
-    n_batch=32,
-    n_gpu_layers=0
-)
+# Shared handle to the Phi-2 model; it is loaded on the first summarize_or_retrieve() call
+memory_model = get_handle("memory")
 
-def summarize_or_retrieve(prompt: str) -> str:
+def summarize_or_retrieve(prompt: str, control: GenerationControl | None = None) -> str:
     """
     Uses the Phi-2 model to summarize input text or help answer memory-related questions.
     """
-    result = memory_model(prompt, max_tokens=512, stop=["###", "User:"])
+    control = (control or GenerationControl.from_config()).start()
+    result = memory_model(prompt, max_tokens=control.cap_tokens(512), stopping_criteria=control.stopping_criteria(),
+                          stop=["###", "User:"])
     return result["choices"][0]["text"].strip()
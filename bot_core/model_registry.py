@@ -0,0 +1,110 @@
+# bot_core/model_registry.py
+
+"""
+Central model registry.
+Models are declared once in config.MODEL_CONFIGS (with role aliases in MODEL_ROLES) and
+handed out as lightweight handles. Nothing is loaded at import time: a handle asks the
+shared ModelManager for its model on first call, so routing a prompt loads only the model
+it is dispatched to, under the same RAM budget for every caller. Calls through a handle are
+serialized per model, because a llama.cpp context cannot serve two generations at once.
+"""
+import threading
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Iterator, Optional
+
+from bot_core.gguf_reader import validate_model_config
+from bot_core.model_manager import GB, ModelManager
+from config import MODEL_CONFIGS, MODEL_ROLES, MODEL_RAM_BUDGET_GB, PRELOAD_NEXT_MODEL
+
+_manager: Optional[ModelManager] = None
+_handles: dict[tuple[str, bool], "ModelHandle"] = {}
+_model_locks: dict[str, threading.RLock] = {}
+_registry_lock = threading.Lock()
+
+
+def resolve(name_or_role: str) -> str:
+    """Map a role ("chat", "code", "memory") or model name to a MODEL_CONFIGS key."""
+    name = MODEL_ROLES.get(name_or_role, name_or_role)
+    if name not in MODEL_CONFIGS:
+        raise ValueError(f"Model '{name_or_role}' not configured.")
+    return name
+
+
+def get_manager() -> ModelManager:
+    """The process-wide ModelManager, created (without loading anything) on first use."""
+    global _manager
+    with _registry_lock:
+        if _manager is None:
+            configs = {}
+            for name, cfg in MODEL_CONFIGS.items():
+                configs[name], warnings = validate_model_config(name, cfg)
+                for warning in warnings:
+                    print(f"[WARN] {warning}")
+            budget = int(MODEL_RAM_BUDGET_GB * GB) if MODEL_RAM_BUDGET_GB else None
+            _manager = ModelManager(configs, budget_bytes=budget, preload=PRELOAD_NEXT_MODEL)
+        return _manager
+
+
+def configure(budget_gb: Optional[float] = None, loader: Optional[Callable[[str, dict], Any]] = None,
+              preload: Optional[bool] = None) -> ModelManager:
+    """Adjust the shared manager (e.g. from CLI flags); affects models loaded afterwards."""
+    manager = get_manager()
+    if budget_gb is not None:
+        manager.budget_bytes = int(budget_gb * GB) if budget_gb else None
+    if loader is not None:
+        manager.loader = loader
+    if preload is not None:
+        manager.preload_enabled = preload
+    return manager
+
+
+class ModelHandle:
+    """
+    Shared, lazily-loaded, thread-safe reference to one configured model.
+    Calling the handle behaves like calling the Llama object.
+    """
+
+    def __init__(self, name: str, lock: threading.RLock, track: bool = True):
+        self.name = name
+        self.track = track
+        self._lock = lock
+
+    @contextmanager
+    def acquire(self) -> Iterator[Any]:
+        """Hold the model exclusively for several operations (tokenize, eval, save_state...)."""
+        with self._lock, get_manager().use(self.name, track=self.track) as model:
+            yield model
+
+    def __call__(self, *args, **kwargs) -> dict:
+        with self.acquire() as model:
+            return model(*args, **kwargs)
+
+    def create_completion(self, *args, **kwargs) -> dict:
+        with self.acquire() as model:
+            return model.create_completion(*args, **kwargs)
+
+    @property
+    def loaded(self) -> bool:
+        return get_manager().is_loaded(self.name)
+
+    def __repr__(self) -> str:
+        return f"ModelHandle({self.name!r}, loaded={self.loaded})"
+
+
+def hold(model: Any):
+    """Context manager yielding the Llama behind a handle (held exclusively) or a bare Llama as-is."""
+    return model.acquire() if isinstance(model, ModelHandle) else nullcontext(model)
+
+
+def get_handle(name_or_role: str, track: bool = True) -> ModelHandle:
+    """
+    Return the shared handle for a model name or role. Nothing is loaded until it is used.
+    With track=False, uses are left out of next-model prediction (e.g. draft models).
+    """
+    name = resolve(name_or_role)
+    with _registry_lock:
+        lock = _model_locks.setdefault(name, threading.RLock())
+        handle = _handles.get((name, track))
+        if handle is None:
+            handle = _handles[(name, track)] = ModelHandle(name, lock, track)
+        return handle
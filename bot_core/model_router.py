@@ -1,25 +1,28 @@
-from code_model import generate_code
-from chat_model import generate_chat
-from memory_model import summarize_or_retrieve
+import time
+
+from bot_core.code_codel import generate_code
+from bot_core.chat_model import generate_chat
+from bot_core.model_memory import summarize_or_retrieve
+from bot_core.learned_router import router
+from config import MODEL_ROLES
+
+HANDLERS = {
+    "code": generate_code,
+    "memory": summarize_or_retrieve,
+    "chat": generate_chat,
+}
 
 
 def route(prompt: str) -> str:
     """
-    Routes a prompt to the appropriate model based on content.
+    Routes a prompt to the cheapest model able to handle it (see bot_core.learned_router).
+    Only the model that is dispatched to gets loaded (see bot_core.model_registry).
     """
-    prompt_lower = prompt.lower()
-
-    # 1. Code-related prompts
-    if prompt_lower.startswith("/code") or "generate a script" in prompt_lower or "write code" in prompt_lower:
-        return generate_code(prompt)
-
-    # 2. Memory queries or summarization
-    elif prompt_lower.startswith("/memory") or "summarize" in prompt_lower or "what did i say" in prompt_lower:
-        return summarize_or_retrieve(prompt)
-
-    # 3. Default: chat model handles it
-    else:
-        return generate_chat(prompt)
+    role = router.choose_role(prompt)
+    start = time.perf_counter()
+    response = HANDLERS[role](prompt)
+    router.record_latency(MODEL_ROLES[role], time.perf_counter() - start)
+    return response
 
 
 # Optional: Add routing debug if needed
@@ -0,0 +1,384 @@
+# bot_core/model_workers.py
+
+"""
+Per-model worker processes.
+Each configured model is hosted in its own process so a long generation on one model does
+not block requests to another, and a crash only takes down that model's worker.
+
+IPC is a multiprocessing Pipe carrying small dicts:
+  parent -> worker: {"op": "generate", "id", "prompt", "max_tokens", "temperature", "max_seconds"}
+                    {"op": "unload", "id"} | {"op": "cancel", "id"} | {"op": "ping", "id"} | {"op": "shutdown"}
+  worker -> parent: {"id", "ok": True, "text", "stopped"} | {"id", "ok": False, "error"} | {"id", "pong": True}
+
+Inside the worker a receiver thread answers pings and cancellations immediately while the
+main thread generates. Workers are pinned to a CPU slice sized by the model's n_threads.
+A monitor thread pings every worker and restarts any that died or stopped answering.
+
+Workers load their model on first use and count against the same RAM budget as the
+in-process registry (estimate_model_bytes): before a request makes a worker load, the
+least recently used idle workers are told to unload until it fits.
+"""
+import gc
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Optional
+
+from bot_core.autotune import apply_host_profile
+from bot_core.generation_control import GenerationControl
+from bot_core.logger_utils import log_error, logger
+from bot_core.model_manager import GB, estimate_model_bytes
+from bot_core.worker_entry import ignore_sigint, lightweight_main, spawn_context
+
+HEALTH_INTERVAL = 5.0
+PING_TIMEOUT = 10.0
+RESTART_BACKOFF = 2.0
+UNLOAD_TIMEOUT = 30.0
+
+
+class WorkerCrashed(RuntimeError):
+    """Raised for requests that were in flight when their worker process died."""
+
+
+# --- worker process side ---
+
+def _pin_to_cpus(cpus: list[int]) -> None:
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cpus)
+        else:
+            import psutil
+            psutil.Process().cpu_affinity(cpus)
+    except Exception as e:
+        log_error(f"Could not pin worker to CPUs {cpus}: {e}")
+
+
+def _worker_main(name: str, cfg: dict, conn, cpus: list[int]) -> None:
+    """Entry point of a model worker process."""
+    ignore_sigint()
+    _pin_to_cpus(cpus)
+    kwargs = apply_host_profile(cfg["path"], cfg["kwargs"])
+    kwargs["n_threads"] = max(1, min(kwargs.get("n_threads", len(cpus)), len(cpus)))
+
+    send_lock = threading.Lock()
+    requests: "queue.Queue[dict]" = queue.Queue()
+    # One control per request; a cancel arriving before its request creates it pre-cancelled
+    controls: dict[int, GenerationControl] = {}
+
+    def send(msg: dict) -> None:
+        with send_lock:
+            conn.send(msg)
+
+    def receive() -> None:
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                requests.put({"op": "shutdown"})
+                return
+            op = msg.get("op")
+            if op == "ping":
+                send({"id": msg["id"], "pong": True})
+            elif op == "cancel":
+                controls.setdefault(msg["id"], GenerationControl()).cancel()
+            else:
+                requests.put(msg)
+                if op == "shutdown":
+                    return
+
+    threading.Thread(target=receive, name="ipc-receiver", daemon=True).start()
+
+    llm = None
+    while True:
+        msg = requests.get()
+        if msg["op"] == "shutdown":
+            break
+        job_id = msg["id"]
+        if msg["op"] == "unload":
+            llm = None
+            gc.collect()
+            send({"id": job_id, "ok": True, "text": ""})
+            continue
+        control = controls.setdefault(job_id, GenerationControl())
+        if control.cancelled:
+            controls.pop(job_id, None)
+            send({"id": job_id, "ok": True, "text": ""})
+            continue
+        control.max_seconds = msg.get("max_seconds")
+        try:
+            if llm is None:
+                from llama_cpp import Llama
+                llm = Llama(model_path=cfg["path"], **kwargs)
+            control.start()
+            resp = llm(prompt=msg["prompt"], max_tokens=msg["max_tokens"],
+                       temperature=msg["temperature"], stopping_criteria=control.stopping_criteria())
+            send({"id": job_id, "ok": True, "text": resp["choices"][0]["text"], "stopped": control.reason})
+        except Exception as e:
+            send({"id": job_id, "ok": False, "error": f"{type(e).__name__}: {e}"})
+        finally:
+            controls.pop(job_id, None)
+    conn.close()
+
+
+# --- parent side ---
+
+class ModelWorker:
+    """Parent-side handle of one model's worker process."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, name: str, cfg: dict, cpus: list[int]):
+        self.name = name
+        self.cfg = cfg
+        self.cpus = cpus
+        self.restarts = 0
+        # Whether the worker holds its model (as far as the pool has asked it to), and when it was last used
+        self.loaded = False
+        self.last_used = 0.0
+        self.process: Optional[mp.Process] = None
+        self._conn = None
+        self._pending: dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._ctx = spawn_context()
+
+    def start(self) -> None:
+        self.loaded = False
+        parent_conn, child_conn = self._ctx.Pipe()
+        self.process = self._ctx.Process(
+            target=_worker_main, args=(self.name, self.cfg, child_conn, self.cpus),
+            name=f"model-{self.name}", daemon=True,
+        )
+        # The child imports only this module and llama_cpp, not the app's entry script
+        with lightweight_main():
+            self.process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        threading.Thread(target=self._read_replies, args=(parent_conn,),
+                         name=f"replies-{self.name}", daemon=True).start()
+
+    def is_alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def busy(self) -> bool:
+        with self._lock:
+            return bool(self._pending)
+
+    def request(self, msg: dict) -> Future:
+        msg["id"] = next(self._ids)
+        future: Future = Future()
+        future.job_id = msg["id"]
+        with self._lock:
+            if not self.is_alive():
+                future.set_exception(WorkerCrashed(f"Worker for {self.name} is not running."))
+                return future
+            self._pending[msg["id"]] = future
+            try:
+                self._conn.send(msg)
+            except (OSError, BrokenPipeError) as e:
+                self._pending.pop(msg["id"], None)
+                future.set_exception(WorkerCrashed(f"Worker for {self.name} is unreachable: {e}"))
+        return future
+
+    def cancel(self, job_id: int) -> None:
+        with self._lock:
+            try:
+                self._conn.send({"op": "cancel", "id": job_id})
+            except (OSError, BrokenPipeError):
+                pass
+
+    def ping(self, timeout: float = PING_TIMEOUT) -> bool:
+        try:
+            return bool(self.request({"op": "ping"}).result(timeout=timeout).get("pong"))
+        except (FutureTimeout, WorkerCrashed):
+            return False
+
+    def restart(self) -> None:
+        self.stop(graceful=False)
+        self.restarts += 1
+        print(f"Restarting worker for {self.name} (restart #{self.restarts})...")
+        self.start()
+
+    def stop(self, graceful: bool = True) -> None:
+        with self._lock:
+            if self.is_alive():
+                if graceful:
+                    try:
+                        self._conn.send({"op": "shutdown"})
+                        self.process.join(timeout=5)
+                    except (OSError, BrokenPipeError):
+                        pass
+                if self.process.is_alive():
+                    self.process.terminate()
+                    self.process.join(timeout=5)
+            self._fail_pending(f"Worker for {self.name} stopped.")
+
+    def _read_replies(self, conn) -> None:
+        while True:
+            try:
+                msg = conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                future = self._pending.pop(msg.get("id"), None)
+            if future is None:
+                continue
+            if msg.get("pong"):
+                future.set_result(msg)
+            elif msg.get("ok"):
+                future.stopped = msg.get("stopped")  # why the worker cut the answer short, if it did
+                future.set_result(msg["text"])
+            else:
+                future.set_exception(RuntimeError(msg.get("error", "unknown worker error")))
+        with self._lock:
+            if conn is self._conn:
+                self._fail_pending(f"Worker for {self.name} exited.")
+
+    def _fail_pending(self, reason: str) -> None:
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(WorkerCrashed(reason))
+        self._pending.clear()
+
+
+def plan_cpu_slices(configs: dict, cpu_count: Optional[int] = None) -> dict[str, list[int]]:
+    """
+    Give each model a contiguous CPU slice of n_threads cores (capped at the machine's
+    core count). Slices are disjoint while cores last and wrap around after that.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    slices, start = {}, 0
+    for name, cfg in configs.items():
+        threads = apply_host_profile(cfg["path"], cfg["kwargs"]).get("n_threads", 1)
+        want = max(1, min(int(threads), cpu_count))
+        slices[name] = [(start + i) % cpu_count for i in range(want)]
+        start = (start + want) % cpu_count
+    return slices
+
+
+class WorkerPool:
+    """
+    One worker process per configured model, with health monitoring and auto-restart.
+
+    Args:
+        configs (dict): MODEL_CONFIGS-style mapping of model name -> {"path", "kwargs"}.
+        budget_bytes (int | None): Maximum estimated bytes of models held by all workers (None = unlimited).
+    """
+
+    def __init__(self, configs: dict, budget_bytes: Optional[int] = None):
+        self.workers = {
+            name: ModelWorker(name, cfg, cpus)
+            for (name, cfg), cpus in zip(configs.items(), plan_cpu_slices(configs).values())
+        }
+        self.budget_bytes = budget_bytes
+        self._sizes: dict[str, int] = {}
+        self._budget_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        for worker in self.workers.values():
+            worker.start()
+        self._monitor = threading.Thread(target=self._health_loop, name="worker-health", daemon=True)
+        self._monitor.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        for worker in self.workers.values():
+            worker.stop()
+
+    def submit(self, model: str, prompt: str, max_tokens: int = 128, temperature: float = 0.7,
+               max_seconds: Optional[float] = None) -> Future:
+        """Dispatch a generation to the model's worker; returns a Future of the text."""
+        if model not in self.workers:
+            raise ValueError(f"Model '{model}' not configured.")
+        self._make_room(model)
+        return self.workers[model].request({
+            "op": "generate", "prompt": prompt, "max_tokens": max_tokens, "temperature": temperature,
+            "max_seconds": max_seconds,
+        })
+
+    def generate(self, model: str, prompt: str, max_tokens: int = 128, temperature: float = 0.7,
+                 control: Optional[GenerationControl] = None) -> str:
+        """
+        Blocking generate. The worker enforces the control's deadline itself; cancelling the
+        control (or its deadline passing while the request is queued) is forwarded to it.
+        """
+        control = control or GenerationControl()
+        future = self.submit(model, prompt, control.cap_tokens(max_tokens), temperature,
+                             max_seconds=control.remaining_seconds())
+        forwarded = False
+        while True:
+            try:
+                text = future.result(timeout=0.1)
+            except FutureTimeout:
+                if not forwarded and control.expired():
+                    self.workers[model].cancel(future.job_id)
+                    forwarded = True  # the worker replies with the partial text
+                continue
+            if getattr(future, "stopped", None):
+                control.cancel(future.stopped)
+            return text
+
+    def status(self) -> str:
+        return " | ".join(
+            f"{name}: {'up' if w.is_alive() else 'down'}{' loaded' if w.loaded else ''} "
+            f"cpus={len(w.cpus)} restarts={w.restarts}"
+            for name, w in self.workers.items()
+        )
+
+    def _size(self, name: str) -> int:
+        if name not in self._sizes:
+            self._sizes[name] = estimate_model_bytes(self.workers[name].cfg)
+        return self._sizes[name]
+
+    def _make_room(self, model: str) -> None:
+        """
+        Before `model`'s worker loads its model, unload the least recently used idle workers'
+        models until it fits the budget. Busy workers keep theirs (and keep counting).
+        """
+        with self._budget_lock:
+            worker = self.workers[model]
+            worker.last_used = time.monotonic()
+            if worker.loaded or not self.budget_bytes:
+                worker.loaded = True
+                return
+            size = self._size(model)
+
+            def resident() -> int:
+                return sum(self._size(n) for n, w in self.workers.items() if w.loaded)
+
+            victims = sorted((w for w in self.workers.values() if w.loaded and not w.busy()),
+                             key=lambda w: w.last_used)
+            for victim in victims:
+                if resident() + size <= self.budget_bytes:
+                    break
+                logger.info(f"Unloading {victim.name} in its worker to stay within RAM budget...")
+                try:
+                    victim.request({"op": "unload"}).result(timeout=UNLOAD_TIMEOUT)
+                except Exception as e:
+                    log_error(f"Unloading {victim.name} failed: {e}")
+                    continue
+                victim.loaded = False
+            if resident() + size > self.budget_bytes:
+                busy = [n for n, w in self.workers.items() if w.loaded]
+                log_error(f"Model of {size / GB:.1f} GB exceeds RAM budget of {self.budget_bytes / GB:.1f} GB"
+                          f"{' (in use: ' + ', '.join(busy) + ')' if busy else ''}; loading anyway.")
+            worker.loaded = True
+
+    def _health_loop(self) -> None:
+        while not self._stop.wait(HEALTH_INTERVAL):
+            for worker in self.workers.values():
+                if self._stop.is_set():
+                    return
+                if worker.is_alive() and worker.ping():
+                    continue
+                log_error(f"Worker for {worker.name} is unhealthy; restarting.")
+                try:
+                    worker.restart()
+                except Exception as e:
+                    log_error(f"Failed to restart worker for {worker.name}: {e}")
+                time.sleep(RESTART_BACKOFF)
@@ -0,0 +1,99 @@
+# bot_core/ocr_cache.py
+
+"""
+Content-addressed cache of OCR output (memory/ocr_cache, outside IMPORT_DIR so cached text
+is never discovered as an import).
+Entries are keyed by the SHA-256 of the file's bytes, the page number and the settings that
+affect the result (OCR_DPI, OCR_MIN_PAGE_CHARS), so renamed or copied files hit the cache
+and edited files miss it. Each page is its own small file written atomically, which lets
+the OCR workers of one PDF fill the cache concurrently without coordination. The page
+count of a PDF is cached too, so an unchanged document is served without being parsed.
+"""
+import hashlib
+import io
+import os
+import uuid
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from bot_core.ingest_manifest import file_sha256
+from bot_core.logger_utils import log_error
+from config import OCR_CACHE_ENABLED, OCR_DPI, OCR_MIN_PAGE_CHARS
+
+OCR_CACHE_DIR = Path("memory/ocr_cache")
+# Bump when OCR output for the same bytes and settings changes (engine, preprocessing)
+CACHE_VERSION = 1
+
+
+class OcrCache:
+    def __init__(self, root: Path = OCR_CACHE_DIR, enabled: bool = OCR_CACHE_ENABLED):
+        self.root = root
+        self.enabled = enabled
+        # Lookups in this process, for reports
+        self.hits = 0
+        self.misses = 0
+
+    def digest(self, src: Union[Path, io.IOBase]) -> Optional[str]:
+        """SHA-256 of a file or seekable stream (rewound afterwards); None when caching is off."""
+        if not self.enabled:
+            return None
+        try:
+            if isinstance(src, Path):
+                return file_sha256(src)
+            h = hashlib.sha256()
+            for block in iter(lambda: src.read(1024 * 1024), b""):
+                h.update(block)
+            src.seek(0)
+            return h.hexdigest()
+        except (OSError, ValueError) as e:
+            log_error(f"Cannot hash {getattr(src, 'name', src)} for the OCR cache: {e}")
+            return None
+
+    def _path(self, digest: str, page: Union[int, str]) -> Path:
+        key = hashlib.sha256(f"{digest}:{page}:{CACHE_VERSION}:{OCR_DPI}:{OCR_MIN_PAGE_CHARS}".encode()).hexdigest()
+        return self.root / key[:2] / f"{key}.txt"
+
+    def get(self, digest: Optional[str], page: Union[int, str]) -> Optional[str]:
+        if digest is None:
+            return None
+        try:
+            text = self._path(digest, page).read_text(encoding="utf-8")
+            self.hits += 1
+            return text
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except OSError as e:
+            log_error(f"Unreadable OCR cache entry for {digest} page {page}: {e}")
+            return None
+
+    def put(self, digest: Optional[str], page: Union[int, str], text: str) -> None:
+        if digest is None:
+            return
+        path = self._path(digest, page)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Unique temp name: several workers may cache pages of the same file at once
+            tmp = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+            tmp.write_text(text, encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError as e:
+            log_error(f"Failed to cache OCR output for {digest} page {page}: {e}")
+
+    def page(self, digest: Optional[str], page: int, read: Callable[[], str]) -> str:
+        """Cached text of one page, calling `read` and caching its result on a miss."""
+        text = self.get(digest, page)
+        if text is None:
+            text = read()
+            self.put(digest, page, text)
+        return text
+
+    def page_count(self, digest: Optional[str]) -> Optional[int]:
+        count = self.get(digest, "pages")
+        return int(count) if count and count.isdigit() else None
+
+    def put_page_count(self, digest: Optional[str], count: int) -> None:
+        self.put(digest, "pages", str(count))
+
+
+ocr_cache = OcrCache()
@@ -0,0 +1,296 @@
+# bot_core/ocr_engine.py
+
+"""
+Page-level OCR engine.
+Images and PDF pages are independent units of work, so they are spread over a process pool
+(OCR_WORKERS, started from worker_entry so they do not load the chat stack) instead of being
+read one file and one page at a time. Tesseract is limited to one thread per worker
+(OMP_THREAD_LIMIT=1) so the pool, not OpenMP, decides how many cores are busy.
+Every Tesseract call gets OCR_PAGE_TIMEOUT seconds; a pooled page job that runs past twice
+that (e.g. a PDF page that will not parse or render) is failed and its worker killed.
+PDF pages with a text layer are extracted directly; only pages with (almost) no text are
+rendered at OCR_DPI and recognized. Page texts are reassembled in page order and files are
+returned in input order. Pages already in the OCR cache (see ocr_cache) are not sent to the
+pool at all.
+"""
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Optional
+
+from bot_core import worker_entry
+from bot_core.ocr_cache import ocr_cache
+from config import OCR_DPI, OCR_MIN_PAGE_CHARS, OCR_PAGE_TIMEOUT, OCR_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OcrResult:
+    path: Path
+    pages: list[str] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)  # "page N: error" for pages that failed
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.pages)
+
+
+@dataclass
+class OcrReport:
+    files: int = 0
+    pages: int = 0
+    failed_pages: int = 0
+    cached_pages: int = 0  # served from the OCR cache without running Tesseract
+    seconds: float = 0.0
+    workers: int = 1
+
+    def summary(self) -> str:
+        rate = self.pages / self.seconds if self.seconds else 0.0
+        text = (f"OCR'd {self.pages} pages from {self.files} files in {self.seconds:.1f}s "
+                f"with {self.workers} worker(s): {rate:.2f} pages/s")
+        if self.cached_pages:
+            text += f"; {self.cached_pages} pages from cache"
+        if self.failed_pages:
+            text += f"; {self.failed_pages} pages failed"
+        return text
+
+
+def default_workers() -> int:
+    return OCR_WORKERS or worker_entry.default_workers()
+
+
+def _timeout(timeout: Optional[float]) -> float:
+    # pytesseract treats 0 as "no timeout"
+    return timeout if timeout is not None else (OCR_PAGE_TIMEOUT or 0)
+
+
+def ocr_image(img, timeout: Optional[float] = None) -> str:
+    """Recognize one PIL image; raises RuntimeError when Tesseract exceeds the timeout."""
+    import pytesseract
+    return pytesseract.image_to_string(img, timeout=_timeout(timeout))
+
+
+def pdf_page_text(page, timeout: Optional[float] = None) -> str:
+    """Text of a pdfplumber page, falling back to OCR of the rendered page for scans."""
+    text = page.extract_text() or ""
+    if len(text.strip()) < OCR_MIN_PAGE_CHARS:
+        rendered = page.to_image(resolution=OCR_DPI).original
+        text = ocr_image(rendered, timeout) or text
+    return text
+
+
+def page_count(path: Path) -> int:
+    """Number of OCR units in a file: PDF pages, or 1 for an image."""
+    if path.suffix.lower() != ".pdf":
+        return 1
+    import pdfplumber
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def read_page(path: Path, page: int, timeout: Optional[float] = None) -> str:
+    """Text of one page of a PDF, or of an image (page 0)."""
+    if path.suffix.lower() == ".pdf":
+        import pdfplumber
+        with pdfplumber.open(path, pages=[page + 1]) as pdf:
+            return pdf_page_text(pdf.pages[0], timeout)
+    from PIL import Image
+    with Image.open(path) as img:
+        return ocr_image(img, timeout)
+
+
+def iter_pdf_pages(src, digest: Optional[str] = None) -> Iterator[str]:
+    """
+    Yield the text of every page of an open PDF source, through the OCR cache. A page whose
+    OCR fails is logged and yields its text layer (not cached, so it is retried next time).
+    """
+    import pdfplumber
+    with pdfplumber.open(src) as pdf:
+        ocr_cache.put_page_count(digest, len(pdf.pages))
+        for i, page in enumerate(pdf.pages):
+            try:
+                text = ocr_cache.page(digest, i, lambda: pdf_page_text(page))
+            except Exception as e:
+                logger.warning(f"OCR of PDF page {i + 1} failed, keeping its text layer: {e}")
+                try:
+                    text = page.extract_text() or ""
+                except Exception:
+                    text = ""
+            yield text
+            page.flush_cache()
+
+
+def _init_worker() -> None:
+    worker_entry.ignore_sigint()
+    # One Tesseract thread per process; the pool provides the parallelism
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _page_job(path: Path, page: int, timeout: Optional[float],
+              digest: Optional[str] = None) -> tuple[str, Optional[str]]:
+    try:
+        return ocr_cache.page(digest, page, lambda: read_page(path, page, timeout)), None
+    except Exception as e:
+        return "", f"{type(e).__name__}: {e}"
+
+
+def _expire(pending: dict, job_timeout: float, store) -> bool:
+    """Fail the pages that have been running longer than `job_timeout`; True if any did."""
+    now = time.monotonic()
+    expired = False
+    for future, entry in list(pending.items()):
+        if entry[2] is None and future.running():
+            entry[2] = now
+        if entry[2] is not None and now - entry[2] >= job_timeout:
+            del pending[future]
+            store(entry[0], entry[1], "", f"timed out after {job_timeout:.0f}s")
+            expired = True
+    return expired
+
+
+def _kill_pool(pool: ProcessPoolExecutor) -> None:
+    # ProcessPoolExecutor cannot stop a running call; kill its processes (CPython keeps them
+    # in _processes) and let shutdown() fail what is left
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    for process in processes:
+        process.kill()
+    for process in processes:
+        process.join(timeout=5)
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_ocr(files: list[Path], workers: Optional[int] = None, timeout: Optional[float] = None,
+             report: Optional[OcrReport] = None) -> Iterator[OcrResult]:
+    """
+    OCR `files` page by page and yield one OcrResult per file, in input order.
+
+    Args:
+        files (list[Path]): Images and PDFs.
+        workers (int): Worker processes (defaults to OCR_WORKERS, 0 - one per spare core);
+            1 reads every page in this process.
+        timeout (float): Seconds Tesseract may spend on one page (defaults to OCR_PAGE_TIMEOUT);
+            with a pool, a page whose whole job (parsing, rendering, OCR) runs past twice
+            that is failed and the pool is replaced.
+        report (OcrReport): Filled in with page counts and throughput as files complete.
+    """
+    workers = workers or default_workers()
+    report = report if report is not None else OcrReport()
+    report.workers = workers
+    start = time.perf_counter()
+
+    results: list[Optional[OcrResult]] = []
+    digests: list[Optional[str]] = []
+    jobs: deque[tuple[int, int]] = deque()
+    remaining = []
+    for i, path in enumerate(files):
+        result = OcrResult(path)
+        digest = ocr_cache.digest(path)
+        try:
+            count = ocr_cache.page_count(digest)
+            if count is None:
+                count = page_count(path)
+                if path.suffix.lower() == ".pdf":
+                    ocr_cache.put_page_count(digest, count)
+            result.pages = [""] * count
+        except Exception as e:
+            result.errors.append(f"{type(e).__name__}: {e}")
+        results.append(result)
+        digests.append(digest)
+        remaining.append(len(result.pages))
+        # Unchanged pages come straight from the cache; only the rest are OCR'd
+        for page in range(len(result.pages)):
+            text = ocr_cache.get(digest, page)
+            if text is None:
+                jobs.append((i, page))
+            else:
+                result.pages[page] = text
+                report.cached_pages += 1
+                report.pages += 1
+                remaining[i] -= 1
+
+    def store(i: int, page: int, text: str, error: Optional[str]) -> None:
+        results[i].pages[page] = text
+        if error:
+            results[i].errors.append(f"page {page + 1}: {error}")
+            report.failed_pages += 1
+        report.pages += 1
+        remaining[i] -= 1
+
+    next_yield = 0
+
+    def finished() -> Iterator[OcrResult]:
+        nonlocal next_yield
+        while next_yield < len(results) and remaining[next_yield] == 0:
+            result, results[next_yield] = results[next_yield], None
+            next_yield += 1
+            report.files += 1
+            report.seconds = time.perf_counter() - start
+            yield result
+
+    yield from finished()
+    if workers <= 1 or len(jobs) <= 1:
+        while jobs:
+            i, page = jobs.popleft()
+            store(i, page, *_page_job(files[i], page, timeout, digests[i]))
+            yield from finished()
+        return
+
+    # Tesseract gets the page timeout; the whole job (PDF parsing, rendering, image decoding
+    # and OCR) gets twice that before its page is failed and the pool replaced
+    job_timeout = 2 * _timeout(timeout)
+    pool: Optional[ProcessPoolExecutor] = None
+    pending: dict = {}  # future -> [file index, page, monotonic time it was seen running]
+    slots = 0
+    try:
+        while jobs or pending:
+            if pool is None:
+                slots = min(workers, len(jobs))
+                pool = ProcessPoolExecutor(max_workers=slots, initializer=_init_worker,
+                                           mp_context=worker_entry.spawn_context())
+            # One page per worker: the executor reports a future as running as soon as it
+            # enters the call queue, so a page waiting behind others would accrue timeout
+            while jobs and len(pending) < slots:
+                i, page = jobs[0]
+                try:
+                    # submit() starts the pool's processes; they must not re-import the app
+                    with worker_entry.lightweight_main():
+                        future = pool.submit(_page_job, files[i], page, timeout, digests[i])
+                    pending[future] = [i, page, None]
+                except BrokenProcessPool as e:
+                    # A worker died (e.g. out of memory) and took the pool with it
+                    while jobs:
+                        store(*jobs.popleft(), "", f"{type(e).__name__}: {e}")
+                    break
+                jobs.popleft()
+            if pending:
+                done, _ = wait(pending, timeout=1.0 if job_timeout else None, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, page, _ = pending.pop(future)
+                    try:
+                        text, error = future.result()
+                    except Exception as e:
+                        text, error = "", f"{type(e).__name__}: {e}"
+                    store(i, page, text, error)
+                if job_timeout and _expire(pending, job_timeout, store):
+                    # A hung page cannot be interrupted inside the pool: replace the pool and
+                    # queue the pages that were still waiting or running again
+                    for i, page, _ in reversed(list(pending.values())):
+                        jobs.appendleft((i, page))
+                    pending.clear()
+                    _kill_pool(pool)
+                    pool = None
+            yield from finished()
+    finally:
+        for future in pending:
+            future.cancel()
+        if pool is not None:
+            if pending:
+                _kill_pool(pool)
+            else:
+                pool.shutdown()
@@ -2,13 +2,13 @@
 
 import logging
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 
 import pytesseract
-import pdfplumber
-from PIL import Image
 
-from bot_core.constants_config import IMPORT_DIR, ALLOWED_EXTS
+from bot_core.constants_config import IMPORT_DIR, OCR_EXPORT_DIR, ALLOWED_EXTS
+from bot_core.file_types import scan_files
+from bot_core.ocr_engine import OcrReport, iter_ocr
 
 # Configure logger
 t_logging = logging.getLogger(__name__)
@@ -33,7 +33,9 @@ def ocr_test() -> str:
 
 def ocr_scan_file(filename: str) -> str:
     """
-    Perform OCR on a single file. Supports images and PDFs.
+    Perform OCR on a single file. Supports images and PDFs; PDF pages are read in parallel
+    and scanned pages without a text layer are recognized with Tesseract. Pages of files
+    scanned before are served from the OCR cache.
 
     Args:
         filename (str): Path to the file to scan (relative or absolute).
@@ -51,39 +53,38 @@ def ocr_scan_file(filename: str) -> str:
     if ext not in OCR_EXTS:
         return f"Unsupported OCR file type: {ext}"
 
-    try:
-        if ext == '.pdf':
-            text = ''
-            with pdfplumber.open(path) as pdf:
-                for page in pdf.pages:
-                    text += (page.extract_text() or '') + '\n'
-        else:
-            img = Image.open(path)
-            text = pytesseract.image_to_string(img)
-        return text
-
-    except Exception as e:
-        t_logging.error(f"OCR failed for {path}: {e}")
-        return f"OCR failed for {path}: {e}"
+    result = next(iter_ocr([path]))
+    if result.errors and not result.text.strip():
+        t_logging.error(f"OCR failed for {path}: {'; '.join(result.errors)}")
+        return f"OCR failed for {path}: {'; '.join(result.errors)}"
+    for error in result.errors:
+        t_logging.warning(f"OCR of {path}: {error}")
+    return result.text
 
 
-def ocr_extract_all() -> List[str]:
+def ocr_extract_all() -> Tuple[List[str], OcrReport]:
     """
-    Perform OCR on all supported files in the IMPORT_DIR directory.
+    Perform OCR on all supported files in the IMPORT_DIR directory, spreading their pages
+    over the OCR worker pool. The text files go to OCR_EXPORT_DIR, not back into IMPORT_DIR,
+    where the watcher and /learn all would ingest the same text a second time.
 
     Returns:
-        List of output filenames (text files) created from OCR.
+        List of output filenames (text files) created from OCR, and the run's OcrReport
+        (pages, failures, pages/s).
     """
     results: List[str] = []
     base = Path(IMPORT_DIR)
-
-    for path in base.rglob('*'):
-        if path.suffix.lower() in OCR_EXTS:
-            out_name = f"{path.stem}_ocr.txt"
-            out_path = base / out_name
-            t_logging.info(f"Extracting OCR from {path} to {out_path}")
-            text = ocr_scan_file(str(path))
-            out_path.write_text(text, encoding='utf-8')
-            results.append(out_name)
-
-    return results
+    files = [path for path in scan_files(base) if path.suffix.lower() in OCR_EXTS]
+    report = OcrReport()
+
+    for result in iter_ocr(files, report=report):
+        out_name = f"{result.path.stem}_ocr.txt"
+        out_path = OCR_EXPORT_DIR / out_name
+        for error in result.errors:
+            t_logging.warning(f"OCR of {result.path}: {error}")
+        t_logging.info(f"Extracted OCR from {result.path} to {out_path}")
+        out_path.write_text(result.text, encoding='utf-8')
+        results.append(out_name)
+
+    t_logging.info(report.summary())
+    return results, report
@@ -0,0 +1,169 @@
+# bot_core/response_cache.py
+
+"""
+Response cache in front of the LLM.
+Entries are keyed by (model, normalized prompt, retrieved-context fingerprint, max_tokens),
+so a short answer is never served for a longer request. Optionally
+(RESPONSE_CACHE_SIMILARITY > 0), on an exact miss, prompts with the same model, context and
+max_tokens can still match when their embeddings are within that cosine similarity; prompts are only
+embedded during such a lookup, never when an answer is stored. Entries expire after a TTL
+and the least recently used ones are evicted beyond the size limit. Sampling at a
+temperature above the configured limit bypasses the cache, since such answers are meant
+to vary.
+"""
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+
+from bot_core.logger_utils import log_error
+from config import (
+    RESPONSE_CACHE_ENABLED, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_SIMILARITY, RESPONSE_CACHE_MAX_TEMPERATURE,
+)
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Lower-case, collapse whitespace and drop trailing punctuation."""
+    text = re.sub(r"\s+", " ", prompt.strip().lower())
+    return text.rstrip("?!. ")
+
+
+def context_fingerprint(context) -> str:
+    """Stable hash of the retrieved context (a string or a list of chunks)."""
+    if not context:
+        return ""
+    if not isinstance(context, str):
+        context = "\x1e".join(context)
+    return hashlib.sha1(context.encode("utf-8", errors="ignore")).hexdigest()
+
+
+def _default_embed(text: str) -> np.ndarray:
+    # Reuses the sentence-transformers model already loaded for memory search
+    from bot_core.memory_vector_store import get_embedder
+    return get_embedder().encode(text, convert_to_numpy=True)
+
+
+class ResponseCache:
+    """
+    Args:
+        ttl_seconds (float): Lifetime of an entry.
+        max_entries (int): Size limit; least recently used entries are evicted first.
+        similarity (float): Cosine threshold for near-duplicate hits (0 disables).
+        max_temperature (float): Requests sampled above this temperature bypass the cache.
+        embed (Callable | None): Text -> vector function used for near-duplicate matching.
+    """
+
+    def __init__(self, ttl_seconds: float = 3600, max_entries: int = 512, similarity: float = 0.0,
+                 max_temperature: float = 0.7, embed: Optional[Callable[[str], np.ndarray]] = None,
+                 enabled: bool = True):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.max_temperature = max_temperature
+        self.embed = embed or _default_embed
+        self.enabled = enabled
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bypass(self, temperature: Optional[float]) -> bool:
+        return not self.enabled or (temperature is not None and temperature > self.max_temperature)
+
+    def get(self, model: str, prompt: str, context=None, temperature: Optional[float] = None,
+            max_tokens: Optional[int] = None) -> Optional[str]:
+        """Return a cached response, or None on a miss or when the cache is bypassed."""
+        if self.bypass(temperature):
+            self.bypassed += 1
+            return None
+        key = (model, normalize_prompt(prompt), context_fingerprint(context), max_tokens)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["response"]
+            candidates = [
+                (k, e, e["vector"]) for k, e in self._entries.items()
+                if k[0] == model and k[2:] == key[2:]
+            ] if self.similarity > 0 else []
+        if candidates:
+            vector = self._vector(key[1])
+            if vector is not None:
+                best_key, best_sim = None, self.similarity
+                for k, e, candidate in candidates:
+                    if candidate is None:
+                        # Embedded on first comparison (outside the lock), then kept with the entry
+                        candidate = self._vector(k[1])
+                        if candidate is None:
+                            continue
+                        with self._lock:
+                            e["vector"] = candidate
+                    sim = float(np.dot(vector, candidate))
+                    if sim >= best_sim:
+                        best_key, best_sim = k, sim
+                if best_key is not None:
+                    with self._lock:
+                        entry = self._entries.get(best_key)
+                        if entry is not None:
+                            self._entries.move_to_end(best_key)
+                            self.near_hits += 1
+                            return entry["response"]
+        self.misses += 1
+        return None
+
+    def put(self, model: str, prompt: str, response: str, context=None,
+            temperature: Optional[float] = None, max_tokens: Optional[int] = None) -> None:
+        if self.bypass(temperature) or not response:
+            return
+        key = (model, normalize_prompt(prompt), context_fingerprint(context), max_tokens)
+        with self._lock:
+            # The vector is filled in by get() only if near-duplicate matching needs it
+            self._entries[key] = {"response": response, "vector": None, "created": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def status(self) -> str:
+        with self._lock:
+            size = len(self._entries)
+        state = "ON" if self.enabled else "OFF"
+        return (f"Response cache {state}: {size}/{self.max_entries} entries | hits {self.hits} "
+                f"(near-duplicate {self.near_hits}) | misses {self.misses} | bypassed {self.bypassed}")
+
+    def _expire(self, now: float) -> None:
+        # Entries are ordered by last use, so expired ones can sit anywhere; scan them all
+        stale = [k for k, e in self._entries.items() if now - e["created"] > self.ttl_seconds]
+        for k in stale:
+            del self._entries[k]
+
+    def _vector(self, text: str) -> Optional[np.ndarray]:
+        try:
+            vec = np.asarray(self.embed(text), dtype=np.float32)
+            norm = np.linalg.norm(vec)
+            return vec / norm if norm else None
+        except Exception as e:
+            log_error(f"Response cache embedding failed: {e}")
+            return None
+
+
+response_cache = ResponseCache(
+    ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    similarity=RESPONSE_CACHE_SIMILARITY,
+    max_temperature=RESPONSE_CACHE_MAX_TEMPERATURE,
+    enabled=RESPONSE_CACHE_ENABLED,
+)
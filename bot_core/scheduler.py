@@ -0,0 +1,208 @@
+# bot_core/scheduler.py
+
+"""
+Request scheduler for sharing loaded models between concurrent sessions.
+Each model has its own queue and a single worker, because a llama.cpp context cannot
+run two generations at once; different models still run in parallel on executor threads.
+Within a model queue, sessions are served round-robin so one chatty client cannot starve
+the others. Queues are bounded (backpressure) and jobs can be cancelled while queued or
+mid-generation.
+"""
+import asyncio
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from bot_core.generation_control import GenerationControl
+from bot_core.logger_utils import log_error
+
+
+class QueueFull(Exception):
+    """Raised when a model queue or a session has too many pending requests."""
+
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, session: str, model: str, payload: dict, job_id: str,
+                 control: Optional[GenerationControl] = None):
+        self.id = job_id
+        self.session = session
+        self.model = model
+        self.payload = payload
+        self.control = control or GenerationControl()
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.running = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self.control.cancelled
+
+
+class _ModelQueue:
+    """Per-model queue holding one FIFO per session, visited round-robin."""
+
+    def __init__(self):
+        self.sessions: dict[str, deque] = {}
+        self.order: deque = deque()
+        self.size = 0
+        self.ready = asyncio.Event()
+
+    def push(self, job: Job) -> None:
+        if job.session not in self.sessions:
+            self.sessions[job.session] = deque()
+            self.order.append(job.session)
+        self.sessions[job.session].append(job)
+        self.size += 1
+        self.ready.set()
+
+    def pop(self) -> Optional[Job]:
+        while self.order:
+            session = self.order.popleft()
+            jobs = self.sessions[session]
+            job = jobs.popleft()
+            self.size -= 1
+            if jobs:
+                self.order.append(session)
+            else:
+                del self.sessions[session]
+            if not self.size:
+                self.ready.clear()
+            return job
+        self.ready.clear()
+        return None
+
+    def remove(self, job: Job) -> bool:
+        jobs = self.sessions.get(job.session)
+        if not jobs or job not in jobs:
+            return False
+        jobs.remove(job)
+        self.size -= 1
+        if not jobs:
+            del self.sessions[job.session]
+            self.order.remove(job.session)
+        if not self.size:
+            self.ready.clear()
+        return True
+
+    def pending_for(self, session: str) -> int:
+        return len(self.sessions.get(session, ()))
+
+
+class InferenceScheduler:
+    """
+    Args:
+        run (Callable): Blocking ``run(job) -> str`` executed on a worker thread. It should
+            use ``job.control`` (e.g. as a llama stopping criterion) to stop early.
+        models (list[str]): Model names that get a queue and a worker.
+        max_queue (int): Maximum queued jobs per model.
+        max_per_session (int): Maximum queued or running jobs per session and model.
+    """
+
+    def __init__(self, run: Callable[[Job], str], models: list[str],
+                 max_queue: int = 32, max_per_session: int = 4):
+        self.run = run
+        self.models = list(models)
+        self.max_queue = max_queue
+        self.max_per_session = max_per_session
+        self.jobs: dict[str, Job] = {}
+        self._queues: dict[str, _ModelQueue] = {}
+        self._running: dict[str, Optional[Job]] = {}
+        self._workers: list[asyncio.Task] = []
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(self.models)),
+                                            thread_name_prefix="inference")
+
+    def start(self) -> None:
+        for model in self.models:
+            self._queues[model] = _ModelQueue()
+            self._running[model] = None
+            self._workers.append(asyncio.create_task(self._worker(model), name=f"worker-{model}"))
+
+    async def stop(self) -> None:
+        for job in list(self.jobs.values()):
+            self.cancel(job.id)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, session: str, model: str, payload: dict, job_id: Optional[str] = None,
+               control: Optional[GenerationControl] = None) -> Job:
+        """
+        Queue a job, or raise QueueFull when the model or session is saturated.
+        Clients may pick `job_id` themselves so they can cancel before the answer arrives.
+        A `control` deadline starts counting at submission, so it includes time spent queued.
+        """
+        if job_id is None:
+            # Automatic ids skip any active id, including numeric ones chosen by clients
+            job_id = str(next(Job._ids))
+            while job_id in self.jobs:
+                job_id = str(next(Job._ids))
+        elif job_id in self.jobs:
+            raise ValueError(f"Request id '{job_id}' is already active.")
+        queue = self._queues[model]
+        running = self._running[model]
+        active = queue.pending_for(session) + (1 if running and running.session == session else 0)
+        if queue.size >= self.max_queue:
+            raise QueueFull(f"Queue for {model} is full ({queue.size} pending).")
+        if active >= self.max_per_session:
+            raise QueueFull(f"Session '{session}' already has {active} requests for {model}.")
+        job = Job(session, model, payload, job_id, control)
+        job.control.start()
+        self.jobs[job.id] = job
+        queue.push(job)
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        job.control.cancel()
+        if not job.running and self._queues[job.model].remove(job):
+            self._finish(job, cancelled=True)
+        return True
+
+    def stats(self) -> dict:
+        return {
+            model: {
+                "queued": self._queues[model].size,
+                "sessions": len(self._queues[model].sessions),
+                "running": self._running[model].id if self._running[model] else None,
+            }
+            for model in self.models
+        }
+
+    async def _worker(self, model: str) -> None:
+        queue = self._queues[model]
+        loop = asyncio.get_running_loop()
+        while True:
+            await queue.ready.wait()
+            job = queue.pop()
+            if job is None or job.cancelled:
+                continue
+            if job.control.expired():
+                self._finish(job, exc=TimeoutError(f"Request {job.id} timed out while queued."))
+                continue
+            job.running = True
+            self._running[model] = job
+            try:
+                result = await loop.run_in_executor(self._executor, self.run, job)
+                self._finish(job, result=result)
+            except Exception as e:
+                log_error(f"Inference job {job.id} on {model} failed: {e}")
+                self._finish(job, exc=e)
+            finally:
+                self._running[model] = None
+
+    def _finish(self, job: Job, result: Optional[str] = None, exc: Optional[BaseException] = None,
+                cancelled: bool = False) -> None:
+        self.jobs.pop(job.id, None)
+        if job.future.done():
+            return
+        if cancelled:
+            job.future.cancel()
+        elif exc is not None:
+            job.future.set_exception(exc)
+        else:
+            job.future.set_result(result)
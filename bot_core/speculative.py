@@ -0,0 +1,175 @@
+# bot_core/speculative.py
+
+"""
+Speculative decoding helpers for llama-cpp-python.
+A draft proposes several tokens per step and the target model verifies them in a single
+batched eval, keeping the longest agreeing prefix. Two drafts are provided:
+  - CrossVocabDraftModel: a small GGUF model (phi-2). Its vocabulary differs from the
+    llama/mistral targets, so drafts are exchanged as text and re-tokenized for the target.
+  - PromptLookupDraft: n-gram lookup in the prompt itself, needing no extra model.
+Both record per-generation statistics so acceptance rate and throughput can be reported.
+"""
+import time
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import numpy as np
+from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+
+from bot_core.autotune import apply_host_profile
+from bot_core.logger_utils import log_error
+from bot_core.tracing import traced_completion
+
+# Characters of context handed to the draft model; keeps it well inside phi-2's 2048 tokens
+DRAFT_CONTEXT_CHARS = 4096
+# Characters of target text re-tokenized alongside a draft to keep token boundaries aligned
+ALIGN_CHARS = 32
+
+
+@dataclass
+class SpeculativeStats:
+    rounds: int = 0
+    drafted: int = 0
+    generated: int = 0
+    seconds: float = 0.0
+
+    def reset(self) -> None:
+        self.rounds = self.drafted = self.generated = 0
+        self.seconds = 0.0
+
+    @property
+    def accepted(self) -> int:
+        # Every verification round yields the accepted draft tokens plus one token
+        # sampled by the target, so acceptance is inferred from the round count.
+        return max(0, min(self.drafted, self.generated - self.rounds))
+
+    @property
+    def acceptance_rate(self) -> float:
+        return self.accepted / self.drafted if self.drafted else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        return self.generated / self.seconds if self.seconds else 0.0
+
+    def summary(self) -> str:
+        return (f"acceptance {self.acceptance_rate:.0%} ({self.accepted}/{self.drafted} drafted, est.), "
+                f"{self.generated} tokens at {self.tokens_per_second:.1f} tok/s")
+
+
+class CrossVocabDraftModel(LlamaDraftModel):
+    """
+    Drafts continuations with a separate llama.cpp model that may use another vocabulary.
+
+    Args:
+        get_draft (Callable): Returns the draft Llama; called per step so a model manager
+            can load it lazily.
+        num_pred_tokens (int): Maximum tokens proposed per verification round.
+    """
+
+    def __init__(self, get_draft: Callable[[], Any], num_pred_tokens: int = 8):
+        self.get_draft = get_draft
+        self.num_pred_tokens = num_pred_tokens
+        self.target = None  # attached once the target Llama exists
+        self.stats = SpeculativeStats()
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs) -> np.ndarray:
+        self.stats.rounds += 1
+        if self.target is None:
+            return np.array([], dtype=np.intc)
+        try:
+            text = self.target.detokenize(input_ids.tolist()).decode("utf-8", errors="ignore")
+            # Slide the window in half-window steps so the draft can reuse its KV prefix
+            step = DRAFT_CONTEXT_CHARS // 2
+            start = 0
+            if len(text) > DRAFT_CONTEXT_CHARS:
+                start = ((len(text) - DRAFT_CONTEXT_CHARS) // step + 1) * step
+            draft = self.get_draft()
+            out = draft.create_completion(
+                text[start:], max_tokens=self.num_pred_tokens, temperature=0.0
+            )["choices"][0]["text"]
+            if not out:
+                return np.array([], dtype=np.intc)
+
+            anchor = text[-ALIGN_CHARS:]
+            base = self.target.tokenize(anchor.encode("utf-8"), add_bos=False)
+            joined = self.target.tokenize((anchor + out).encode("utf-8"), add_bos=False)
+            common = 0
+            while common < min(len(base), len(joined)) and base[common] == joined[common]:
+                common += 1
+            tokens = joined[common:][: self.num_pred_tokens]
+        except Exception as e:
+            log_error(f"Draft model step failed: {e}")
+            return np.array([], dtype=np.intc)
+
+        self.stats.drafted += len(tokens)
+        return np.array(tokens, dtype=np.intc)
+
+
+class PromptLookupDraft(LlamaPromptLookupDecoding):
+    """Prompt-lookup decoding with the same statistics as CrossVocabDraftModel."""
+
+    def __init__(self, max_ngram_size: int = 2, num_pred_tokens: int = 10):
+        super().__init__(max_ngram_size=max_ngram_size, num_pred_tokens=num_pred_tokens)
+        self.stats = SpeculativeStats()
+
+    def __call__(self, input_ids: np.ndarray, /, **kwargs) -> np.ndarray:
+        self.stats.rounds += 1
+        tokens = super().__call__(input_ids, **kwargs)
+        self.stats.drafted += len(tokens)
+        return tokens
+
+
+def timed_completion(llm: Any, prompt: str, stats: SpeculativeStats | None = None, **kwargs) -> dict:
+    """Run a (traced) completion and fold its token count and wall time into `stats`."""
+    start = time.perf_counter()
+    resp = traced_completion(llm, prompt, **kwargs)
+    if stats is not None:
+        stats.seconds += time.perf_counter() - start
+        stats.generated += resp.get("usage", {}).get("completion_tokens", 0)
+    return resp
+
+
+def benchmark(cfg: dict, prompts: list[str], make_draft: Callable[[], Any],
+              max_tokens: int = 128) -> dict:
+    """
+    Compare plain and speculative greedy decoding of one model on CPU.
+    The two variants are loaded one after the other so only one copy is resident.
+
+    Args:
+        cfg (dict): MODEL_CONFIGS entry of the target model.
+        prompts (list[str]): Prompts to decode.
+        make_draft (Callable): Returns a fresh draft (CrossVocabDraftModel or PromptLookupDraft).
+        max_tokens (int): Tokens generated per prompt.
+
+    Returns:
+        dict with baseline and speculative tokens/s, speedup and acceptance rate.
+    """
+    from llama_cpp import Llama
+
+    kwargs = dict(apply_host_profile(cfg["path"], cfg["kwargs"]), n_gpu_layers=0, verbose=False)
+
+    baseline = SpeculativeStats()
+    llm = Llama(model_path=cfg["path"], **kwargs)
+    for prompt in prompts:
+        llm.reset()
+        timed_completion(llm, prompt, baseline, max_tokens=max_tokens, temperature=0.0)
+    del llm
+
+    draft = make_draft()
+    llm = Llama(model_path=cfg["path"], draft_model=draft, **kwargs)
+    if isinstance(draft, CrossVocabDraftModel):
+        draft.target = llm
+    for prompt in prompts:
+        llm.reset()
+        timed_completion(llm, prompt, draft.stats, max_tokens=max_tokens, temperature=0.0)
+    del llm
+
+    spec = draft.stats
+    return {
+        "baseline_tok_s": baseline.tokens_per_second,
+        "speculative_tok_s": spec.tokens_per_second,
+        "speedup": spec.tokens_per_second / baseline.tokens_per_second if baseline.tokens_per_second else 0.0,
+        "acceptance_rate": spec.acceptance_rate,
+        "drafted": spec.drafted,
+        "accepted": spec.accepted,
+    }
@@ -0,0 +1,108 @@
+# bot_core/symbol_index.py
+
+"""
+Symbol -> code chunk index (memory/symbol_index.json).
+Code chunks stored by the ingestion pipeline are registered under their qualified symbol
+("ChatSession.reply") and its last part ("reply"). A query that names a symbol is answered
+with dictionary lookups, so retrieval packs the definitions themselves into the prompt
+instead of whatever embeds closest. Only identifier-like query tokens are looked up
+(snake_case, camelCase, dotted, called with parentheses or in backticks), so ordinary words
+do not pull in functions that happen to be called `run` or `get`.
+"""
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Optional
+
+from bot_core.logger_utils import log_error
+
+SYMBOL_INDEX_PATH = Path("memory/symbol_index.json")
+
+_TOKEN = re.compile(r"`([^`]+)`|([A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*)(\s*\()?")
+
+
+def _identifier_like(token: str, called: bool, quoted: bool) -> bool:
+    return (quoted or called or "_" in token or "." in token
+            or re.search(r"[a-z][A-Z]", token) is not None)
+
+
+def query_symbols(query: str) -> list[str]:
+    """Identifier-like tokens of a query, in order of appearance."""
+    symbols = []
+    for match in _TOKEN.finditer(query):
+        quoted, token, call = match.group(1), match.group(2), match.group(3)
+        token = (quoted or token).strip().rstrip("()")
+        if token and _identifier_like(token, bool(call), bool(quoted)) and token not in symbols:
+            symbols.append(token)
+    return symbols
+
+
+class SymbolIndex:
+    def __init__(self, path: Path = SYMBOL_INDEX_PATH):
+        self.path = path
+        # symbol -> {chunk_id: text}
+        self.symbols: dict[str, dict[str, str]] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path.exists():
+            return
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                self.symbols = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            log_error(f"Ignoring unreadable symbol index {self.path}: {e}")
+
+    def add(self, symbol: str, chunk_id: str, text: str) -> None:
+        with self._lock:
+            self._load()
+            keys = {symbol, symbol.rsplit(".", 1)[-1]}
+            for key in keys:
+                self.symbols.setdefault(key, {})[chunk_id] = text
+            self._dirty = True
+
+    def drop_chunks(self, chunk_ids) -> None:
+        chunk_ids = set(chunk_ids)
+        if not chunk_ids:
+            return
+        with self._lock:
+            self._load()
+            for key in list(self.symbols):
+                entries = self.symbols[key]
+                for chunk_id in chunk_ids.intersection(entries):
+                    del entries[chunk_id]
+                    self._dirty = True
+                if not entries:
+                    del self.symbols[key]
+
+    def lookup(self, query: str, limit: Optional[int] = None) -> list[str]:
+        """Chunk texts defining the symbols named in `query`; qualified names win."""
+        with self._lock:
+            self._load()
+            texts: dict[str, str] = {}
+            for symbol in query_symbols(query):
+                for chunk_id, text in self.symbols.get(symbol, {}).items():
+                    texts.setdefault(chunk_id, text)
+        hits = list(texts.values())
+        return hits[:limit] if limit else hits
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(self.symbols, f)
+            os.replace(tmp, self.path)
+            self._dirty = False
+
+
+symbol_index = SymbolIndex()
@@ -0,0 +1,149 @@
+# bot_core/table_reader.py
+
+"""
+Tabular ingestion for CSV, TSV, XLSX and Parquet.
+Tables are read in row chunks (INGEST_TABLE_CHUNK_ROWS) and only the projected columns are
+loaded: a `columns` list, or else the first TABLE_MAX_COLUMNS, so wide files stay bounded.
+Rows are serialized column-wise with vectorized string operations and grouped into blocks
+of at most MAX_CHUNK_CHARS, each starting with the column names, so every embedded chunk
+says what its values mean.
+"""
+import csv
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Union
+
+import numpy as np
+
+from config import INGEST_TABLE_CHUNK_ROWS, MAX_CHUNK_CHARS, TABLE_MAX_COLUMNS
+
+TABLE_SUFFIXES = (".csv", ".tsv", ".xlsx", ".parquet")
+
+Source = Union[Path, BinaryIO]
+
+
+def _column_names(header) -> list[str]:
+    # Blank and repeated headers get unique names (pandas rejects duplicates)
+    names, seen = [], set()
+    for i, name in enumerate(header):
+        name = str(name).strip() if name is not None else ""
+        name = name or f"column_{i + 1}"
+        while name in seen:
+            name = f"{name}_{i + 1}"
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def _project(names: list[str], columns: Optional[list[str]]) -> list[str]:
+    if columns:
+        return [name for name in names if name in columns]
+    return names[:TABLE_MAX_COLUMNS] if TABLE_MAX_COLUMNS else names
+
+
+def _delimited_frames(src: Source, sep: str, columns: Optional[list[str]], rows: int):
+    import pandas as pd
+
+    f = src.open("rb") if isinstance(src, Path) else src
+    with f:
+        # Read the header ourselves so projection works on forward-only streams too
+        header = next(csv.reader([f.readline().decode("utf-8", errors="ignore")], delimiter=sep), [])
+        names = _column_names(header)
+        if not names:
+            return
+        keep = _project(names, columns)
+        reader = pd.read_csv(f, sep=sep, header=None, names=names, usecols=keep, chunksize=rows,
+                             dtype=str, keep_default_na=False, encoding_errors="ignore",
+                             on_bad_lines="skip")
+        for df in reader:
+            yield df[keep]
+
+
+def _xlsx_frames(src: Source, columns: Optional[list[str]], rows: int):
+    import pandas as pd
+    from openpyxl import load_workbook
+
+    wb = load_workbook(src, read_only=True, data_only=True)
+    try:
+        sheet_rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = next(sheet_rows, None)
+        if not header:
+            return
+        names = _column_names(header)
+        keep = _project(names, columns)
+        index = [names.index(name) for name in keep]
+        block = []
+        for row in sheet_rows:
+            block.append([row[i] if i < len(row) else None for i in index])
+            if len(block) >= rows:
+                yield pd.DataFrame(block, columns=keep)
+                block = []
+        if block:
+            yield pd.DataFrame(block, columns=keep)
+    finally:
+        wb.close()
+
+
+def _parquet_frames(src: Source, columns: Optional[list[str]], rows: int):
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(src)
+    keep = _project(pf.schema_arrow.names, columns)
+    for batch in pf.iter_batches(batch_size=rows, columns=keep):
+        yield batch.to_pandas()
+
+
+def read_frames(src: Source, suffix: str, columns: Optional[list[str]] = None,
+                rows: int = INGEST_TABLE_CHUNK_ROWS):
+    """Yield DataFrames of at most `rows` rows holding only the projected columns."""
+    if suffix in (".csv", ".tsv"):
+        return _delimited_frames(src, "\t" if suffix == ".tsv" else ",", columns, rows)
+    if suffix == ".parquet":
+        return _parquet_frames(src, columns, rows)
+    return _xlsx_frames(src, columns, rows)
+
+
+def serialize_rows(df):
+    """Render each row as 'v1 | v2 | ...' with one vectorized concatenation per column."""
+    import pandas as pd
+
+    if df.empty or not len(df.columns):
+        return pd.Series([], dtype="string")
+    # Newlines inside cells would break the one-row-per-line layout
+    cols = [df[c].astype("string").fillna("").str.replace(r"\s+", " ", regex=True).str.strip()
+            for c in df.columns]
+    return cols[0].str.cat(cols[1:], sep=" | ")
+
+
+def row_blocks(rows, header: str, max_chars: int = MAX_CHUNK_CHARS) -> Iterator[str]:
+    """
+    Group serialized rows into '<header>\\n<row>\\n<row>...' blocks of at most `max_chars`.
+    A row that does not fit on its own is split over several blocks, each with the header.
+    """
+    if not len(rows):
+        return
+    header = header[:max_chars // 2]
+    budget = max(2, max_chars - len(header))
+    lengths = rows.str.len().to_numpy(dtype=np.int64) + 1
+    ends = np.cumsum(lengths)
+    values = rows.to_numpy(dtype=object)
+    start = 0
+    while start < len(values):
+        if lengths[start] > budget:
+            # A row longer than the budget is split, repeating the header on every piece
+            row, step = values[start], budget - 1
+            for i in range(0, len(row), step):
+                yield header + "\n" + row[i:i + step]
+            start += 1
+            continue
+        base = ends[start] - lengths[start]
+        stop = int(np.searchsorted(ends, base + budget, side="right"))
+        yield header + "\n" + "\n".join(values[start:stop])
+        start = stop
+
+
+def table_blocks(src: Source, suffix: str, columns: Optional[list[str]] = None,
+                 rows: int = INGEST_TABLE_CHUNK_ROWS, max_chars: int = MAX_CHUNK_CHARS) -> Iterator[str]:
+    """Yield header-annotated, embedding-sized blocks of a table read in chunks of `rows`."""
+    for df in read_frames(src, suffix, columns, rows):
+        header = "columns: " + " | ".join(str(c) for c in df.columns)
+        yield from row_blocks(serialize_rows(df), header, max_chars)
@@ -0,0 +1,124 @@
+# bot_core/tracing.py
+
+"""
+Lightweight per-turn latency tracing.
+Stages are wrapped in `span("stage")` blocks (optionally inside a `turn()`); each finished
+span is written as one JSON line to logs/trace.jsonl through the enqueued loguru sink set
+up in bot_core.logger_utils, so tracing never waits on disk. Recent durations are also
+kept in memory per stage for the `/perf` report.
+
+Stage names used on the main paths:
+  retrieve, retrieve.embed, retrieve.shard_load, retrieve.rank   memory search
+  route                                                          model selection
+  prompt.build                                                   context + prompt assembly
+  llm.prefill, llm.decode                                        time to first token / the rest
+  llm.generate                                                   whole generation when not streamed
+  turn.chat, turn.command                                        end-to-end, per kind of input
+"""
+import itertools
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from bot_core.logger_utils import logger
+from bot_core.model_registry import hold
+from config import TRACE_ENABLED, TRACE_WINDOW
+
+_trace_log = logger.bind(trace=True)
+_turn_ids = itertools.count(1)
+_current_turn: ContextVar[Optional[int]] = ContextVar("trace_turn", default=None)
+_recent: dict[str, deque] = defaultdict(lambda: deque(maxlen=TRACE_WINDOW))
+_lock = threading.Lock()
+
+
+def record(stage: str, seconds: float, **fields: Any) -> None:
+    """Store one finished span and emit it as a JSONL record."""
+    if not TRACE_ENABLED:
+        return
+    with _lock:
+        _recent[stage].append(seconds)
+    entry = {"ts": round(time.time(), 3), "turn": _current_turn.get(), "stage": stage,
+             "ms": round(seconds * 1000, 2), **fields}
+    _trace_log.info(json.dumps(entry, default=str))
+
+
+@contextmanager
+def span(stage: str, **fields: Any) -> Iterator[dict]:
+    """
+    Time the enclosed block as `stage`. The yielded dict can be filled with extra fields
+    (e.g. token counts, cache hits) that are written with the span.
+    """
+    extra = dict(fields)
+    start = time.perf_counter()
+    try:
+        yield extra
+    finally:
+        record(stage, time.perf_counter() - start, **extra)
+
+
+@contextmanager
+def turn(kind: str = "chat") -> Iterator[dict]:
+    """
+    Group the spans of one user turn under a shared turn id and time it end to end as
+    turn.<kind>, so chat turns and commands get separate percentiles. Setting "kind" in the
+    yielded dict relabels the turn (e.g. input that turned out not to be a command).
+    """
+    token = _current_turn.set(next(_turn_ids))
+    extra = {"kind": kind}
+    start = time.perf_counter()
+    try:
+        yield extra
+    finally:
+        record(f"turn.{extra.pop('kind')}", time.perf_counter() - start, **extra)
+        _current_turn.reset(token)
+
+
+def traced_completion(model: Any, prompt: Any, **kwargs) -> dict:
+    """
+    Run a completion streamed, recording time to first token as llm.prefill and the rest
+    as llm.decode. Returns a dict shaped like a non-streamed create_completion result.
+    """
+    with hold(model) as llm:
+        start = time.perf_counter()
+        first = None
+        pieces, finish_reason, tokens = [], None, 0
+        for chunk in llm.create_completion(prompt, stream=True, **kwargs):
+            if first is None:
+                first = time.perf_counter()
+            choice = chunk["choices"][0]
+            pieces.append(choice.get("text", ""))
+            finish_reason = choice.get("finish_reason") or finish_reason
+            tokens += 1
+        end = time.perf_counter()
+    first = first or end
+    prompt_tokens = len(prompt) if isinstance(prompt, list) else None
+    record("llm.prefill", first - start, prompt_tokens=prompt_tokens)
+    record("llm.decode", end - first, tokens=tokens,
+           tok_s=round((tokens - 1) / (end - first), 2) if tokens > 1 and end > first else None)
+    return {
+        "choices": [{"text": "".join(pieces), "index": 0, "finish_reason": finish_reason}],
+        "usage": {"completion_tokens": tokens},
+    }
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def perf_report() -> str:
+    """p50/p95 per stage over the most recent TRACE_WINDOW spans."""
+    with _lock:
+        snapshot = {stage: list(values) for stage, values in _recent.items() if values}
+    if not snapshot:
+        return "No traced turns yet."
+    lines = [f"{'stage':<20} {'n':>5} {'p50 ms':>10} {'p95 ms':>10}"]
+    for stage in sorted(snapshot):
+        values = snapshot[stage]
+        lines.append(f"{stage:<20} {len(values):>5} {_percentile(values, 0.5) * 1000:>10.1f} "
+                     f"{_percentile(values, 0.95) * 1000:>10.1f}")
+    return "\n".join(lines)
@@ -0,0 +1,50 @@
+# bot_core/worker_entry.py
+
+"""
+Lightweight entry module for spawned worker processes (ingestion, OCR, model workers).
+A "spawn" child re-imports the parent's __main__ before running its target. For the app
+that is main.py, Sapphira.py or server.py, which pull in the whole chat stack (command
+dispatcher, memory, the embedder, torch, llama_cpp). While a worker is being started,
+lightweight_main() presents this module as __main__ instead, so the child only imports
+the stdlib and the module that holds its target function.
+"""
+import multiprocessing as mp
+import os
+import signal
+import sys
+import threading
+from contextlib import contextmanager
+
+# Upper bound for "one per spare core" defaults; each worker is a full interpreter
+MAX_DEFAULT_WORKERS = 4
+
+_main_lock = threading.Lock()
+
+
+def spawn_context():
+    return mp.get_context("spawn")
+
+
+def default_workers(cap: int = MAX_DEFAULT_WORKERS) -> int:
+    """One worker per core, leaving one core for the rest of the app, and at most `cap`."""
+    return max(1, min(cap, (os.cpu_count() or 2) - 1))
+
+
+def ignore_sigint() -> None:
+    """
+    Call first thing in a worker process. Workers share the parent's console, so Ctrl-C
+    reaches them too; cancellation is the parent's job and arrives over the worker's IPC.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+@contextmanager
+def lightweight_main():
+    """Start processes inside this block so they re-import this module, not the app's entry script."""
+    with _main_lock:
+        main = sys.modules["__main__"]
+        sys.modules["__main__"] = sys.modules[__name__]
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = main
@@ -35,3 +35,137 @@ MAX_RETRIEVED_CHUNKS = 5
 
 # Max number of characters per chunk
 MAX_CHUNK_CHARS = 800
+
+# Models used by Sapphira.py, the model registry and the worker processes
+# (n_threads / n_batch are overridden by this host's tuned profile, see /autotune; n_ctx is only
+# lowered there if the model failed to load with it)
+MODEL_CONFIGS = {
+    "codellama-13b-q4_k_m": {"path": "D:models/codellama-13b.Q4_K_M.gguf", "kwargs": {"n_gpu_layers": 0, "n_threads": 88, "n_ctx": 16384}},
+    "mistral-7b-q5_k_m": {"path": "D:models/mistral-7b-instruct-v0.2.Q5_K_M.gguf", "kwargs": {"n_gpu_layers": 32, "n_threads": 8, "n_ctx": 8192}},
+    "phi-2-q5_k_m":     {"path": "D:models/phi-2.Q5_K_M.gguf", "kwargs": {"n_gpu_layers": 0, "n_threads": 88, "n_ctx": 2048}},
+}
+
+# Which configured model serves each role in bot_core.model_router
+MODEL_ROLES = {
+    "chat": "mistral-7b-q5_k_m",
+    "code": "codellama-13b-q4_k_m",
+    "memory": "phi-2-q5_k_m",
+}
+
+# Maximum RAM (in GB) that loaded models may occupy together; least recently used models are evicted beyond this (0 - unlimited)
+MODEL_RAM_BUDGET_GB = 24
+
+# Load the model most likely to be needed next in the background
+PRELOAD_NEXT_MODEL = False
+
+# Speculative decoding in Sapphira.py: "off", "draft" (small model proposes tokens) or "lookup" (n-grams from the prompt)
+SPECULATIVE_MODE = "off"
+
+# Small model used to draft tokens for the larger models
+DRAFT_MODEL = "phi-2-q5_k_m"
+
+# Number of tokens proposed per verification step
+SPECULATIVE_DRAFT_TOKENS = 8
+
+# Reuse answers to repeated prompts with the same model and retrieved context
+RESPONSE_CACHE_ENABLED = True
+
+# Seconds a cached answer stays valid
+RESPONSE_CACHE_TTL_SECONDS = 3600
+
+# Maximum number of cached answers (least recently used are dropped first)
+RESPONSE_CACHE_MAX_ENTRIES = 512
+
+# Embedding similarity (0.0 - 1.0) at which a differently worded prompt counts as a repeat (0 - exact matches
+# only, no embedding work; e.g. 0.95 to enable near-duplicate matching)
+RESPONSE_CACHE_SIMILARITY = 0
+
+# Requests sampled above this temperature always generate a fresh answer
+RESPONSE_CACHE_MAX_TEMPERATURE = 0.7
+
+# Port of the local inference server (server.py always binds to 127.0.0.1)
+SERVER_PORT = 8765
+
+# Maximum queued requests per model before clients are told to retry later
+SERVER_MAX_QUEUE = 32
+
+# Maximum queued or running requests one session may have per model
+SERVER_MAX_PER_SESSION = 4
+
+# Host each model in its own process so generations on different models run in parallel
+USE_MODEL_WORKERS = False
+
+# Learned router: similarity lost per unit of relative latency cost (0 = ignore cost)
+ROUTER_COST_WEIGHT = 0.05
+
+# Number of routing decisions cached per normalized prompt
+ROUTER_CACHE_SIZE = 1024
+
+# Chat sessions: when the transcript outgrows n_ctx, trim it down to this fraction of n_ctx
+SESSION_TRIM_TARGET = 0.5
+
+# Summarize trimmed turns into the system block instead of dropping them
+SESSION_SUMMARIZE = False
+
+# Save the chat session (model context, turns, retrieval cache) to sessions/ on exit
+SESSION_AUTOSAVE = True
+
+# Write per-stage latency spans to logs/trace.jsonl and keep them for /perf
+TRACE_ENABLED = True
+
+# Spans per stage kept in memory for the /perf percentiles
+TRACE_WINDOW = 200
+
+# Generation deadlines: stop after this many seconds / generated tokens and keep the partial answer (0 - no limit)
+GENERATION_TIMEOUT_SECONDS = 120
+GENERATION_TOKEN_LIMIT = 0
+
+# Ingestion: worker processes for normalizing files (0 - one per spare core, at most 4; 1 - serial)
+INGEST_WORKERS = 0
+
+# Seconds a single file may take to normalize (OCR, parsing) before it is skipped (0 - no limit)
+INGEST_FILE_TIMEOUT = 300
+
+# Maximum files dispatched to workers but not yet stored
+INGEST_QUEUE_SIZE = 64
+
+# Normalization streams files in bounded pieces: characters per text window, rows per table block
+INGEST_TEXT_WINDOW = 1024 * 1024
+INGEST_TABLE_CHUNK_ROWS = 10000
+
+# Columns kept from wide tables when no explicit projection is given (0 - all)
+TABLE_MAX_COLUMNS = 64
+
+# Watch IMPORT FILES in the background and learn new or changed files automatically (/watch on|off)
+WATCH_IMPORTS = False
+
+# Seconds the import folder must be quiet before a batch of changes is ingested
+WATCH_DEBOUNCE_SECONDS = 2.0
+
+# Rescan interval when watchdog is not installed and the watcher falls back to polling
+WATCH_POLL_INTERVAL = 5.0
+
+# Archives (zip/jar/tar) are read member by member in memory: at most this many members,
+# bytes per member and uncompressed bytes in total, and nested archives this deep
+ARCHIVE_MAX_MEMBERS = 10000
+ARCHIVE_MAX_MEMBER_BYTES = 256 * 1024 * 1024
+ARCHIVE_MAX_TOTAL_BYTES = 2 * 1024 * 1024 * 1024
+ARCHIVE_MAX_DEPTH = 2
+
+# Near-duplicate chunks (MinHash over word shingles, LSH candidate lookup) are filtered before
+# embedding: "link" stores them pointing at the original, "drop" discards them, "off" disables
+DEDUP_MODE = "link"
+DEDUP_THRESHOLD = 0.85
+DEDUP_NUM_PERM = 128
+DEDUP_SHINGLE_WORDS = 5
+
+# OCR: worker processes for pages and images (0 - one per spare core, at most 4; 1 - serial), seconds
+# Tesseract may spend on one page (0 - no limit), render resolution for scanned PDF pages and
+# the text-layer length below which a PDF page is treated as a scan
+OCR_WORKERS = 0
+OCR_PAGE_TIMEOUT = 120
+OCR_DPI = 300
+OCR_MIN_PAGE_CHARS = 20
+
+# Reuse OCR output of unchanged images and PDF pages (memory/ocr_cache, keyed by content hash)
+OCR_CACHE_ENABLED = True
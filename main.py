@@ -1,21 +1,35 @@
 # main.py
 
 import json
-import sys
 from pathlib import Path
 from datetime import datetime
 from bot_core.formatting import format_user_input
 from bot_core.formatting import format_sapphira_response
 from bot_core.command_dispatcher import handle_command
-from bot_core.model_llamacpp import init_llm
+from bot_core.model_llamacpp import init_llm, get_session
+from bot_core.chat_session import save_session
+from bot_core.logger_utils import log_error
+from bot_core.tracing import turn
+from bot_core.generation_control import GenerationControl, interruptible
 from bot_core.memory_vector_store import build_vector_store
+from bot_core.import_watcher import watcher
 from bot_core.constants_config import HELP_TEXT
 from colorama import Style
+from config import SESSION_AUTOSAVE, WATCH_IMPORTS
 
 def timestamped_input_label(prompt=">>> "):
     now = datetime.now().strftime("[%H:%M:%S]")
     return format_user_input(f"{now} {prompt}")
 
+def autosave():
+    session = get_session()
+    if SESSION_AUTOSAVE and session is not None and session.turns:
+        try:
+            path = save_session(session)
+            print(f"[INFO] Session saved to {path}")
+        except Exception as e:
+            log_error(f"Auto-save of session failed: {e}")
+
 def main():
     config_path = Path("config.json")
     with config_path.open("r", encoding="utf-8") as f:
@@ -29,26 +43,43 @@ def main():
         build_vector_store()
         print("[INFO] Vector store ready.")
 
-    while True:
-        try:
-            user_input = input(timestamped_input_label()).strip()
+    if WATCH_IMPORTS:
+        print(f"[INFO] Watching {watcher.root} for new files ({watcher.start()})")
+
+    # Ctrl-C at the prompt or during a command exits; during generation the first one only
+    # stops the current answer, a second one exits. Every way out saves the session.
+    try:
+        while True:
+            try:
+                user_input = input(timestamped_input_label()).strip()
+            except EOFError:
+                break
             if not user_input:
                 continue
 
-            cmd_resp = handle_command(user_input)
+            # One traced turn per input, labelled by what it turned out to be
+            with turn("command") as turn_info:
+                cmd_resp = handle_command(user_input)
+                if cmd_resp is None:
+                    turn_info["kind"] = "chat"
+                    with interruptible(GenerationControl.from_config()) as control:
+                        response = llm(user_input, control=control)
             if cmd_resp is not None:
                 print(cmd_resp)
                 continue
 
-            response = llm(user_input)
             if isinstance(response, list) and response and isinstance(response[0], dict) and "generated_text" in response[0]:
                 response = response[0]["generated_text"]
 
             print(format_sapphira_response(response))
-
-        except (KeyboardInterrupt, EOFError):
-            print("\nExiting.")
-            sys.exit(0)
+            if control.reason:
+                print(control.describe())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\nExiting.")
+        watcher.stop()
+        autosave()
 
 if __name__ == "__main__":
     main()
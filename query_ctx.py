@@ -1,18 +1,18 @@
-from llama_cpp import Llama
+from bot_core.gguf_reader import read_gguf_metadata
+from config import MODEL_CONFIGS
 
-# Paths to your model files
-MODEL_PATHS = {
-    "mistral-7b-q5_k_m": "D:/models/mistral-7b-instruct-v0.2.Q5_K_M.gguf",
-    "codellama-13b-q4_k_m": "D:/models/codellama-13b.Q4_K_M.gguf",
-    "phi-2-q5_k_m": "D:/models/phi-2.Q5_K_M.gguf",
-}
-
-# Load each model (CPU only) to query its max context size
+# Read each model's GGUF header to report its max context size (no weights are loaded)
 def main():
-    for name, path in MODEL_PATHS.items():
-        print(f"Loading {name} from {path}...")
-        model = Llama(model_path=path, n_gpu_layers=0, n_threads=1)
-        print(f"{name} max context size (n_ctx): {model.n_ctx}\n")
+    for name, cfg in MODEL_CONFIGS.items():
+        path = cfg["path"]
+        try:
+            info = read_gguf_metadata(path)
+        except (OSError, ValueError) as e:
+            print(f"{name}: cannot read {path}: {e}\n")
+            continue
+        print(f"{name} max context size (n_ctx): {info.context_length}")
+        print(f"  arch={info.architecture} quant={info.quantization} "
+              f"tensors={info.tensor_count} weights={info.tensor_bytes / 1024 ** 3:.2f} GB\n")
 
 if __name__ == "__main__":
     main()
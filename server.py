@@ -0,0 +1,215 @@
+# server.py
+
+"""
+Local inference server: one set of loaded models shared by several clients.
+Binds to 127.0.0.1 only and speaks a minimal JSON-over-HTTP protocol:
+
+  GET    /health              Loaded models and queue depths
+  POST   /generate            {"prompt", "session"?, "model"?, "max_tokens"?, "request_id"?, "timeout"?}
+  DELETE /requests/<id>       Cancel a queued or running request
+
+Slash commands and other utility inputs go through handle_command exactly like the CLI.
+Generations are scheduled per model with round-robin fairness across sessions; a client
+that disconnects while waiting has its request cancelled. A request past its timeout
+(seconds, including queueing; default GENERATION_TIMEOUT_SECONDS) returns the partial answer
+with "stopped": "timeout".
+"""
+import argparse
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from Sapphira import Sapphira, MODEL_CONFIGS, select_model
+from bot_core.command_dispatcher import handle_command
+from bot_core.logger_utils import log_error
+from bot_core.scheduler import InferenceScheduler, QueueFull
+from bot_core.generation_control import GenerationControl
+from config import USE_MODEL_WORKERS, SERVER_PORT, SERVER_MAX_QUEUE, SERVER_MAX_PER_SESSION
+
+HOST = "127.0.0.1"
+MAX_BODY_BYTES = 1024 * 1024
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 429: "Too Many Requests", 499: "Client Closed Request",
+               500: "Internal Server Error", 504: "Gateway Timeout"}
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class InferenceServer:
+    def __init__(self, sapphira: Sapphira, port: int = SERVER_PORT):
+        self.sapphira = sapphira
+        self.port = port
+        self.scheduler = InferenceScheduler(self._run_job, list(MODEL_CONFIGS),
+                                            max_queue=SERVER_MAX_QUEUE,
+                                            max_per_session=SERVER_MAX_PER_SESSION)
+        # handle_command keeps module-level state (pending generations, memory flags)
+        self._command_lock = threading.Lock()
+        self._command_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="commands")
+
+    # --- model work (runs on scheduler threads) ---
+
+    def _run_job(self, job) -> str:
+        prompt = job.payload["prompt"]
+        hits = self.sapphira.retrieve(prompt)
+        return self.sapphira.generate(prompt, job.model, max_tokens=job.payload["max_tokens"],
+                                      context="\n".join(hits), control=job.control)
+
+    def _run_command(self, prompt: str):
+        with self._command_lock:
+            return handle_command(prompt)
+
+    # --- HTTP plumbing ---
+
+    async def serve(self) -> None:
+        self.scheduler.start()
+        server = await asyncio.start_server(self._handle_client, HOST, self.port)
+        print(f"Sapphira server listening on http://{HOST}:{self.port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.scheduler.stop()
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, body = await self._read_request(reader)
+            status, payload = await self._route(method, path, body, reader)
+        except HttpError as e:
+            status, payload = e.status, {"error": str(e)}
+        except Exception as e:
+            log_error(f"Server request failed: {e}")
+            status, payload = 500, {"error": str(e)}
+        try:
+            data = json.dumps(payload).encode("utf-8")
+            writer.write(
+                f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                "Connection: close\r\n\r\n".encode("ascii") + data
+            )
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> tuple[str, str, dict]:
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        try:
+            method, path, _ = request_line.split(" ", 2)
+        except ValueError:
+            raise HttpError(400, "Malformed request line.")
+        length = 0
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            if name.strip().lower() == "content-length":
+                length = int(value.strip() or 0)
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, "Request body too large.")
+        body = {}
+        if length:
+            try:
+                body = json.loads(await reader.readexactly(length))
+            except json.JSONDecodeError:
+                raise HttpError(400, "Body must be JSON.")
+        return method.upper(), path, body
+
+    async def _route(self, method: str, path: str, body: dict, reader: asyncio.StreamReader):
+        if path == "/health":
+            return 200, {"models_loaded": self.sapphira.models.loaded(),
+                         "memory": self.sapphira.models.status(),
+                         "workers": self.sapphira.pool.status() if self.sapphira.pool else None,
+                         "queues": self.scheduler.stats()}
+        if path == "/generate":
+            if method != "POST":
+                raise HttpError(405, "Use POST.")
+            return await self._generate(body, reader)
+        if path.startswith("/requests/"):
+            if method != "DELETE":
+                raise HttpError(405, "Use DELETE.")
+            job_id = path.rsplit("/", 1)[-1]
+            if not self.scheduler.cancel(job_id):
+                raise HttpError(404, f"No active request {job_id}.")
+            return 200, {"cancelled": job_id}
+        raise HttpError(404, f"Unknown path {path}.")
+
+    async def _generate(self, body: dict, reader: asyncio.StreamReader):
+        prompt = str(body.get("prompt", "")).strip()
+        if not prompt:
+            raise HttpError(400, "Missing 'prompt'.")
+        loop = asyncio.get_running_loop()
+
+        cmd = await loop.run_in_executor(self._command_executor, self._run_command, prompt)
+        if cmd is not None:
+            return 200, {"command": True, "text": cmd}
+
+        model = body.get("model") or "auto"
+        if model == "auto":
+            model = select_model(prompt)
+        if model not in MODEL_CONFIGS:
+            raise HttpError(400, f"Unknown model '{model}'.")
+        session = str(body.get("session") or "anonymous")
+        request_id = body.get("request_id")
+        try:
+            max_tokens = int(body.get("max_tokens", 128))
+            timeout = float(body["timeout"]) if body.get("timeout") else None
+        except (TypeError, ValueError):
+            raise HttpError(400, "'max_tokens' and 'timeout' must be numbers.")
+        if max_tokens < 1:
+            raise HttpError(400, "'max_tokens' must be at least 1.")
+        try:
+            control = GenerationControl.from_config()
+            if timeout:
+                control.max_seconds = timeout
+            job = self.scheduler.submit(session, model, {
+                "prompt": prompt, "max_tokens": max_tokens,
+            }, job_id=str(request_id) if request_id else None, control=control)
+        except QueueFull as e:
+            raise HttpError(429, str(e))
+        except ValueError as e:
+            raise HttpError(400, str(e))
+
+        # Cancel the job if the client hangs up before the answer is ready
+        disconnect = asyncio.create_task(reader.read())
+        done, _ = await asyncio.wait({job.future, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        if job.future not in done:
+            self.scheduler.cancel(job.id)
+            raise HttpError(499, "Client disconnected.")
+        disconnect.cancel()
+        try:
+            text = job.future.result()
+        except asyncio.CancelledError:
+            raise HttpError(499, f"Request {job.id} was cancelled.")
+        except TimeoutError as e:
+            raise HttpError(504, str(e))
+        return 200, {"id": job.id, "model": model, "text": text, "cancelled": job.cancelled,
+                     "stopped": job.control.reason}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sapphira local inference server")
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", action="store_true", default=USE_MODEL_WORKERS,
+                        help="Host each model in its own worker process")
+    args = parser.parse_args()
+
+    sapphira = Sapphira(workers=args.workers)
+    server = InferenceServer(sapphira, port=args.port)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+    finally:
+        sapphira.close()
+
+
+if __name__ == "__main__":
+    main()